@@ -1,26 +1,56 @@
 # app.py
 from flask import Flask, render_template, request, jsonify, url_for, session, redirect
-import json
 import os
 import re
-import requests
 import chromadb
 import uuid
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 
 from postcard_routes import create_postcard_blueprint
 from supabase import create_client, Client
+from ttl_cache import TTLCache
+from supabase_rest import SupabaseRestClient
+from fanout import FanOut, FanOutTimeout
+from postbox_cache import PostboxCache
+from postcard_store import PostcardStore
+from warmup import WarmupManager
+from theme_matcher import ThemeMatcher
+from theme_rules import DEFAULT_CONTEXT_DESCRIPTION, THEME_CONTEXT_RULES
+from semantic_cache import SemanticCandidateCache
+from theme_results import THEME_RESULTS_FILE, load_theme_results, materialize_theme_results, theme_queries
+from embedding_service import EmbeddingBatcher, QueryEncoder
+from verse_index import load_local_verse_index
+from verse_store import MAX_RANGE_SPAN, VerseStore
+from supabase_verse_source import SupabaseVerseSource
+from book_names import CANONICAL_BOOKS
+from verse_reference import (
+    build_reference_label,
+    canonical_book_name,
+    find_verse_span,
+    normalize_reference,
+    parse_reference_input,
+    parse_reference_label,
+    reference_memo_stats,
+    verse_spans,
+)
+from verse_rerank import compact_text
+from search_pipeline import (
+    ChromaBackend,
+    LexicalBackend,
+    LocalIndexBackend,
+    RetrievalError,
+    SupabaseRpcBackend,
+    VerseSearchPipeline,
+)
+from bigram_index import build_bigram_index
 
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 from popular_verses import (
     get_popularity_score,
-    extract_chapter_verse,
     normalize_korean,
-    BOOK_NAME_MAP,
 )  # ⭐ 추가
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"), override=True)
@@ -41,6 +71,10 @@ SUPABASE_VEC_KEY = _clean_env(os.environ.get("SUPABASE_VEC_KEY")) or SUPABASE_KE
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 supabase_vec: Client = create_client(SUPABASE_VEC_URL, SUPABASE_VEC_KEY) if SUPABASE_VEC_URL and SUPABASE_VEC_KEY else None
 supabase_auth: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY or SUPABASE_KEY)
+# postboxes/postcards/generated_urls REST 호출용 keep-alive 커넥션 풀 클라이언트
+supabase_rest = SupabaseRestClient(SUPABASE_URL, SUPABASE_KEY)
+# 라우트 안의 독립적인 Supabase 호출을 동시에 보내고 공유 마감 시간까지 함께 기다린다
+supabase_fanout = FanOut()
 
 app = Flask(__name__)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_port=1, x_prefix=1)
@@ -67,8 +101,27 @@ def log_request_summary():
 
 # 1024차원 임베딩 모델 로드
 print("🔄 임베딩 모델 로딩 중...")
-embedding_model = SentenceTransformer('intfloat/multilingual-e5-small')
-print(f"✅ 임베딩 모델 로드 완료: {embedding_model.get_sentence_embedding_dimension()}차원")
+EMBEDDING_MODEL_NAME = 'intfloat/multilingual-e5-small'
+# EMBEDDING_BACKEND=onnx면 torch 없이 ONNX Runtime으로 인코딩 (ONNX_QUANTIZE=0이면 int8 양자화 미사용)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch").lower()
+if EMBEDDING_BACKEND == "onnx":
+    from onnx_encoder import load_onnx_encoder
+
+    embedding_model = load_onnx_encoder(
+        EMBEDDING_MODEL_NAME,
+        quantized=os.environ.get("ONNX_QUANTIZE", "1") != "0",
+    )
+    encoder_id = f"{EMBEDDING_MODEL_NAME}:onnx{'-int8' if embedding_model.quantized else ''}"
+else:
+    from sentence_transformers import SentenceTransformer
+
+    embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    encoder_id = EMBEDDING_MODEL_NAME
+print(f"✅ 임베딩 모델 로드 완료({encoder_id}): {embedding_model.get_sentence_embedding_dimension()}차원")
+# 반복되는 확장 질의는 캐시에서 바로 꺼내 모델 forward를 건너뛰고,
+# 동시에 들어온 캐시 미스는 몇 ms 모아서 한 번에 배치 인코딩한다
+embedding_batcher = EmbeddingBatcher(embedding_model)
+query_encoder = QueryEncoder(embedding_model, encoder_id, batcher=embedding_batcher)
 
 # ChromaDB 초기화 비활성화 (항상 Supabase 벡터DB 사용)
 IS_CLOUD_RUN = bool(os.environ.get("K_SERVICE"))
@@ -76,371 +129,109 @@ USE_CHROMA = False
 bible_collection = None
 print("ℹ️ ChromaDB 초기화 건너뜀 (Supabase 벡터DB 전용 모드)")
 
-# 검색 주제를 문맥/대표 구절과 함께 확장하기 위한 힌트 세트
-DEFAULT_CONTEXT_DESCRIPTION = (
-    '위로와 격려, 하나님의 신실하심, 회복과 소망, 두려움을 이기는 믿음, 사랑과 용기'
+# 로컬 구절 인덱스(build_verse_index.py로 생성)가 있으면 벡터 검색을 프로세스 내에서 처리
+LOCAL_VERSE_INDEX = load_local_verse_index(
+    os.environ.get("LOCAL_VERSE_INDEX_DIR") or os.path.join(os.path.dirname(__file__), "verse_index"),
+    metric=os.environ.get("LOCAL_VERSE_INDEX_METRIC", "cosine"),
+    # float16/int8로 두면 워커당 임베딩 메모리가 1/2, 1/4로 줄어든다 (rescore는 float32 재계산 후보 수)
+    dtype=os.environ.get("LOCAL_VERSE_INDEX_DTYPE", "float32"),
+    rescore=int(os.environ.get("LOCAL_VERSE_INDEX_RESCORE", "0")),
 )
-
-THEME_CONTEXT_RULES = [
-    {
-        "tokens": ['취업', '진로', '직장', '커리어', '회사'],
-        "description": '취업과 진로, 장래의 길, 하나님의 공급과 인도, 두려움 대신 담대함',
-        "curated_references": [
-            "잠언 16:3",
-            "잠언 3:5-6",
-            "예레미야 29:11",
-            "시편 37:23",
-            "빌립보서 4:13",
-        ],
-    },
-    {
-        "tokens": ['시험', '공부', '학업', '입시'],
-        "description": '지혜와 인내, 성실하게 준비하는 마음, 하나님께 맡기는 믿음',
-        "curated_references": [
-            "야고보서 1:5",
-            "고린도전서 10:13",
-            "빌립보서 4:6",
-            "빌립보서 4:13",
-            "잠언 2:6",
-        ],
-    },
-    {
-        "tokens": ['위로', '슬픔', '눈물', '상실', '아픔', '고통'],
-        "description": '위로와 회복, 함께하시는 하나님, 눈물을 닦아주시는 사랑',
-        "curated_references": [
-            "시편 119:50",
-            "이사야 41:10",
-            "시편 34:18",
-            "마태복음 11:28",
-            "시편 147:3",
-        ],
-    },
-    {
-        "tokens": ['소망', '희망', '미래', '장래'],
-        "description": '소망과 미래에 대한 약속, 하나님이 예비하신 계획을 신뢰함',
-        "curated_references": [
-            "예레미야 29:11",
-            "고린도전서 13:13",
-            "로마서 15:13",
-            "히브리서 11:1",
-            "시편 71:14",
-        ],
-    },
-    {
-        "tokens": ['두려움', '걱정', '근심', '불안'],
-        "description": '두려움을 이기는 믿음, 평안, 담대함, 염려를 맡김',
-        "curated_references": [
-            "이사야 41:10",
-            "빌립보서 4:6-7",
-            "마태복음 6:34",
-            "시편 56:3",
-            "디모데후서 1:7",
-        ],
-    },
-    {
-        "tokens": ['감사', '기쁨', '찬양'],
-        "description": '감사와 찬양, 기쁨과 즐거움, 하나님의 선하심',
-        "curated_references": [
-            "시편 100:4",
-            "데살로니가전서 5:18",
-            "시편 16:11",
-            "빌립보서 4:4",
-            "느헤미야 8:10",
-        ],
-    },
-    {
-        "tokens": ['용서', '죄책감', '회개'],
-        "description": '용서와 회개, 새 마음, 은혜로 다시 시작함',
-        "curated_references": [
-            "요한일서 1:9",
-            "누가복음 17:3-4",
-            "에베소서 4:32",
-            "시편 103:12",
-            "미가 7:19",
-        ],
-    },
-    {
-        "tokens": ['사랑', '연애', '결혼', '부부', '가정', '부모', '자녀', '가족'],
-        "description": '사랑과 연합, 가정과 관계 회복, 서로를 세워 줌',
-        "curated_references": [
-            "고린도전서 13:4-7",
-            "요한일서 4:8",
-            "에베소서 5:25",
-            "잠언 17:17",
-            "골로새서 3:13",
-        ],
-    },
-    {
-        "tokens": ['우정', '공동체', '교회', '형제'],
-        "description": '공동체와 우정, 서로를 격려하고 세워 주는 관계',
-        "curated_references": [
-            "요한복음 15:13",
-            "잠언 17:17",
-            "잠언 27:17",
-            "요한복음 17:21",
-            "히브리서 10:24-25"
-        ],
-    },
-    {
-        "tokens": ['사명', '헌신', '섬김', '순종'],
-        "description": '사명과 순종, 헌신과 사랑으로 섬기는 삶',
-        "curated_references": [
-            "요한복음 14:15",
-            "로마서 12:1",
-            "신명기 10:12",
-            "마태복음 16:24",
-            "갈라디아서 2:20"
-        ],
-    },
-    {
-        "tokens": ['건강', '질병', '치유', '회복'],
-        "description": '치유와 회복, 강건함, 약한 자를 세우시는 하나님',
-        "curated_references": [
-            "야고보서 5:15",
-            "출애굽기 15:26",
-            "이사야 53:5",
-            "마가복음 5:34",
-            "시편 41:3"
-        ],
-    },
-    {
-        "tokens": ['재정', '돈', '필요', '궁핍', '가난'],
-        "description": '필요를 채우시는 하나님, 공급과 만족, 나눔과 신뢰',
-        "curated_references": [
-            "빌립보서 4:19",
-            "마태복음 6:33",
-            "히브리서 13:5",
-            "잠언 30:8",
-            "마태복음 6:26",
-        ],
-    },
-    {
-        "tokens": ['갈등', '분노', '싸움'],
-        "description": '화해와 용서, 평화, 사랑으로 문제를 해결함',
-        "curated_references": [
-            "야고보서 1:19-20",
-            "잠언 15:1",
-            "에베소서 4:26",
-            "마태복음 18:15",
-            "잠언 16:32"
-        ],
-    },
-    {
-        "tokens": ['평안', '쉼', '안식', '샬롬'],
-        "description": '평안과 안식, 폭풍 가운데도 지키시는 하나님',
-        "curated_references": [
-            "요한복음 14:27",
-            "마태복음 11:28",
-            "시편 4:8",
-            "빌립보서 4:7",
-            "요한복음 16:33"
-        ],
-    },
-]
-
-REFERENCE_SPLIT_PATTERN = re.compile(r'^(.*?)(\d+:\d.*)$')
-
-
-REFERENCE_INPUT_PATTERN = re.compile(
-    r'^\s*([0-9]{0,1}\s*[가-힣A-Za-z]{1,30})\s*([0-9]{1,3})\s*(?:[:장]\s*([0-9]{1,3}))\s*(?:[-–—~]\s*([0-9]{1,3}))?\s*(?:절)?\s*$'
+# 구절 원문/메타데이터 조회(레퍼런스 인덱스, 직접 매칭)에 쓰는 소스.
+# Supabase 전용 배포에서는 벡터 테이블을 부팅 워밍업 때 한 번 전부 읽어 VerseStore를 만든다
+# (SUPABASE_VERSE_SOURCE=0이면 끔 → 레퍼런스 직접 매칭/대표 구절 주입 없이 벡터 검색만)
+VERSE_SOURCE = LOCAL_VERSE_INDEX or bible_collection or (
+    SupabaseVerseSource(supabase_vec)
+    if supabase_vec and os.environ.get("SUPABASE_VERSE_SOURCE", "1") != "0"
+    else None
 )
+# Supabase 소스는 테이블 전체를 페이지 단위로 받아야 하므로 요청을 막지 않는다:
+# 워밍업 컴포넌트로 백그라운드에서 적재하고(부팅 시 시작은 SUPABASE_VERSE_PRELOAD=1일 때만),
+# 준비되기 전 요청은 레퍼런스 빠른 경로 없이 벡터 검색으로 진행한다. readiness에도 포함하지 않는다.
+VERSE_SOURCE_REMOTE = isinstance(VERSE_SOURCE, SupabaseVerseSource)
+VERSE_SOURCE_PRELOAD = os.environ.get("SUPABASE_VERSE_PRELOAD", "0") == "1"
+
+# 로컬 구절 인덱스 위에 문자 bigram 역색인을 올려 문구 후보를 벡터 후보와 합친다(하이브리드).
+# 문구 재현율을 역색인이 보장하므로 벡터 후보 수는 200 → 100으로 줄인다.
+# 역색인은 부팅 워밍업 컴포넌트(bigram_index)로 만든다 (build_lexical_index).
+LEXICAL_INDEX_ENABLED = bool(LOCAL_VERSE_INDEX) and os.environ.get("LEXICAL_INDEX", "1") != "0"
+BIGRAM_INDEX = None
+VECTOR_CANDIDATE_COUNT = int(os.environ.get("VECTOR_CANDIDATE_COUNT") or (100 if LEXICAL_INDEX_ENABLED else 200))
+LEXICAL_CANDIDATE_COUNT = int(os.environ.get("LEXICAL_CANDIDATE_COUNT", "50"))
+
+# 추천 결과 캐시: 같은 검색어로 페이지를 넘길 때 임베딩/벡터 검색을 다시 돌리지 않는다
+VERSE_PAGE_SIZE = 3
+RESULT_CACHE_TTL = int(os.environ.get("RESULT_CACHE_TTL", "600"))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "512"))
+RECOMMEND_RESULT_CACHE = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+# 정렬 결과는 상위 RANKED_RESULT_LIMIT개만 부분 정렬해 캐시한다 (메모리 절약).
+# has_more/total_pages는 전체 후보 수 기준이고, 그 뒤 페이지를 요청하면 전체를 다시 정렬한다.
+RANKED_RESULT_LIMIT = int(os.environ.get("RANKED_RESULT_LIMIT", "60"))
+# 임베딩이 거의 같은 질의("취업 걱정" / "취업이 걱정돼요")는 벡터 후보를 재사용 (SIZE=0이면 끔).
+# 원래 검색어 임베딩 기준 threshold의 오적중률을 check_semantic_cache.py로 측정하기 전까지 기본은 끈다.
+SEMANTIC_CACHE_SIZE = int(os.environ.get("SEMANTIC_CACHE_SIZE", "0"))
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+SEMANTIC_CANDIDATE_CACHE = (
+    SemanticCandidateCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD, ttl=RESULT_CACHE_TTL)
+    if SEMANTIC_CACHE_SIZE > 0
+    else None
+)
+# 테마 검색어별 사전 계산 추천 목록 (build_theme_results.py로 오프라인 생성, 유효 기간이 지나면 실시간 검색).
+# 부팅 시 계산은 워커마다 검색어 수만큼 인코딩 + 벡터 검색을 하므로 기본으로 끈다.
+THEME_RESULTS_PATH = os.environ.get("THEME_RESULTS_FILE") or os.path.join(os.path.dirname(__file__), THEME_RESULTS_FILE)
+THEME_RESULTS_BUILD_ON_BOOT = os.environ.get("THEME_RESULTS_BUILD_ON_BOOT", "0") == "1"
 
-BOOK_ABBREVIATIONS = {
-    # 한글 약어
-    "마": "마태복음", "막": "마가복음", "눅": "누가복음", "요": "요한복음",
-    "롬": "로마서", "고전": "고린도전서", "고후": "고린도후서", "갈": "갈라디아서",
-    "엡": "에베소서", "빌": "빌립보서", "골": "골로새서", "살전": "데살로니가전서",
-    "살후": "데살로니가후서", "딤전": "디모데전서", "딤후": "디모데후서",
-    "약": "야고보서", "벧전": "베드로전서", "벧후": "베드로후서",
-    # 영문 약어(소문자)
-    "mt": "마태복음", "matt": "마태복음", "mk": "마가복음", "lk": "누가복음",
-    "jn": "요한복음", "rom": "로마서", "1th": "데살로니가전서", "2th": "데살로니가후서",
-    "eph": "에베소서", "phil": "빌립보서", "jas": "야고보서",
-}
-
-KOREAN_TO_ENGLISH_BOOK = {v: k for k, v in BOOK_NAME_MAP.items()}
-FULL_BOOK_TO_ABBREVIATIONS = {}
-for abbr, full in BOOK_ABBREVIATIONS.items():
-    if re.fullmatch(r"[가-힣0-9]+", abbr):
-        FULL_BOOK_TO_ABBREVIATIONS.setdefault(full, []).append(abbr)
+# 레퍼런스 입력은 반드시 "숫자 + (: 또는 장)"을 포함한다 → 일반 검색어는 파싱 없이 통과
+REFERENCE_HINT_PATTERN = re.compile(r'\d\s*[:장]')
+REFERENCE_QUERY_MAX_LENGTH = 40
+VERSE_RANGE_MAX_SPAN = int(os.environ.get("VERSE_RANGE_MAX_SPAN", str(MAX_RANGE_SPAN)))
 
 
-def _collect_all_curated_references():
-    seen = set()
-    refs = []
-    for rule in THEME_CONTEXT_RULES:
-        for ref in rule.get("curated_references", []):
-            if not ref:
-                continue
-            cleaned = normalize_korean(ref.strip())
-            if cleaned not in seen:
-                seen.add(cleaned)
-                refs.append(cleaned)
-    return refs
-
-
-ALL_CURATED_REFERENCES = _collect_all_curated_references()
-REFERENCE_INDEX = {}
+# 테마 토큰 Aho-Corasick + 조합별 확장 문장 캐시. 대표 구절은 build_reference_index()에서 미리 푼다.
+THEME_MATCHER = ThemeMatcher(THEME_CONTEXT_RULES, DEFAULT_CONTEXT_DESCRIPTION, normalize_reference)
 REFERENCE_INDEX_LOADED = False
-VERSE_LOOKUP_INDEX = {}
+VERSE_STORE = None
 VERSE_LOOKUP_INDEX_LOADED = False
+# VerseStore가 모든 절을 담고 있으므로 조회 실패는 확정 → 같은 입력은 다시 파싱/조회하지 않는다
+REFERENCE_MISS_CACHE = TTLCache(
+    maxsize=int(os.environ.get("REFERENCE_MISS_CACHE_SIZE", "2048")),
+    ttl=RESULT_CACHE_TTL,
+)
 
 
-def canonical_book_name(book: str) -> str:
-    book_key = normalize_korean(book or '').replace(" ", "")
-    if not book_key:
-        return ''
-    if book_key.lower() in BOOK_ABBREVIATIONS:
-        return BOOK_ABBREVIATIONS[book_key.lower()]
-    if book_key in BOOK_ABBREVIATIONS:
-        return BOOK_ABBREVIATIONS[book_key]
-    return BOOK_NAME_MAP.get(book_key, book_key)
-
-
-def parse_reference_input(text: str):
-    m = REFERENCE_INPUT_PATTERN.match(normalize_korean(text or ""))
-    if not m:
-        return None
-    book_raw, chapter, verse, verse_end = m.groups()
-    book = canonical_book_name(book_raw)
-    if not book:
-        return None
-    return {
-        "book": book,
-        "chapter": int(chapter),
-        "verse": int(verse),
-        "verse_end": int(verse_end) if verse_end else None,
-    }
-
-
-def split_reference(reference: str):
-    reference = normalize_korean(reference or '').strip()
-    reference = reference.split('(')[0].strip()
-    if not reference:
-        return '', ''
-    match = REFERENCE_SPLIT_PATTERN.match(reference)
-    if match:
-        book_raw = match.group(1).strip()
-        remainder = match.group(2).strip()
-    else:
-        book_raw = reference
-        remainder = ''
-    book = canonical_book_name(book_raw)
-    if remainder:
-        remainder = remainder.strip()
-        # 범위가 붙어 있으면 시작 절만 사용
-        for sep in ['-', '–', '—', '~']:
-            if sep in remainder:
-                remainder = remainder.split(sep)[0].strip()
-                break
-    remainder = remainder.strip()
-    return book, remainder
-
-
-def normalize_reference(reference: str) -> str:
-    """구절 표시 방식이 조금씩 달라도 비교가 가능하도록 정규화."""
-    book, remainder = split_reference(reference)
-    if book and remainder:
-        base = f"{book} {remainder}"
-    elif book:
-        base = book
-    else:
-        base = remainder
-    return base.replace(" ", "")
-
-
-def build_reference_label(metadata: dict, document: str) -> str:
-    """메타데이터와 본문에서 책 이름 + 장:절을 조합해 사람이 읽을 레퍼런스를 만든다."""
-    reference_field = metadata.get("reference") or ""
-    source_field = metadata.get("source") or ""
-    ref_book, ref_numbers = split_reference(reference_field)
-    source_book = canonical_book_name(source_field)
-    book = ref_book or source_book
-    chapter_verse = extract_chapter_verse(document or "") if document else None
-
-    if not chapter_verse and ref_numbers:
-        chapter_verse = ref_numbers
-
-    if book and chapter_verse:
-        return f"{book} {chapter_verse}"
-    if book:
-        return book
-    if chapter_verse:
-        return chapter_verse
-    return "알 수 없는 구절"
+def looks_like_reference(text: str) -> bool:
+    """레퍼런스 파싱을 시도할 가치가 있는 검색어인지 빠르게 판별."""
+    return bool(
+        text
+        and len(text) <= REFERENCE_QUERY_MAX_LENGTH
+        and REFERENCE_HINT_PATTERN.search(text)
+    )
 
 
 def build_reference_index():
-    """테마 대표 구절을 빠르게 가져올 수 있도록 메모리에 적재."""
+    """테마 대표 구절을 부팅 시 VerseStore 항목 배열로 미리 풀어 둔다. 못 찾은 구절은 여기서 보고."""
     global REFERENCE_INDEX_LOADED
-    if REFERENCE_INDEX_LOADED or not bible_collection or not ALL_CURATED_REFERENCES:
-        REFERENCE_INDEX_LOADED = True
-        return
-
-    target_refs = {
-        normalize_reference(ref): ref
-        for ref in ALL_CURATED_REFERENCES
-        if ref
-    }
-    target_refs.pop('', None)
-
-    if not target_refs:
+    if REFERENCE_INDEX_LOADED or not VERSE_SOURCE:
         REFERENCE_INDEX_LOADED = True
         return
 
     print("🔄 테마 대표 구절 인덱스 로딩 중...")
-    try:
-        data = bible_collection.get(include=["documents", "metadatas"])
-    except Exception as e:
-        print(f"⚠️ 대표 구절 인덱스 로딩 실패: {e}")
-        return
-
-    docs = data.get("documents") or []
-    metas = data.get("metadatas") or []
-    found = 0
-
-    for doc, meta in zip(docs, metas):
-        reference = build_reference_label(meta, doc)
-        normalized = normalize_reference(reference)
-        if normalized in target_refs and normalized not in REFERENCE_INDEX:
-            REFERENCE_INDEX[normalized] = {
-                "text": doc,
-                "metadata": meta,
-            }
-            found += 1
-            if found == len(target_refs):
-                break
-
+    ensure_verse_lookup_index(block=True)
+    unresolved = THEME_MATCHER.resolve_curated(get_exact_verse_entry)
+    for ref in unresolved:
+        print(f"⚠️ 대표 구절을 찾지 못해 테마 주입에서 제외: {ref}")
     REFERENCE_INDEX_LOADED = True
-    print(f"✅ 대표 구절 인덱스 준비 완료: {len(REFERENCE_INDEX)}개 매핑")
-
+    print(f"✅ 대표 구절 인덱스 준비 완료: {THEME_MATCHER.stats()['curated_resolved']}개 매핑")
 
-def ensure_reference_index():
-    if not REFERENCE_INDEX_LOADED and bible_collection:
-        build_reference_index()
 
-
-def build_verse_lookup_index():
-    """(책+장:절) → 문서 전체 인덱스"""
-    global VERSE_LOOKUP_INDEX_LOADED
-    if VERSE_LOOKUP_INDEX_LOADED or not bible_collection:
-        VERSE_LOOKUP_INDEX_LOADED = True
+def ensure_reference_index(block: bool = None):
+    """대표 구절 인덱스 준비. Supabase 소스면 기본으로 기다리지 않고 백그라운드 적재만 시작한다."""
+    if REFERENCE_INDEX_LOADED or not VERSE_SOURCE:
         return
-    for doc, meta in iter_collection_documents(include=["documents", "metadatas"]):
-        ref = build_reference_label(meta, doc)
-        key = normalize_reference(ref)
-        if key and key not in VERSE_LOOKUP_INDEX:
-            VERSE_LOOKUP_INDEX[key] = {"text": doc, "metadata": meta}
-    VERSE_LOOKUP_INDEX_LOADED = True
-
-
-def ensure_verse_lookup_index():
-    if not VERSE_LOOKUP_INDEX_LOADED and bible_collection:
-        build_verse_lookup_index()
-
-
-VERSE_LOOKUP_INDEX = {}
-VERSE_LOOKUP_INDEX_LOADED = False
+    if block is False or (block is None and VERSE_SOURCE_REMOTE):
+        warmup.prefetch("reference_index")
+    else:
+        warmup.ensure("reference_index")
 
 
 def iter_collection_documents(where=None, include=None, batch_size=2000):
@@ -448,14 +239,14 @@ def iter_collection_documents(where=None, include=None, batch_size=2000):
     offset = 0
     while True:
         try:
-            data = bible_collection.get(
+            data = VERSE_SOURCE.get(
                 where=where,
                 include=include,
                 limit=batch_size,
                 offset=offset,
             )
         except TypeError:
-            data = bible_collection.get(where=where, include=include)
+            data = VERSE_SOURCE.get(where=where, include=include)
         docs = data.get("documents") or []
         metas = data.get("metadatas") or []
         if not docs:
@@ -466,122 +257,89 @@ def iter_collection_documents(where=None, include=None, batch_size=2000):
 
 
 def build_verse_lookup_index():
-    global VERSE_LOOKUP_INDEX_LOADED
-    if VERSE_LOOKUP_INDEX_LOADED or not bible_collection:
+    """(책, 장, 절) → 구절 VerseStore 생성.
+
+    문서 대표 레퍼런스는 문서 전체를, 여러 절이 묶인 문서 안쪽 절은 해당 절 본문만 담는다.
+    모든 절이 주소를 가지므로 요청 시점에 문서를 훑거나 시맨틱 검색으로 되짚을 필요가 없다.
+    """
+    global VERSE_STORE, VERSE_LOOKUP_INDEX_LOADED
+    if VERSE_LOOKUP_INDEX_LOADED or not VERSE_SOURCE:
         VERSE_LOOKUP_INDEX_LOADED = True
         return
 
-    for doc, meta in iter_collection_documents(include=["documents", "metadatas"]):
-        ref = build_reference_label(meta, doc)
-        key = normalize_reference(ref)
-        if key and key not in VERSE_LOOKUP_INDEX:
-            VERSE_LOOKUP_INDEX[key] = {"text": doc, "metadata": meta}
-
+    def entries():
+        embedded = []
+        for doc, meta in iter_collection_documents(include=["documents", "metadatas"]):
+            parsed = parse_reference_label(build_reference_label(meta, doc))
+            doc_book = parsed[0] if parsed else canonical_book_name(meta.get("source") or "")
+            # 적재 시 저장해 둔 절 위치표를 쓰고, 없는 옛 문서만 여기서 한 번 파싱한다
+            spans = verse_spans(meta, doc, fallback_book=doc_book)
+            doc_norm = normalize_korean(doc or "")
+            if parsed:
+                # 여러 절이 묶인 문서면 대표 절 행에는 다음 절 표시 전까지만 담아 범위 조회 시 중복이 없게 한다
+                own = find_verse_span(spans, *parsed)
+                own_verse = own and len(spans) > 1 and own[3] == min(span[3] for span in spans)
+                text = doc_norm[:own[4]].strip() if own_verse else doc
+                yield parsed[0], parsed[1], parsed[2], text, meta, False
+            for book_id, chapter, verse, start, end in spans:
+                book = CANONICAL_BOOKS[book_id]
+                if parsed and (book, chapter, verse) == parsed:
+                    continue
+                embedded.append((book, chapter, verse, doc_norm[start:end].strip(), meta, True))
+        # 같은 절이 대표 레퍼런스로도 있으면 그쪽이 우선하도록 embedded 구절은 뒤에 넘긴다
+        yield from embedded
+
+    VERSE_STORE = VerseStore.build(entries())
     VERSE_LOOKUP_INDEX_LOADED = True
+    print(f"✅ 구절 조회 저장소 준비 완료: {VERSE_STORE.stats()}")
 
 
-def ensure_verse_lookup_index():
-    if not VERSE_LOOKUP_INDEX_LOADED and bible_collection:
-        build_verse_lookup_index()
-
-
-def extract_exact_verse_text(book, chapter, verse, document):
-    doc_norm = normalize_korean(document or "")
-    abbrs = FULL_BOOK_TO_ABBREVIATIONS.get(book, [])
-    for abbr in abbrs:
-        start = re.search(
-            rf'{re.escape(abbr)}\s*{chapter}\s*:\s*{verse}\s*',
-            doc_norm,
-        )
-        if not start:
-            continue
-        nxt = re.search(
-            r'\n?\s*[가-힣]{1,5}\s*\d+\s*:\s*\d+\s*',
-            doc_norm[start.end():],
-        )
-        end_idx = start.end() + (nxt.start() if nxt else len(doc_norm))
-        body = doc_norm[start.end():end_idx].strip()
-        return f"{abbr}{chapter}:{verse} {body}".strip()
-    return None
+def ensure_verse_lookup_index(block: bool = None):
+    """구절 조회 저장소 준비. Supabase 소스면 기본으로 기다리지 않고 백그라운드 적재만 시작한다."""
+    if VERSE_LOOKUP_INDEX_LOADED or not VERSE_SOURCE:
+        return
+    if block is False or (block is None and VERSE_SOURCE_REMOTE):
+        warmup.prefetch("verse_store")
+    else:
+        warmup.ensure("verse_store")
 
 
-def get_exact_verse_entry(ref_input: str):
-    parsed = parse_reference_input(ref_input)
-    if not parsed:
+def lookup_verse_store(book: str, chapter: int, verse: int):
+    """VerseStore에서 (책, 장, 절) 구절 항목을 찾는다. 없으면 None."""
+    ensure_verse_lookup_index()
+    if VERSE_STORE is None:
         return None
+    row = VERSE_STORE.lookup(book, chapter, verse)
+    return VERSE_STORE.entry(row) if row >= 0 else None
 
-    book = parsed["book"]
-    chapter = parsed["chapter"]
-    verse = parsed["verse"]
-    target_label = f"{book} {chapter}:{verse}"
-    target_key = normalize_reference(target_label)
 
+def lookup_verse_range(book: str, chapter: int, verse_start: int, verse_end: int):
+    """같은 장의 절 범위를 VerseStore의 연속 행 한 조각으로 조회 (최대 VERSE_RANGE_MAX_SPAN절)."""
     ensure_verse_lookup_index()
-    if target_key in VERSE_LOOKUP_INDEX:
-        return VERSE_LOOKUP_INDEX[target_key]
-
-    def doc_has_target(doc: str):
-        doc_compact = re.sub(r"\s+", "", normalize_korean(doc or ""))
-        markers = [
-            f"{abbr}{chapter}:{verse}"
-            for abbr in FULL_BOOK_TO_ABBREVIATIONS.get(book, [])
-        ]
-        markers += [re.sub(r"\s+", "", f"{book} {chapter}:{verse}")]
-        return any(m in doc_compact for m in markers if m)
-
-    for src in [book, KOREAN_TO_ENGLISH_BOOK.get(book)]:
-        if not src:
-            continue
-        for doc, meta in iter_collection_documents(
-            where={"source": src},
-            include=["documents", "metadatas"],
-        ):
-            if normalize_reference(build_reference_label(meta, doc)) == target_key:
-                return {"text": doc, "metadata": meta}
-            if doc_has_target(doc):
-                text = extract_exact_verse_text(book, chapter, verse, doc) or doc
-                meta = dict(meta or {})
-                meta["_reference_override"] = target_label
-                return {"text": text, "metadata": meta}
-
-    try:
-        emb = embedding_model.encode(f"{target_label} 성경 구절").tolist()
-        res = bible_collection.query(
-            query_embeddings=[emb],
-            n_results=200,
-            include=["documents", "metadatas", "distances"],
-        )
-        docs = (res.get("documents") or [[]])[0]
-        metas = (res.get("metadatas") or [[]])[0]
-        for doc, meta in zip(docs, metas):
-            if normalize_reference(build_reference_label(meta, doc)) == target_key:
-                return {"text": doc, "metadata": meta}
-            if doc_has_target(doc):
-                text = extract_exact_verse_text(book, chapter, verse, doc) or doc
-                meta = dict(meta or {})
-                meta["_reference_override"] = target_label
-                return {"text": text, "metadata": meta}
-    except Exception:
-        pass
-
-    return None
+    if VERSE_STORE is None:
+        return None
+    return VERSE_STORE.range_entry(book, chapter, verse_start, verse_end, max_span=VERSE_RANGE_MAX_SPAN)
 
 
-def get_or_create_curated_entry(normalized_key: str, reference_label: str):
-    if not normalized_key:
+def get_exact_verse_entry(ref_input: str):
+    """레퍼런스 입력 → VerseStore 구절 항목. 없으면 None (문서 스캔/시맨틱 되짚기 없음)."""
+    miss_key = normalize_korean(ref_input or "").strip()
+    if miss_key in REFERENCE_MISS_CACHE:
         return None
-    cached = REFERENCE_INDEX.get(normalized_key)
-    if cached:
-        return cached
-    hit = get_exact_verse_entry(reference_label)
-    if hit:
-        REFERENCE_INDEX[normalized_key] = hit
-        return hit
-    return None
+    parsed = parse_reference_input(ref_input)
+    hit = None
+    if parsed and parsed["verse_end"] and parsed["verse_end"] > parsed["verse"]:
+        hit = lookup_verse_range(parsed["book"], parsed["chapter"], parsed["verse"], parsed["verse_end"])
+    elif parsed:
+        hit = lookup_verse_store(parsed["book"], parsed["chapter"], parsed["verse"])
+    if not hit and (VERSE_STORE is not None or not parsed):
+        REFERENCE_MISS_CACHE.set(miss_key, True)
+    return hit
 
 
-postboxes = {}
-postcards = {}
+# 우체통 행은 POSTBOX_CACHE, 엽서는 POSTCARD_STORE가 들고 있다 (둘 다 항목 수/메모리 예산으로 제한)
+# 엽서 id 색인 + 우체통별 작성 순서 목록 (보낸 엽서는 긴 TTL 동안 메모리에서 바로 읽는다)
+POSTCARD_STORE = PostcardStore()
 
 # 템플릿 유형 매핑 (Supabase templates.template_type: 0=엽서, 1=편지지)
 TEMPLATE_TYPE_MAP = {
@@ -590,21 +348,25 @@ TEMPLATE_TYPE_MAP = {
 }
 
 
-def supabase_headers():
-    return {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-    }
+def load_postbox_row(field: str, value: str):
+    """postbox 캐시 로더: field("id"/"url") = value인 행, 없으면 None. 통신 오류는 예외."""
+    resp = supabase_rest.get("postboxes", params={field: f"eq.{value}", "limit": 1})
+    if resp.status_code != 200:
+        raise RuntimeError(f"status={resp.status_code}, body={resp.text}")
+    data = resp.json()
+    return data[0] if data else None
+
+
+# id/url 두 키로 찾는 read-through postbox 캐시 (짧은 TTL + stale-while-revalidate + 음성 캐시)
+POSTBOX_CACHE = PostboxCache(load_postbox_row if supabase_rest.configured else (lambda field, value: None))
 
 
 def fetch_postbox_supabase(postbox_id: str):
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    if not supabase_rest.configured:
         return None
-    endpoint = f"{SUPABASE_URL.rstrip('/')}/rest/v1/postboxes"
     params = {"id": f"eq.{postbox_id}", "limit": 1}
     try:
-        resp = requests.get(endpoint, headers=supabase_headers(), params=params, timeout=8)
+        resp = supabase_rest.get("postboxes", params=params)
         if resp.status_code != 200:
             print(f"⚠️ Supabase post fetch 실패 status={resp.status_code}, body={resp.text}")
             return None
@@ -616,12 +378,11 @@ def fetch_postbox_supabase(postbox_id: str):
 
 
 def fetch_postcards_supabase(postbox_id: str):
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    if not supabase_rest.configured:
         return []
-    endpoint = f"{SUPABASE_URL.rstrip('/')}/rest/v1/postcards"
     params = {"postbox_id": f"eq.{postbox_id}", "order": "created_at.asc"}
     try:
-        resp = requests.get(endpoint, headers=supabase_headers(), params=params, timeout=8)
+        resp = supabase_rest.get("postcards", params=params)
         if resp.status_code != 200:
             print(f"⚠️ Supabase postcards fetch 실패 status={resp.status_code}, body={resp.text}")
             return []
@@ -634,44 +395,36 @@ def fetch_postcards_supabase(postbox_id: str):
 
 
 def fetch_postcard_by_id(postcard_id: str):
-    """우편 ID로 엽서 1건을 가져온다 (Supabase → 메모리 캐시)."""
-    # 1) Supabase 우선 조회 (DB 수정 사항 즉시 반영)
-    if SUPABASE_URL and SUPABASE_KEY:
-        endpoint = f"{SUPABASE_URL.rstrip('/')}/rest/v1/postcards"
+    """우편 ID로 엽서 1건을 가져온다 (메모리 → Supabase → 오래된 메모리 값)."""
+    # 1) 보낸 엽서는 바뀌지 않으므로 TTL 안이면 메모리 값을 그대로 사용
+    card = POSTCARD_STORE.get(postcard_id)
+    if card is not None:
+        return card
+
+    # 2) Supabase 조회 후 저장소 갱신
+    if supabase_rest.configured:
         params = {"id": f"eq.{postcard_id}", "limit": 1}
         try:
-            resp = requests.get(endpoint, headers=supabase_headers(), params=params, timeout=8)
+            resp = supabase_rest.get("postcards", params=params)
             if resp.status_code == 200:
                 data = resp.json() or []
                 if data:
                     card = data[0]
-                    # 캐시에도 반영해 일관성 유지
-                    for plist in postcards.values():
-                        for idx, cached in enumerate(plist):
-                            if cached.get("id") == postcard_id:
-                                plist[idx] = card
-                                return card
+                    POSTCARD_STORE.refresh(card)
                     return card
             else:
                 print(f"⚠️ Supabase postcard fetch 실패 status={resp.status_code}, body={resp.text}")
         except Exception as exc:
             print(f"⚠️ Supabase postcard fetch 예외: {exc}")
 
-    # 2) 메모리 캐시 fallback
-    for plist in postcards.values():
-        for card in plist:
-            if card.get("id") == postcard_id:
-                return card
-    return None
+    # 3) Supabase 장애 시 TTL이 지난 메모리 값이라도 사용
+    return POSTCARD_STORE.peek(postcard_id)
 
 
 def store_postbox_supabase(postbox: dict):
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    if not supabase_rest.configured:
         print("⚠️ Supabase 설정이 없어 postboxes 저장을 건너뜁니다.")
         return None
-    endpoint = f"{SUPABASE_URL.rstrip('/')}/rest/v1/postboxes"
-    headers = supabase_headers()
-    headers["Prefer"] = "return=representation"
     payload = {
         "id": postbox["id"],
         "name": postbox.get("name"),
@@ -681,11 +434,15 @@ def store_postbox_supabase(postbox: dict):
         "is_opened": postbox.get("is_opened", False),
     }
     try:
-        resp = requests.post(endpoint, headers=headers, json=payload, timeout=8)
+        resp = supabase_rest.post("postboxes", payload)
         if resp.status_code not in (200, 201):
             print(f"⚠️ Supabase postboxes 저장 실패 status={resp.status_code}, body={resp.text}")
             return None
-        return resp.json()
+        saved = resp.json()
+        # 저장된 행으로 캐시를 덮어써 이전 값/음성 캐시가 남지 않게 한다
+        row = saved[0] if isinstance(saved, list) and saved else None
+        POSTBOX_CACHE.put(row if isinstance(row, dict) else payload)
+        return saved
     except Exception as exc:
         print(f"⚠️ Supabase postboxes 저장 예외: {exc}")
         return None
@@ -693,24 +450,21 @@ def store_postbox_supabase(postbox: dict):
 
 def ensure_postbox_supabase(postbox_id: str):
     """Supabase postboxes에 해당 postbox가 없으면 저장을 시도."""
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    if not supabase_rest.configured:
         return
     if fetch_postbox_supabase(postbox_id):
         return
-    pb = postboxes.get(postbox_id)
+    pb = POSTBOX_CACHE.peek(postbox_id)
     if pb:
         store_postbox_supabase(pb)
 
 
 def store_postcard_supabase(postbox_id: str, postcard: dict):
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    if not supabase_rest.configured:
         print("⚠️ Supabase 설정이 없어 postcards 저장을 건너뜁니다.")
         return None
     # 외래키 충돌 방지를 위해 postbox 레코드 확보
     ensure_postbox_supabase(postbox_id)
-    endpoint = f"{SUPABASE_URL.rstrip('/')}/rest/v1/postcards"
-    headers = supabase_headers()
-    headers["Prefer"] = "return=representation"
     # template_id를 integer로 변환 시도 (문자열에 숫자가 섞여 있으면 숫자만 추출)
     tpl_id_raw = postcard.get("template_id")
     tpl_id = None
@@ -753,7 +507,7 @@ def store_postcard_supabase(postbox_id: str, postcard: dict):
     if postcard.get("font_style"):
         payload["font_style"] = postcard.get("font_style")
     try:
-        resp = requests.post(endpoint, headers=headers, json=payload, timeout=8)
+        resp = supabase_rest.post("postcards", payload)
         if resp.status_code in (200, 201):
             return resp.json()
         if resp.status_code == 400:
@@ -764,14 +518,14 @@ def store_postcard_supabase(postbox_id: str, postcard: dict):
             if "sender_name" in resp.text:
                 fallback_payload.pop("sender_name", None)
             if fallback_payload != payload:
-                resp_retry = requests.post(endpoint, headers=headers, json=fallback_payload, timeout=8)
+                resp_retry = supabase_rest.post("postcards", fallback_payload)
                 if resp_retry.status_code in (200, 201):
                     print("ℹ️ Supabase가 일부 컬럼을 지원하지 않아 기본 필드로 저장했습니다.")
                     return resp_retry.json()
         # 외래키 부족 등으로 실패하면 한번 더 postbox upsert 시도 후 재시도
         if resp.status_code == 409:
             ensure_postbox_supabase(postbox_id)
-            resp_retry = requests.post(endpoint, headers=headers, json=payload, timeout=8)
+            resp_retry = supabase_rest.post("postcards", payload)
             if resp_retry.status_code in (200, 201):
                 return resp_retry.json()
             print(f"⚠️ Supabase postcards 재시도 실패 status={resp_retry.status_code}, body={resp_retry.text}")
@@ -784,9 +538,8 @@ def store_postcard_supabase(postbox_id: str, postcard: dict):
 
 # 카드 작성/미리보기/전송 관련 라우트는 별도 블루프린트로 분리
 postcard_bp = create_postcard_blueprint(
-    postboxes=postboxes,
-    postcards=postcards,
-    fetch_postbox_supabase=fetch_postbox_supabase,
+    postbox_cache=POSTBOX_CACHE,
+    postcard_store=POSTCARD_STORE,
     fetch_postcards_supabase=fetch_postcards_supabase,
     store_postbox_supabase=store_postbox_supabase,
     store_postcard_supabase=store_postcard_supabase,
@@ -878,12 +631,9 @@ def view_postcard(postcard_id):
     )
 
 def store_generated_url(original_url: str, base_url: str):
-    if not SUPABASE_URL or not SUPABASE_KEY:
+    if not supabase_rest.configured:
         print("⚠️ Supabase 설정이 없어 generated_urls 저장을 건너뜁니다.")
         return None
-    endpoint = f"{SUPABASE_URL.rstrip('/')}/rest/v1/generated_urls"
-    headers = supabase_headers()
-    headers["Prefer"] = "return=representation"
 
     last_error = None
     for _ in range(3):
@@ -892,7 +642,7 @@ def store_generated_url(original_url: str, base_url: str):
         payload = {"short_url": short_url, "original_url": original_url}
 
         try:
-            resp = requests.post(endpoint, headers=headers, json=payload, timeout=8)
+            resp = supabase_rest.post("generated_urls", payload)
         except Exception as exc:
             last_error = f"request failure: {exc}"
             break
@@ -922,43 +672,7 @@ def store_generated_url(original_url: str, base_url: str):
 
 def build_contextual_query(keyword: str):
     """키워드를 상황 설명 문장으로 확장하고, 테마별 대표 구절 목록도 함께 반환."""
-    keyword = (keyword or '').strip()
-    lowered = keyword.lower()
-    matched_contexts = []
-    curated_refs = []
-
-    for rule in THEME_CONTEXT_RULES:
-        tokens = rule["tokens"]
-        if any(token in keyword for token in tokens) or any(token in lowered for token in tokens):
-            matched_contexts.append(rule["description"])
-            curated_refs.extend(rule.get("curated_references", []))
-
-    if not matched_contexts:
-        matched_contexts.append(DEFAULT_CONTEXT_DESCRIPTION)
-
-    # 중복 제거하면서 순서 유지
-    seen_ctx = set()
-    unique_contexts = []
-    for ctx in matched_contexts:
-        if ctx not in seen_ctx:
-            unique_contexts.append(ctx)
-            seen_ctx.add(ctx)
-
-    seen_refs = set()
-    unique_refs = []
-    for ref in curated_refs:
-        ref = ref.strip()
-        if ref and ref not in seen_refs:
-            unique_refs.append(ref)
-            seen_refs.add(ref)
-
-    contextual_summary = ' / '.join(unique_contexts)
-    expanded = (
-        f"query: {keyword}. "
-        f"상황과 감정: {contextual_summary}. "
-        "주제와 맞닿은 성경의 약속, 위로, 격려, 도전, 하나님의 성품과 계획을 찾는다."
-    )
-    return expanded, unique_refs
+    return THEME_MATCHER.expand(keyword)
 
 
 KOREAN_STOPWORDS = {
@@ -1006,47 +720,11 @@ def greedy_terms(q: str):
     return out[:6]
 
 
-def greedy_match_count(terms, doc: str):
-    docc = re.sub(r"\s+", "", normalize_korean(doc or "").lower())
+def greedy_match_count(terms, doc: str, compact: str = None):
+    docc = compact if compact is not None else compact_text(doc)
     return sum(1 for t in terms if t and re.sub(r"\s+", "", t) in docc)
 
 
-def _parse_supabase_metadata(raw_meta):
-    if not raw_meta:
-        return {}
-    if isinstance(raw_meta, dict):
-        return raw_meta
-    if isinstance(raw_meta, str):
-        try:
-            parsed = json.loads(raw_meta)
-            return parsed if isinstance(parsed, dict) else {}
-        except Exception:
-            return {}
-    return {}
-
-
-def _extract_supabase_row(row: dict):
-    if not isinstance(row, dict):
-        return None
-    meta = _parse_supabase_metadata(row.get("metadata"))
-    doc = row.get("text") or row.get("content") or row.get("document") or row.get("verse_text")
-    reference = row.get("reference") or row.get("verse_reference") or row.get("ref")
-    distance = row.get("distance")
-    similarity = row.get("similarity")
-    if distance is None and similarity is not None:
-        distance = 1 - similarity
-    popularity = row.get("popularity")
-    if popularity is None:
-        popularity = meta.get("popularity", 0) if isinstance(meta, dict) else 0
-    return {
-        "doc": doc,
-        "reference": reference,
-        "meta": meta,
-        "distance": distance,
-        "popularity": popularity,
-    }
-
-
 def _supabase_vector_query(query_embedding, match_count=200):
     if not supabase_vec:
         return None, "SUPABASE_VEC_URL 또는 SUPABASE_VEC_KEY가 설정되지 않았습니다."
@@ -1077,76 +755,6 @@ def _supabase_vector_query(query_embedding, match_count=200):
     return None, last_error or "Supabase RPC 호출에 실패했습니다."
 
 
-def recommend_verses_supabase(query: str, page: int):
-    try:
-        print(f"\n🔍 검색 쿼리(Supabase): '{query}'")
-        query_text, _ = build_contextual_query(query)
-        expanded_terms = greedy_terms(query)
-        normalized_query = re.sub(r"\s+", "", normalize_korean(query or "").lower())
-
-        query_embedding = embedding_model.encode(query_text).tolist()
-        raw_rows, error = _supabase_vector_query(query_embedding, match_count=200)
-        if raw_rows is None:
-            return jsonify({"error": f"Supabase 검색 실패: {error}"}), 500
-
-        scored = []
-        for row in raw_rows:
-            parsed = _extract_supabase_row(row)
-            if not parsed:
-                continue
-            doc = parsed["doc"]
-            if not doc:
-                continue
-            meta = parsed["meta"]
-            reference = parsed["reference"] or build_reference_label(meta, doc)
-            pop = parsed["popularity"] or 0
-            dist = parsed["distance"]
-            semantic = 1 - dist if dist is not None else 0
-            greedy_hits = greedy_match_count(expanded_terms, doc)
-            greedy_bonus = min(0.18, greedy_hits * 0.06)
-            coverage = greedy_hits / max(1, len(expanded_terms)) if expanded_terms else 0
-            phrase_bonus = coverage * 0.1
-            if coverage >= 0.99:
-                phrase_bonus += 0.08
-            if normalized_query and normalized_query in re.sub(r"\s+", "", normalize_korean(doc or "").lower()):
-                phrase_bonus += 0.06
-            phrase_bonus = min(0.24, phrase_bonus)
-            final_score = semantic * 0.6 + (pop / 100.0) * 0.4 + phrase_bonus + greedy_bonus
-            scored.append((final_score, reference, doc, meta))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        page_size = 3
-        start_idx = page * page_size
-        end_idx = start_idx + page_size
-        page_slice = scored[start_idx:end_idx]
-        total_pages = (len(scored) + page_size - 1) // page_size if scored else 0
-
-        verses = []
-        for score, reference, doc, meta in page_slice:
-            verses.append(
-                {
-                    "reference": reference,
-                    "text": doc,
-                    "metadata": meta,
-                    "score": score,
-                }
-            )
-
-        has_more = end_idx < len(scored)
-        return jsonify({
-            "verses": verses,
-            "has_more": has_more,
-            "total_pages": total_pages,
-            "page": page,
-        })
-    except Exception as e:
-        print(f"❌ Supabase 검색 오류: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": f"검색 실패: {str(e)}"}), 500
-
-
-
 @app.route('/api/create-postbox', methods=['POST'])
 def create_postbox():
     data = request.get_json(silent=True) or {}
@@ -1160,7 +768,7 @@ def create_postbox():
     base_url = request.url_root.rstrip('/')
     postbox_path = f'/postbox/{postbox_id}'
     original_url = f"{base_url}{postbox_path}"
-    postboxes[postbox_id] = {
+    postbox = {
         'id': postbox_id,
         'name': name,
         'prayer_topic': prayer_topic,
@@ -1169,10 +777,21 @@ def create_postbox():
         'created_at': datetime.now().isoformat(),
         'is_opened': False
     }
-    postcards[postbox_id] = []
-
-    short_url = store_generated_url(original_url=original_url, base_url=base_url)
-    store_postbox_supabase(postboxes[postbox_id])
+    POSTCARD_STORE.ensure_list(postbox_id)
+    # Supabase 저장이 실패해도 이 워커에서는 우체통을 찾을 수 있도록 캐시에 먼저 넣어 둔다
+    POSTBOX_CACHE.put(postbox, local=True)
+
+    # 단축 URL 저장과 postbox 저장은 서로 독립적이므로 동시에 보낸다 (둘 다 실패해도 응답은 진행)
+    stored = supabase_fanout.gather(
+        {
+            "short_url": lambda: store_generated_url(original_url=original_url, base_url=base_url),
+            "postbox": lambda: store_postbox_supabase(postbox),
+        },
+        defaults={"short_url": None, "postbox": None},
+        # 선택 호출이지만 REST 예산보다 먼저 끊으면 저장은 성공했는데 응답에서만 빠진다
+        timeout=supabase_rest.timeout,
+    )
+    short_url = stored["short_url"]
     response_payload = {
         'postbox_id': postbox_id,
         'url': postbox_path,
@@ -1189,9 +808,111 @@ def create_mailbox_legacy():
     return create_postbox()
 
 
+def lookup_exact_reference(query: str):
+    """검색어가 "요 3:16" 같은 레퍼런스면 해당 구절을 반환."""
+    if not VERSE_SOURCE or not looks_like_reference(query):
+        return None
+    exact_hit = get_exact_verse_entry(query)
+    if not exact_hit:
+        print("   ⚠️ 레퍼런스 직접 매칭 없음 → 시맨틱/greedy 검색으로 진행")
+        return None
+    meta = exact_hit["metadata"] or {}
+    reference = meta.get("_reference_override") or build_reference_label(meta, exact_hit["text"])
+    return {
+        "reference": reference,
+        "text": exact_hit["text"],
+        "metadata": meta,
+        "verse_offsets": exact_hit.get("verse_offsets"),
+    }
+
+
+def resolve_curated_reference(normalized_key: str, reference_label: str):
+    if not VERSE_SOURCE:
+        return None
+    ensure_reference_index()
+    return THEME_MATCHER.curated_entry(normalized_key)
+
+
+# 검색 파이프라인: 벡터 검색 백엔드만 교체 가능하고 나머지 단계는 모든 모드가 공유한다
+if LOCAL_VERSE_INDEX:
+    search_backend = LocalIndexBackend(LOCAL_VERSE_INDEX)
+elif bible_collection:
+    search_backend = ChromaBackend(bible_collection)
+else:
+    search_backend = SupabaseRpcBackend(_supabase_vector_query)
+
+search_pipeline = VerseSearchPipeline(
+    backend=search_backend,
+    encode=lambda text: query_encoder.encode(text).tolist(),
+    build_contextual_query=build_contextual_query,
+    greedy_terms=greedy_terms,
+    build_reference_label=build_reference_label,
+    normalize_reference=normalize_reference,
+    exact_lookup=lookup_exact_reference,
+    resolve_curated=resolve_curated_reference,
+    lexical_backend=(
+        LexicalBackend(None, LOCAL_VERSE_INDEX, ensure=lambda: warmup.ensure("bigram_index"))
+        if LEXICAL_INDEX_ENABLED
+        else None
+    ),
+    result_cache=RECOMMEND_RESULT_CACHE,
+    semantic_cache=SEMANTIC_CANDIDATE_CACHE,
+    materialized=load_theme_results(THEME_RESULTS_PATH, backend=search_backend.name, model=encoder_id),
+    vector_candidates=VECTOR_CANDIDATE_COUNT,
+    lexical_candidates=LEXICAL_CANDIDATE_COUNT,
+    ranked_limit=RANKED_RESULT_LIMIT,
+    page_size=VERSE_PAGE_SIZE,
+)
+
+# 부팅 시 백그라운드에서 준비할 컴포넌트 (각각 single-flight로 한 번만 빌드)
+warmup = WarmupManager()
+warmup.register(
+    "verse_store",
+    build_verse_lookup_index,
+    required=not VERSE_SOURCE_REMOTE,
+    on_boot=not VERSE_SOURCE_REMOTE or VERSE_SOURCE_PRELOAD,
+)
+warmup.register(
+    "reference_index",
+    build_reference_index,
+    required=not VERSE_SOURCE_REMOTE,
+    on_boot=not VERSE_SOURCE_REMOTE or VERSE_SOURCE_PRELOAD,
+)
+warmup.register("query_encoder", lambda: query_encoder.encode("query: 워밍업"))
+
+
+def build_lexical_index():
+    """로컬 인덱스 compact 텍스트로 bigram 역색인을 만들어 문구 후보 백엔드에 붙인다."""
+    global BIGRAM_INDEX
+    if BIGRAM_INDEX is not None:
+        return
+    BIGRAM_INDEX = build_bigram_index(LOCAL_VERSE_INDEX.compacts)
+    search_pipeline.lexical_backend.bigram_index = BIGRAM_INDEX
+
+
+if LEXICAL_INDEX_ENABLED:
+    warmup.register("bigram_index", build_lexical_index)
+
+
+def build_theme_results(path: str = None):
+    """테마 검색어별 전체 정렬 목록을 계산해 파이프라인에 붙이고, path가 있으면 파일로 저장."""
+    # 대표 구절 주입이 결과에 들어가므로 구절 인덱스가 먼저 준비돼 있어야 한다
+    ensure_reference_index(block=True)
+    results = materialize_theme_results(search_pipeline, theme_queries(THEME_CONTEXT_RULES), model=encoder_id)
+    if path:
+        results.save(path)
+        print(f"💾 테마 추천 목록 저장: {path}")
+    search_pipeline.materialized = results
+    return results
+
+
+if search_pipeline.materialized is None and THEME_RESULTS_BUILD_ON_BOOT:
+    warmup.register("theme_results", build_theme_results, required=False)
+
+
 @app.route('/api/recommend-verses', methods=['POST'])
 def recommend_verses():
-    """레퍼런스 직접 매칭 → 문구 검색(greedy+semantic) 추천."""
+    """레퍼런스 직접 매칭 → 테마 대표 구절 → 문구 검색(greedy+semantic) 추천."""
     data = request.get_json(silent=True) or {}
     query = (data.get('query') or data.get('keyword') or '').strip()
     page = 0
@@ -1201,145 +922,12 @@ def recommend_verses():
         page = 0
     if not query:
         return jsonify({'error': '검색어가 필요합니다'}), 400
-    if not bible_collection:
-        return recommend_verses_supabase(query, page)
 
     try:
-        print(f"\n🔍 검색 쿼리: '{query}'")
-        ensure_reference_index()
-        ensure_verse_lookup_index()
-
-        # 1) 레퍼런스 직접 매칭 먼저 시도
-        exact_hit = get_exact_verse_entry(query)
-        if exact_hit:
-            meta = exact_hit["metadata"] or {}
-            ref_override = meta.get("_reference_override")
-            if ref_override:
-                reference = ref_override
-            else:
-                reference = build_reference_label(meta, exact_hit["text"])
-            print(f"   🎯 레퍼런스 직접 매칭 성공: {reference}")
-
-            return jsonify({
-                "verses": [
-                    {
-                        "reference": reference,
-                        "text": exact_hit["text"],
-                        "metadata": meta,
-                        "score": 1.0,
-                    }
-                ]
-            })
-        else:
-            print("   ⚠️ 레퍼런스 직접 매칭 없음 → 시맨틱/greedy 검색으로 진행")
-
-        # 2) 테마 토큰 매칭 → curated 구절 우선 주입
-        query_text, curated_refs = build_contextual_query(query)
-        curated_set = set()
-        curated_items = []
-        for ref in curated_refs:
-            key = normalize_reference(ref)
-            if not key or key in curated_set:
-                continue
-            curated_set.add(key)
-            hit = get_or_create_curated_entry(key, ref)
-            if hit:
-                meta = hit.get("metadata") or {}
-                doc = hit.get("text", "")
-                reference = build_reference_label(meta, doc)
-                pop = meta.get("popularity", 85)
-                curated_items.append({
-                    "reference": reference,
-                    "text": doc,
-                    "metadata": meta,
-                    "score": 1.8,
-                    "priority": "theme_top",
-                    "popularity": pop,
-                })
-            else:
-                print(f"     ⚠️ 대표 구절 미발견: {ref}")
-        if curated_items:
-            print(f"   🎯 테마 대표 구절 {len(curated_items)}개 주입")
-
-        # 3) 문구 검색: greedy + semantic 혼합
-        expanded_terms = greedy_terms(query)
-        normalized_query = re.sub(r"\s+", "", normalize_korean(query or "").lower())
-        print(f"   🔎 greedy 핵심어: {expanded_terms if expanded_terms else '없음'}")
-        query_embedding = embedding_model.encode(query_text).tolist()
-        raw_results = bible_collection.query(
-            query_embeddings=[query_embedding],
-            n_results=200,
-            include=["documents", "metadatas", "distances"],
-        )
-
-        docs = (raw_results.get("documents") or [[]])[0]
-        metas = (raw_results.get("metadatas") or [[]])[0]
-        dists = (raw_results.get("distances") or [[]])[0]
-
-        scored = []
-        for doc, meta, dist in zip(docs, metas, dists):
-            if not doc:
-                continue
-            meta = meta or {}
-            reference = meta.get("reference") or build_reference_label(meta, doc)
-            if normalize_reference(reference) in curated_set:
-                continue
-            pop = meta.get("popularity", 0)
-            semantic = 1 - dist if dist is not None else 0
-            greedy_hits = greedy_match_count(expanded_terms, doc)
-            greedy_bonus = min(0.18, greedy_hits * 0.06)
-            coverage = greedy_hits / max(1, len(expanded_terms)) if expanded_terms else 0
-            phrase_bonus = coverage * 0.1  # 핵심어 커버리지 보너스
-            if coverage >= 0.99:  # 모든 핵심어를 포함하면 추가 가산
-                phrase_bonus += 0.08
-            if normalized_query and normalized_query in re.sub(r"\s+", "", normalize_korean(doc or "").lower()):
-                phrase_bonus += 0.06  # 전체 문구가 연속해 들어있으면 추가 보너스
-            phrase_bonus = min(0.24, phrase_bonus)
-            final_score = semantic * 0.6 + (pop / 100.0) * 0.4 + phrase_bonus + greedy_bonus
-
-            scored.append((final_score, reference, doc, meta))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        all_candidates_full = curated_items + scored
-        page_size = 3
-        start_idx = page * page_size
-        end_idx = start_idx + page_size
-        # 요청한 페이지까지 필요한 만큼만 슬라이스
-        needed = end_idx
-        all_candidates = all_candidates_full[:needed]
-        page_slice = all_candidates[start_idx:end_idx]
-        total_pages = (len(all_candidates_full) + page_size - 1) // page_size if all_candidates_full else 0
-
-        verses = []
-        for entry in page_slice:
-            if isinstance(entry, tuple):
-                score, reference, doc, meta = entry
-            else:
-                score = entry.get("score", entry.get("final_score", 1.0))
-                reference = entry.get("reference")
-                doc = entry.get("text")
-                meta = entry.get("metadata", {})
-
-            print(f"  📌 [{reference}] score={round(score,4)}")
-            snippet = re.sub(r"\s+", " ", (doc or ""))[:120]
-            print(f"     {snippet}...")
-            verses.append(
-                {
-                    "reference": reference,
-                    "text": doc,
-                    "metadata": meta,
-                    "score": score,
-                }
-            )
-
-        has_more = end_idx < len(all_candidates_full)
-        return jsonify({
-            "verses": verses,
-            "has_more": has_more,
-            "total_pages": total_pages,
-            "page": page,
-        })
-    
+        return jsonify(search_pipeline.run(query, page))
+    except RetrievalError as e:
+        print(f"❌ {e}")
+        return jsonify({"error": str(e)}), 500
     except Exception as e:
         print(f"❌ 검색 오류: {str(e)}")
         import traceback
@@ -1347,6 +935,39 @@ def recommend_verses():
         return jsonify({"error": f"검색 실패: {str(e)}"}), 500
 
 
+@app.route('/healthz/ready')
+def readiness():
+    """컴포넌트별 준비 상태. 모두 준비되기 전에는 503 (Cloud Run startup probe용)."""
+    status = warmup.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+
+@app.route('/healthz/caches')
+def cache_stats():
+    """캐시 적중률/크기 확인용."""
+    return jsonify({
+        "recommend_results": RECOMMEND_RESULT_CACHE.stats(),
+        "semantic_candidates": SEMANTIC_CANDIDATE_CACHE.stats() if SEMANTIC_CANDIDATE_CACHE is not None else None,
+        "query_embeddings": query_encoder.stats(),
+        "search_pipeline": search_pipeline.stats(),
+        "reference_misses": REFERENCE_MISS_CACHE.stats(),
+        "reference_helpers": reference_memo_stats(),
+        "theme_matcher": THEME_MATCHER.stats(),
+        "theme_results": search_pipeline.materialized.stats() if search_pipeline.materialized is not None else None,
+        "verse_store": VERSE_STORE.stats() if VERSE_STORE is not None else None,
+        "supabase_rest": supabase_rest.stats(),
+        "supabase_fanout": supabase_fanout.stats(),
+    })
+
+
+@app.route('/healthz/memory')
+def memory_store_stats():
+    """워커 메모리에 들고 있는 우체통/엽서 저장소의 크기, 내보낸 수, 적중률."""
+    return jsonify({
+        "postboxes": POSTBOX_CACHE.stats(),
+        "postcards": POSTCARD_STORE.stats(),
+    })
+
 
 def format_results(results):
     """ChromaDB 결과를 포맷팅하는 헬퍼 함수"""
@@ -1372,8 +993,8 @@ def format_results(results):
     return formatted
 
 def open_all_postboxes():
-    for postbox_id in postboxes:
-        postboxes[postbox_id]['is_opened'] = True
+    for postbox in POSTBOX_CACHE.rows():
+        postbox['is_opened'] = True
 
 
 
@@ -1480,6 +1101,8 @@ def create_postbox_action():
 
         # DB에 저장 (이때 SQL에서 만든 트리거가 bible_users의 flag를 true로 바꿈)
         result = supabase.table('postboxes').insert(postbox_data).execute()
+        # 직전에 없는 주소로 조회돼 음성 캐시에 남아 있을 수 있으므로 무효화
+        POSTBOX_CACHE.invalidate(url=unique_path)
 
         if result.data:
             return jsonify({
@@ -1512,38 +1135,50 @@ def view_postbox(url_path):
     try:
         print(f"[view_postbox] url_path={url_path}")
         print(f"[view_postbox] session user_email={session.get('user_email')}, nickname={session.get('user_nickname')}")
-        # 1. DB의 'postboxes' 테이블에서 url 컬럼이 url_path와 일치하는 데이터 조회
-        result = supabase.table('postboxes').select("*").eq("url", url_path).execute()
+        user_email = session.get('user_email')
+        end_date = session.get('end_date') or '2026-01-01'
+
+        # 우체통 조회, 편지 개수, 로그인 유저 조회를 동시에 보낸다.
+        # 편지 개수는 postbox id 대신 postboxes.url로 inner join 필터를 걸어 우체통 조회를 기다리지 않는다.
+        # (postcards.postbox_id → postboxes.id 외래 키 필요, check_supabase_embeds.py로 확인)
+        # 세 호출 모두 FANOUT_DEADLINE(기본 = REST 예산)을 공유하고, 넘기면 504를 돌려준다.
+        # .count("exact")를 사용하면 데이터 본문 대신 개수만 효율적으로 가져옵니다.
+        calls = {
+            "postbox": lambda: POSTBOX_CACHE.get_by_url(url_path),
+            "postcard_count": lambda: supabase.table('postcards')
+                .select("id, postboxes!inner(url)", count="exact")
+                .eq("postboxes.url", url_path)
+                .limit(1)
+                .execute(),
+        }
+        if user_email:
+            calls["user"] = lambda: supabase.table('bible_users').select("id").eq("email", user_email).execute()
+        fetched = supabase_fanout.gather(calls)
+
+        # 1. 'postboxes' 테이블에서 url 컬럼이 url_path와 일치하는 행 (캐시 → DB)
+        postbox = fetched["postbox"]
 
         # 2. 데이터가 없는 경우 (잘못된 주소)
-        if not result.data:
+        if not postbox:
             print(f"No postbox found in DB for URL: {url_path}")
             return "우체통을 찾을 수 없습니다.", 404
 
-        postbox = result.data[0] # 첫 번째 검색 결과 가져오기
         print(f"[view_postbox] postbox.id={postbox.get('id')}, owner_id={postbox.get('owner_id')}")
         postbox_id = postbox['id']
 
-        # 2. 해당 우체통에 담긴 편지 개수 세기 (count)
-        # .count("exact")를 사용하면 데이터 본문 대신 개수만 효율적으로 가져옵니다.
-        postcard_count_res = supabase.table('postcards') \
-            .select("*", count="exact") \
-            .eq("postbox_id", postbox_id) \
-            .execute()
-        
+        # 2. 해당 우체통에 담긴 편지 개수
+        postcard_count_res = fetched["postcard_count"]
         postcard_count = postcard_count_res.count if postcard_count_res.count is not None else 0
 
        # 2. 현재 접속자가 주인인지 확인 (세션 기반)
         # 세션의 이메일과 DB의 owner_id(또는 연동된 이메일)를 비교
         # 여기서는 단순화를 위해 세션 이메일이 있고, 해당 유저의 id와 pb['owner_id']가 같은지 확인이 필요합니다.
         # 일단은 로그인 기능을 고려해 아래와 같이 구성합니다.
-        user_email = session.get('user_email')
-        end_date = session.get('end_date') or '2026-01-01'
         is_owner = False
         
         # 주인을 확인하기 위해 현재 로그인된 유저의 UUID를 가져와야 함
         if user_email:
-            user_res = supabase.table('bible_users').select("id").eq("email", user_email).execute()
+            user_res = fetched["user"]
             print(f"[view_postbox] user_res={user_res.data}")
             if user_res.data and user_res.data[0]['id'] == postbox['owner_id']:
                 is_owner = True
@@ -1577,6 +1212,9 @@ def view_postbox(url_path):
                                supabase_url=os.environ.get('SUPABASE_URL'),
                                supabase_key=SUPABASE_ANON_KEY)
 
+    except FanOutTimeout as e:
+        print(f"[view_postbox] {e}")
+        return "우체통을 불러오는 데 시간이 너무 오래 걸립니다. 잠시 후 다시 시도해 주세요.", 504
     except Exception as e:
         print(f"Error: {e}")
         return "오류가 발생했습니다.", 500
@@ -1591,7 +1229,7 @@ def index():
             
             if user_res.data and user_res.data[0]['flag'] is True:
                 # 우체통이 이미 있다면 내 우체통으로 리다이렉트
-                pb_res = supabase.table('postboxes').select("url").eq("owner_id", user_res.data[0]['id']).execute()
+                pb_res = supabase.table('postboxes').select("url").eq("owner_id", user_res.data[0]['id']).limit(1).execute()
                 if pb_res.data:
                     return redirect(f"/postbox/{pb_res.data[0]['url']}")
             
@@ -1623,13 +1261,16 @@ scheduler.add_job(
 )
 scheduler.start()
 
+if os.environ.get("WARMUP_ON_BOOT", "1") != "0":
+    warmup.start()
+
 
 if __name__ == '__main__':
     print("\n" + "="*50)
     print("🚀 Flask 서버 시작")
     print("✅ 인기도 필터링 활성화 (3-tier 검색)")
-    ensure_reference_index()
     ensure_verse_lookup_index()
+    ensure_reference_index()
     
     # 환경 감지
     is_local = os.environ.get('RENDER') is None  # Render는 자동으로 RENDER 환경변수 설정
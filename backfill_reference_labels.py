@@ -0,0 +1,105 @@
+# backfill_reference_labels.py
+# 기존 Chroma / Supabase 구절 행의 metadata에 reference_label, verse_spans, compact를 한 번 채워 넣는다.
+#   python backfill_reference_labels.py [chroma|supabase|all]
+# 이미 같은 값이 있는 행은 건너뛰므로 여러 번 돌려도 안전하다.
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from verse_reference import COMPACT_FIELD, REFERENCE_LABEL_FIELD, VERSE_SPANS_FIELD, ingest_metadata
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"), override=True)
+
+CHROMA_DB_PATH = os.environ.get("VERSE_INDEX_SOURCE_DB", "./vectordb_e5small")
+CHROMA_COLLECTION = os.environ.get("VERSE_INDEX_SOURCE_COLLECTION", "bible")
+SUPABASE_VEC_TABLE = os.environ.get("SUPABASE_VEC_TABLE", "bible_verses")
+SUPABASE_VEC_TEXT_COLUMN = os.environ.get("SUPABASE_VEC_TEXT_COLUMN", "content")
+
+BATCH = 500
+
+
+def needs_update(meta, fresh):
+    meta = meta or {}
+    return any(meta.get(field) != fresh[field] for field in (REFERENCE_LABEL_FIELD, VERSE_SPANS_FIELD, COMPACT_FIELD))
+
+
+def backfill_chroma():
+    import chromadb
+
+    print("1) ChromaDB 로드:", CHROMA_DB_PATH)
+    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    col = client.get_collection(name=CHROMA_COLLECTION)
+    total = col.count()
+    print(f"   - count: {total}")
+
+    updated = 0
+    offset = 0
+    while offset < total:
+        got = col.get(include=["documents", "metadatas"], limit=BATCH, offset=offset)
+        if not got["ids"]:
+            break
+        ids, metas = [], []
+        for id_, doc, meta in zip(got["ids"], got["documents"], got["metadatas"]):
+            fresh = ingest_metadata(meta, doc)
+            if not needs_update(meta, fresh):
+                continue
+            ids.append(id_)
+            metas.append(fresh)
+        if ids:
+            col.update(ids=ids, metadatas=metas)
+            updated += len(ids)
+        offset += len(got["ids"])
+        print(f"   - {offset}/{total} (갱신 {updated})")
+    print(f"✅ Chroma 백필 완료: {updated}개 갱신")
+
+
+def backfill_supabase():
+    from supabase import create_client
+
+    url = os.environ.get("SUPABASE_VEC_URL") or os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_VEC_KEY") or os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        print("⚠️ SUPABASE_VEC_URL / SUPABASE_VEC_KEY가 없어 Supabase 백필을 건너뜁니다.")
+        return
+    client = create_client(url, key)
+    table = client.table(SUPABASE_VEC_TABLE)
+    print(f"1) Supabase 테이블: {SUPABASE_VEC_TABLE}")
+
+    updated = 0
+    offset = 0
+    while True:
+        rows = (
+            table.select(f"id, metadata, {SUPABASE_VEC_TEXT_COLUMN}")
+            .order("id")
+            .range(offset, offset + BATCH - 1)
+            .execute()
+            .data
+        ) or []
+        if not rows:
+            break
+        for row in rows:
+            meta = row.get("metadata") or {}
+            if isinstance(meta, str):
+                meta = json.loads(meta)
+            fresh = ingest_metadata(meta, row.get(SUPABASE_VEC_TEXT_COLUMN))
+            if not needs_update(meta, fresh):
+                continue
+            table.update({"metadata": fresh}).eq("id", row["id"]).execute()
+            updated += 1
+        offset += len(rows)
+        print(f"   - {offset}행 확인 (갱신 {updated})")
+    print(f"✅ Supabase 백필 완료: {updated}개 갱신")
+
+
+def main():
+    target = sys.argv[1] if len(sys.argv) > 1 else "all"
+    if target in ("chroma", "all"):
+        backfill_chroma()
+    if target in ("supabase", "all"):
+        backfill_supabase()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# bench_book_names.py
+# 책 이름 해석: 기존 정규식 + 사전 조회 방식과 BookNameTrie의 호출당 비용 비교.
+#   python bench_book_names.py
+import re
+import timeit
+
+from book_names import BOOK_TRIE, CANONICAL_BOOKS, resolve_book, split_book_prefix
+from popular_verses import BOOK_NAME_MAP, normalize_korean
+
+# ----- 기존 구현 (app.py에서 그대로 옮김) -----
+LEGACY_ABBREVIATIONS = {
+    "마": "마태복음", "막": "마가복음", "눅": "누가복음", "요": "요한복음",
+    "롬": "로마서", "고전": "고린도전서", "고후": "고린도후서", "갈": "갈라디아서",
+    "엡": "에베소서", "빌": "빌립보서", "골": "골로새서", "살전": "데살로니가전서",
+    "살후": "데살로니가후서", "딤전": "디모데전서", "딤후": "디모데후서",
+    "약": "야고보서", "벧전": "베드로전서", "벧후": "베드로후서",
+    "mt": "마태복음", "matt": "마태복음", "mk": "마가복음", "lk": "누가복음",
+    "jn": "요한복음", "rom": "로마서", "1th": "데살로니가전서", "2th": "데살로니가후서",
+    "eph": "에베소서", "phil": "빌립보서", "jas": "야고보서",
+}
+LEGACY_INPUT_PATTERN = re.compile(
+    r'^\s*([0-9]{0,1}\s*[가-힣A-Za-z]{1,30})\s*([0-9]{1,3})\s*(?:[:장]\s*([0-9]{1,3}))\s*(?:[-–—~]\s*([0-9]{1,3}))?\s*(?:절)?\s*$'
+)
+KNOWN_BOOKS = set(BOOK_NAME_MAP.values())
+
+
+def legacy_canonical_book_name(book):
+    book_key = normalize_korean(book or '').replace(" ", "")
+    if not book_key:
+        return ''
+    if book_key.lower() in LEGACY_ABBREVIATIONS:
+        return LEGACY_ABBREVIATIONS[book_key.lower()]
+    if book_key in LEGACY_ABBREVIATIONS:
+        return LEGACY_ABBREVIATIONS[book_key]
+    return BOOK_NAME_MAP.get(book_key, book_key)
+
+
+def legacy_parse_book(text):
+    m = LEGACY_INPUT_PATTERN.match(normalize_korean(text or ""))
+    return legacy_canonical_book_name(m.group(1)) if m else ''
+
+
+def legacy_marker_book(token):
+    for i in range(len(token)):
+        book = legacy_canonical_book_name(token[i:])
+        if book in KNOWN_BOOKS:
+            return book
+    return ''
+
+
+# ----- 측정 -----
+NAMES = ["요한복음", "고전", "시편", "Psalms", "1 Corinthians", "창", "Revelation", "요일", "jn", "빌립보서"]
+REFERENCES = ["요한복음 3:16", "고전 13:4-7", "시 23:1", "1 Corinthians 13:4", "창세기 1장 1절", "롬 8:28"]
+MARKERS = ["고후", "위로하리라요", "하나님이시라빌", "살전"]
+
+
+def per_call_us(fn, inputs, number=20000):
+    total = timeit.timeit(lambda: [fn(x) for x in inputs], number=number)
+    return total / (number * len(inputs)) * 1e6
+
+
+def coverage(fn, inputs):
+    return sum(1 for x in inputs if fn(x) in KNOWN_BOOKS)
+
+
+def trie_marker_book(token):
+    book_id, _ = BOOK_TRIE.match_suffix(token)
+    return CANONICAL_BOOKS[book_id] if book_id >= 0 else ''
+
+
+def main():
+    rows = [
+        ("canonical_book_name", legacy_canonical_book_name, resolve_book, NAMES),
+        ("reference book parse", legacy_parse_book, lambda t: split_book_prefix(t)[0], REFERENCES),
+        ("verse marker book", legacy_marker_book, trie_marker_book, MARKERS),
+    ]
+    print(f"{'case':<24}{'legacy us':>11}{'trie us':>10}{'legacy hit':>12}{'trie hit':>10}")
+    for label, legacy, trie, inputs in rows:
+        print(
+            f"{label:<24}{per_call_us(legacy, inputs):>11.2f}{per_call_us(trie, inputs):>10.2f}"
+            f"{coverage(legacy, inputs):>8}/{len(inputs):<3}{coverage(trie, inputs):>6}/{len(inputs)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
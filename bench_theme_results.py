@@ -0,0 +1,103 @@
+# bench_theme_results.py
+# 테마 추천 결과표: 실제 THEME_CONTEXT_RULES 기준 생성 비용과 조회 비용.
+#   python bench_theme_results.py          # 조회 비용 (모델/벡터 백엔드를 호출하면 예외)
+#   python bench_theme_results.py --build  # + app 설정(모델/백엔드) 그대로 실제 생성 시간 측정
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from search_pipeline import VerseSearchPipeline, normalize_query_key
+from theme_results import MaterializedResults, theme_queries
+from theme_rules import THEME_CONTEXT_RULES
+
+RANKED_LIMIT = int(os.environ.get("RANKED_RESULT_LIMIT", "60"))
+
+
+class ForbiddenBackend:
+    name = "local"
+
+    def retrieve(self, *args, **kwargs):
+        raise AssertionError("벡터 백엔드가 호출됨")
+
+
+def forbidden_encode(text):
+    raise AssertionError("임베딩 모델이 호출됨")
+
+
+def placeholder_ranked(query):
+    # 조회 비용만 보는 단계라 목록 내용은 실제 행과 같은 모양/길이의 자리표시자
+    return [
+        {
+            "reference": f"시편 {i // 10 + 1}:{i % 10 + 1}",
+            "text": f"{query} 관련 구절 본문 {i} " * 4,
+            "metadata": {"source": "시편", "popularity": i % 7},
+            "score": 1.0 - i * 0.01,
+        }
+        for i in range(RANKED_LIMIT)
+    ]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def bench_build(queries):
+    """app과 같은 모델/백엔드로 실제 결과표를 만든다 (검색어마다 인코딩 1회 + 벡터 검색 1회)."""
+    os.environ.setdefault("WARMUP_ON_BOOT", "0")
+    import app
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = app.build_theme_results(None)
+    elapsed = time.perf_counter() - started
+    print(
+        f"실제 생성({results.backend}/{results.model}): {len(queries)}개 검색어 {elapsed:.1f}s "
+        f"(검색어당 {elapsed / len(queries) * 1000:.0f}ms)"
+    )
+
+
+def main():
+    queries = theme_queries(THEME_CONTEXT_RULES)
+    print(
+        f"테마 {len(THEME_CONTEXT_RULES)}개 → 검색어 {len(queries)}개 "
+        f"(생성 시 인코딩 {len(queries)}회 + 벡터 검색 {len(queries)}회)"
+    )
+    if "--build" in sys.argv:
+        bench_build(queries)
+
+    results = MaterializedResults(
+        {normalize_query_key(q): placeholder_ranked(q) for q in queries}, backend="local", model="bench"
+    )
+    path = os.path.join(tempfile.mkdtemp(), "theme_results.json")
+    results.save(path)
+    loaded = MaterializedResults.load(path)
+    print(f"결과표 파일 {os.path.getsize(path) / 1024:.1f}KB (검색어당 {RANKED_LIMIT}개)")
+
+    pipeline = VerseSearchPipeline(
+        backend=ForbiddenBackend(),
+        encode=forbidden_encode,
+        build_contextual_query=lambda q: (q, []),
+        greedy_terms=lambda q: [],
+        build_reference_label=lambda meta, doc: "",
+        normalize_reference=lambda ref: ref,
+        materialized=loaded,
+    )
+
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(50):
+            for query in queries:
+                for page in (0, 1):
+                    started = time.perf_counter()
+                    payload = pipeline.run(f" {query} ", page)
+                    samples.append((time.perf_counter() - started) * 1e6)
+                    assert len(payload["verses"]) == pipeline.page_size
+    print(f"조회 run() {len(samples)}회: p50={percentile(samples, 0.5):.1f}µs p95={percentile(samples, 0.95):.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
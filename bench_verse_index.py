@@ -0,0 +1,80 @@
+# bench_verse_index.py
+# 로컬 구절 인덱스의 float32 / float16 / int8 (+float32 rescore) 모드별 recall@k와 지연 시간 비교.
+#   python bench_verse_index.py [인덱스 디렉터리]
+# 인덱스 디렉터리가 없으면 31k × 384 무작위 임베딩으로 임시 인덱스를 만들어 측정한다.
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from verse_index import LocalVerseIndex, write_verse_index
+
+QUERIES = 200
+KS = (10, 50, 200)
+MODES = [
+    ("float32", 0),
+    ("float16", 0),
+    ("int8", 0),
+    ("int8", 200),
+    ("int8", 400),
+]
+
+
+def make_synthetic_index(rows=31000, dim=384, seed=0):
+    directory = tempfile.mkdtemp(prefix="verse_index_bench_")
+    rng = np.random.default_rng(seed)
+    # 실제 문장 임베딩처럼 몇 개 축에 분산이 몰린 분포를 흉내 낸다
+    basis = rng.normal(size=(32, dim)).astype(np.float32)
+    embeddings = rng.normal(size=(rows, 32)).astype(np.float32) @ basis
+    embeddings += 0.3 * rng.normal(size=(rows, dim)).astype(np.float32)
+    ids = [f"v{i}" for i in range(rows)]
+    write_verse_index(directory, ids, [""] * rows, [{}] * rows, embeddings)
+    return directory
+
+
+def make_queries(index, count, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), size=count, replace=False)
+    base = np.asarray(index.embeddings[rows], dtype=np.float32)
+    return base + 0.05 * rng.normal(size=base.shape).astype(np.float32)
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else None
+    if not directory or not os.path.exists(directory):
+        print("ℹ️ 인덱스 디렉터리가 없어 무작위 임베딩으로 측정합니다.")
+        directory = make_synthetic_index()
+
+    exact = LocalVerseIndex(directory)
+    queries = make_queries(exact, QUERIES)
+    max_k = max(KS)
+    truth = [set(exact.search(q, max_k)[0][:k]) for q in queries for k in KS]
+
+    print(f"📊 {len(exact)}개 × {exact.dimension}차원, 질의 {QUERIES}개\n")
+    header = f"{'mode':<16}{'matrix MB':>10}" + "".join(f"{f'recall@{k}':>12}" for k in KS) + f"{'p50 ms':>9}{'p95 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for dtype, rescore in MODES:
+        index = LocalVerseIndex(directory, dtype=dtype, rescore=rescore)
+        latencies = []
+        hits = {k: 0.0 for k in KS}
+        t = 0
+        for q in queries:
+            started = time.perf_counter()
+            rows, _ = index.search(q, max_k)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            for k in KS:
+                hits[k] += len(truth[t] & set(rows[:k])) / k
+                t += 1
+        matrix_mb = index._scoring.nbytes / (1024 * 1024)
+        label = dtype + (f"+rescore{rescore}" if rescore else "")
+        row = f"{label:<16}{matrix_mb:>10.1f}"
+        row += "".join(f"{hits[k] / QUERIES:>12.4f}" for k in KS)
+        row += f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 95):>9.2f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
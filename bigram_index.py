@@ -0,0 +1,100 @@
+# bigram_index.py
+import math
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from verse_index import top_k_indices
+
+_NON_WORD = re.compile(r"[^\w]")
+
+
+def char_bigrams(compact: str):
+    """compact 텍스트(공백 제거)에서 문장부호를 뺀 문자 bigram 목록."""
+    chars = _NON_WORD.sub("", compact or "")
+    return [chars[i:i + 2] for i in range(len(chars) - 1)]
+
+
+class BigramIndex:
+    """한글 문자 bigram 역색인 + BM25 점수.
+
+    posting은 bigram별로 (문서 번호 delta, tf)를 하나의 array('I') / array('H')에
+    이어 붙여 저장하고, bigram → (시작 위치, 길이)만 dict로 들고 있는다.
+    문서 번호는 delta 인코딩이라 조회 시 np.cumsum으로 복원한다.
+    """
+
+    def __init__(self, compact_docs, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(compact_docs)
+
+        postings = {}
+        doc_lengths = np.zeros(self.doc_count, dtype=np.float32)
+        for doc_id, compact in enumerate(compact_docs):
+            grams = Counter(char_bigrams(compact))
+            doc_lengths[doc_id] = sum(grams.values())
+            for gram, tf in grams.items():
+                postings.setdefault(gram, []).append((doc_id, tf))
+
+        self._terms = {}
+        deltas = array("I")
+        tfs = array("H")
+        for gram, plist in postings.items():
+            start = len(deltas)
+            prev = 0
+            for doc_id, tf in plist:
+                deltas.append(doc_id - prev)
+                tfs.append(min(tf, 0xFFFF))
+                prev = doc_id
+            self._terms[gram] = (start, len(plist))
+        self._deltas = np.frombuffer(deltas, dtype=np.uint32) if len(deltas) else np.zeros(0, np.uint32)
+        self._tfs = np.frombuffer(tfs, dtype=np.uint16) if len(tfs) else np.zeros(0, np.uint16)
+        # np.frombuffer는 버퍼를 참조만 하므로 원본 array를 붙잡아 둔다
+        self._buffers = (deltas, tfs)
+        avgdl = float(doc_lengths.mean()) if self.doc_count else 0.0
+        self._length_norm = k1 * (1 - b + b * doc_lengths / (avgdl or 1.0))
+
+    def __len__(self):
+        return self.doc_count
+
+    @property
+    def posting_count(self) -> int:
+        return int(self._deltas.shape[0])
+
+    def postings(self, gram: str):
+        """(문서 번호 배열, tf 배열). 없는 bigram이면 빈 배열."""
+        entry = self._terms.get(gram)
+        if not entry:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint16)
+        start, length = entry
+        doc_ids = np.cumsum(self._deltas[start:start + length], dtype=np.int64)
+        return doc_ids, self._tfs[start:start + length]
+
+    def search(self, compact_query: str, k: int):
+        """BM25 상위 k개 (행 번호 배열, 점수 배열). 매칭이 없으면 빈 배열."""
+        grams = set(char_bigrams(compact_query))
+        if not grams or not self.doc_count:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for gram in grams:
+            doc_ids, tfs = self.postings(gram)
+            df = doc_ids.shape[0]
+            if not df:
+                continue
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float32)
+            scores[doc_ids] += idf * tf * (self.k1 + 1) / (tf + self._length_norm[doc_ids])
+        matched = np.flatnonzero(scores > 0)
+        if not matched.shape[0]:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        order = top_k_indices(scores[matched], k)
+        rows = matched[order]
+        return rows, scores[rows]
+
+
+def build_bigram_index(compact_docs):
+    index = BigramIndex(compact_docs)
+    print(f"✅ bigram 역색인 준비 완료: 문서 {len(index)}개, bigram {len(index._terms)}개, posting {index.posting_count}개")
+    return index
@@ -0,0 +1,167 @@
+# book_names.py
+from popular_verses import BOOK_NAME_MAP, normalize_korean
+
+# 성경 순서대로 고정된 책 번호 (VerseStore와 같은 번호 체계)
+CANONICAL_BOOKS = list(BOOK_NAME_MAP.values())
+BOOK_IDS = {name: i for i, name in enumerate(CANONICAL_BOOKS)}
+
+# 책별 별칭: 한글 약어(개역개정 표기) + 영문 약어. 한글/영문 전체 이름은 자동으로 들어간다.
+BOOK_ALIASES = {
+    "창세기": ["창", "창세"], "출애굽기": ["출", "출애굽"], "레위기": ["레"], "민수기": ["민"],
+    "신명기": ["신"], "여호수아": ["수"], "사사기": ["삿"], "룻기": ["룻"],
+    "사무엘상": ["삼상"], "사무엘하": ["삼하"], "열왕기상": ["왕상"], "열왕기하": ["왕하"],
+    "역대상": ["대상"], "역대하": ["대하"], "에스라": ["스"], "느헤미야": ["느"],
+    "에스더": ["에"], "욥기": ["욥"], "시편": ["시"], "잠언": ["잠"],
+    "전도서": ["전"], "아가": ["아"], "이사야": ["사"], "예레미야": ["렘"],
+    "예레미야애가": ["애", "애가"], "에스겔": ["겔"], "다니엘": ["단"], "호세아": ["호"],
+    "요엘": ["욜"], "아모스": ["암"], "오바댜": ["옵"], "요나": ["욘"],
+    "미가": ["미"], "나훔": ["나"], "하박국": ["합"], "스바냐": ["습"],
+    "학개": ["학"], "스가랴": ["슥"], "말라기": ["말"],
+    "마태복음": ["마", "마태"], "마가복음": ["막", "마가"], "누가복음": ["눅", "누가"],
+    "요한복음": ["요", "요한"], "사도행전": ["행"], "로마서": ["롬"],
+    "고린도전서": ["고전"], "고린도후서": ["고후"], "갈라디아서": ["갈"], "에베소서": ["엡"],
+    "빌립보서": ["빌"], "골로새서": ["골"], "데살로니가전서": ["살전"], "데살로니가후서": ["살후"],
+    "디모데전서": ["딤전"], "디모데후서": ["딤후"], "디도서": ["딛"], "빌레몬서": ["몬"],
+    "히브리서": ["히"], "야고보서": ["약"], "베드로전서": ["벧전"], "베드로후서": ["벧후"],
+    "요한일서": ["요일", "요한1서"], "요한이서": ["요이", "요한2서"], "요한삼서": ["요삼", "요한3서"],
+    "유다서": ["유"], "요한계시록": ["계", "계시록"],
+}
+
+ENGLISH_ABBREVIATIONS = {
+    "창세기": ["gen"], "출애굽기": ["ex", "exod"], "레위기": ["lev"], "민수기": ["num"],
+    "신명기": ["deut"], "여호수아": ["josh"], "사사기": ["judg"],
+    "사무엘상": ["1sam"], "사무엘하": ["2sam"], "열왕기상": ["1kgs"], "열왕기하": ["2kgs"],
+    "역대상": ["1chr"], "역대하": ["2chr"], "느헤미야": ["neh"], "에스더": ["esth"],
+    "시편": ["ps", "psa", "psalm"], "잠언": ["prov"], "전도서": ["eccl"], "아가": ["song"],
+    "이사야": ["isa"], "예레미야": ["jer"], "예레미야애가": ["lam"], "에스겔": ["ezek"],
+    "다니엘": ["dan"], "호세아": ["hos"], "오바댜": ["obad"], "미가": ["mic"],
+    "나훔": ["nah"], "하박국": ["hab"], "스바냐": ["zeph"], "학개": ["hag"],
+    "스가랴": ["zech"], "말라기": ["mal"],
+    "마태복음": ["mt", "matt"], "마가복음": ["mk"], "누가복음": ["lk"], "요한복음": ["jn"],
+    "로마서": ["rom"], "고린도전서": ["1cor"], "고린도후서": ["2cor"], "갈라디아서": ["gal"],
+    "에베소서": ["eph"], "빌립보서": ["phil"], "골로새서": ["col"],
+    "데살로니가전서": ["1th", "1thess"], "데살로니가후서": ["2th", "2thess"],
+    "디모데전서": ["1tim"], "디모데후서": ["2tim"], "빌레몬서": ["phlm"], "히브리서": ["heb"],
+    "야고보서": ["jas"], "베드로전서": ["1pet"], "베드로후서": ["2pet"],
+    "요한일서": ["1jn"], "요한이서": ["2jn"], "요한삼서": ["3jn"], "요한계시록": ["rev"],
+}
+
+# 책 이름 사이에 끼어도 무시하는 문자 ("1 Corinthians", "1 Cor.")
+_IGNORED = frozenset(" \t.")
+_END = ""
+
+
+def _fold(alias: str) -> str:
+    return "".join(ch for ch in normalize_korean(alias).lower() if ch not in _IGNORED)
+
+
+class BookNameTrie:
+    """모든 책 이름/약어를 미리 컴파일한 문자 trie.
+
+    노드는 dict(문자 → 자식 노드)이고, 별칭이 끝나는 노드에는 "" 키로 책 번호를 둔다.
+    한 번 훑으면서 가장 긴 별칭을 찾으므로 이름 정규화/사전 조회를 반복하지 않는다.
+    공백과 마침표는 건너뛰고 영문은 소문자로 비교한다.
+    이름 전체가 별칭 그대로인 흔한 경우는 trie를 걷기 전에 dict 한 번으로 끝낸다.
+    """
+
+    def __init__(self, aliases):
+        self._root = {}
+        self._reverse_root = {}
+        self._exact = {}
+        for alias, book_id in aliases.items():
+            folded = _fold(alias)
+            if not folded:
+                continue
+            for form in (alias, alias.lower(), folded):
+                self._exact.setdefault(form, book_id)
+            self._insert(self._root, folded, book_id)
+            self._insert(self._reverse_root, folded[::-1], book_id)
+
+    @staticmethod
+    def _insert(root, key, book_id):
+        node = root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node.setdefault(_END, book_id)
+
+    def match_prefix(self, text: str, start: int = 0):
+        """text[start:]에서 가장 긴 책 이름 접두사 → (책 번호, 끝 위치). 없으면 (-1, start)."""
+        node = self._root
+        best, best_end = -1, start
+        i, n = start, len(text)
+        while i < n:
+            ch = text[i]
+            i += 1
+            if ch in _IGNORED:
+                continue
+            node = node.get(ch) or node.get(ch.lower())
+            if node is None:
+                break
+            book_id = node.get(_END)
+            if book_id is not None:
+                best, best_end = book_id, i
+        return best, best_end
+
+    def match_suffix(self, text: str, end: int = None):
+        """text[:end]에서 가장 긴 책 이름 접미사 → (책 번호, 시작 위치). 없으면 (-1, end)."""
+        end = len(text) if end is None else end
+        node = self._reverse_root
+        best, best_start = -1, end
+        i = end
+        while i > 0:
+            i -= 1
+            ch = text[i]
+            if ch in _IGNORED:
+                continue
+            node = node.get(ch) or node.get(ch.lower())
+            if node is None:
+                break
+            book_id = node.get(_END)
+            if book_id is not None:
+                best, best_start = book_id, i
+        return best, best_start
+
+    def resolve(self, name: str) -> int:
+        """name 전체가 책 이름/약어면 책 번호, 아니면 -1."""
+        book_id = self._exact.get(name)
+        if book_id is not None:
+            return book_id
+        book_id, end = self.match_prefix(name)
+        if book_id < 0:
+            return -1
+        for ch in name[end:]:
+            if ch not in _IGNORED:
+                return -1
+        return book_id
+
+
+def _build_aliases():
+    aliases = {}
+    for english, korean in BOOK_NAME_MAP.items():
+        aliases[english] = BOOK_IDS[korean]
+        aliases[korean] = BOOK_IDS[korean]
+    for table in (BOOK_ALIASES, ENGLISH_ABBREVIATIONS):
+        for korean, names in table.items():
+            for name in names:
+                aliases.setdefault(name, BOOK_IDS[korean])
+    return aliases
+
+
+BOOK_TRIE = BookNameTrie(_build_aliases())
+
+
+def resolve_book(name: str) -> str:
+    """책 이름/약어(한글·영문) → 한글 책 이름. 모르는 이름이면 ''."""
+    book_id = BOOK_TRIE.resolve(normalize_korean(name or ""))
+    return CANONICAL_BOOKS[book_id] if book_id >= 0 else ''
+
+
+def split_book_prefix(text: str):
+    """"고전13:4", "1 Corinthians 13:4" → (한글 책 이름, 나머지 문자열). 책이 없으면 ('', text)."""
+    text = normalize_korean(text or "")
+    book_id, end = BOOK_TRIE.match_prefix(text)
+    if book_id < 0:
+        return '', text
+    # "1 Cor. 13:4"처럼 약어 뒤에 붙은 마침표/공백은 책 이름 쪽으로 본다
+    return CANONICAL_BOOKS[book_id], text[end:].lstrip(" \t.")
+
@@ -0,0 +1,21 @@
+# build_theme_results.py
+# 테마 검색어(테마별 토큰 + 대표 토큰 두 개 조합)의 전체 추천 목록을 미리 계산해 파일로 저장.
+# app.py와 같은 설정(백엔드/모델/환경변수)으로 실행해야 서버가 파일을 그대로 사용한다.
+#   python build_theme_results.py [출력 경로]
+import os
+import sys
+
+os.environ.setdefault("WARMUP_ON_BOOT", "0")
+os.environ["THEME_RESULTS_BUILD_ON_BOOT"] = "0"
+
+import app  # noqa: E402
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else app.THEME_RESULTS_PATH
+    results = app.build_theme_results(path)
+    print(f"   - 검색어 {len(results)}개, backend={results.backend}, model={results.model}")
+
+
+if __name__ == "__main__":
+    main()
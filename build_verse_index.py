@@ -0,0 +1,52 @@
+# build_verse_index.py
+import os
+
+import chromadb
+
+from verse_index import write_verse_index
+from verse_reference import ingest_metadata
+
+# ✅ e5-small로 재임베딩한 ChromaDB(rebuild_chroma.py 결과)에서 임베딩을 그대로 가져온다
+SOURCE_DB_PATH = os.environ.get("VERSE_INDEX_SOURCE_DB", "./vectordb_e5small")
+SOURCE_COLLECTION = os.environ.get("VERSE_INDEX_SOURCE_COLLECTION", "bible")
+OUTPUT_DIR = os.environ.get("LOCAL_VERSE_INDEX_DIR", "./verse_index")
+
+BATCH = 2000
+
+
+def main():
+    print("1) ChromaDB 로드:", SOURCE_DB_PATH)
+    client = chromadb.PersistentClient(path=SOURCE_DB_PATH)
+    col = client.get_collection(name=SOURCE_COLLECTION)
+    total = col.count()
+    print(f"   - count: {total}")
+
+    print("2) 문서/메타/임베딩 수집")
+    ids, docs, metas, embeds = [], [], [], []
+    offset = 0
+    while offset < total:
+        got = col.get(
+            include=["documents", "metadatas", "embeddings"],
+            limit=BATCH,
+            offset=offset,
+        )
+        if not got["ids"]:
+            break
+        ids.extend(got["ids"])
+        docs.extend(got["documents"])
+        metas.extend(got["metadatas"])
+        embeds.extend(got["embeddings"])
+        offset += len(got["ids"])
+        print(f"   - {offset}/{total}")
+
+    # 레퍼런스 레이블과 문서 내 절 위치표를 미리 계산해 두면 검색/조회 시 다시 파싱할 필요가 없다
+    # (compact 텍스트는 write_verse_index가 행에 따로 저장하므로 메타데이터에는 넣지 않는다)
+    metas = [ingest_metadata(meta, doc, compact=False) for doc, meta in zip(docs, metas)]
+
+    print("3) 정규화 후 저장:", OUTPUT_DIR)
+    write_verse_index(OUTPUT_DIR, ids, docs, metas, embeds)
+    print("✅ 완료")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# check_onnx_parity.py
+# ONNX Runtime 인코더(원본/int8)가 SentenceTransformer(torch) 출력과 같은 방향의 벡터를 내는지 코사인 유사도로 확인한다.
+import os
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from onnx_encoder import default_onnx_dir, load_onnx_encoder
+
+MODEL_NAME = "intfloat/multilingual-e5-small"
+SAMPLES = [
+    "query: 취업",
+    "query: 위로가 필요해요",
+    "query: 내가 너를 굳세게 하리라",
+    "query: 시험 공부가 너무 힘들어요. 상황과 감정: 지혜와 인내, 성실하게 준비하는 마음",
+    "query: hope and future",
+    "query: 요 3:16 성경 구절",
+]
+# 원본 ONNX는 사실상 동일해야 하고, int8 동적 양자화는 약간의 오차를 허용한다.
+# int8 기준(0.98)은 아직 이 모델에서 측정한 값이 아닌 잠정치다. 첫 onnx 빌드 로그의 "최소 코사인"을 보고 조정한다.
+MIN_COSINE = {
+    False: float(os.environ.get("ONNX_PARITY_MIN_COSINE", "0.9999")),
+    True: float(os.environ.get("ONNX_PARITY_MIN_COSINE_INT8", "0.98")),
+}
+
+
+def timed_encode(model, texts, repeat=20):
+    model.encode(texts[0])
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            model.encode(text)
+    return (time.perf_counter() - started) * 1000.0 / (repeat * len(texts))
+
+
+def main():
+    torch_model = SentenceTransformer(MODEL_NAME)
+    expected = torch_model.encode(SAMPLES, normalize_embeddings=True)
+    print(f"torch: {timed_encode(torch_model, SAMPLES):.2f} ms/질의")
+
+    for quantized in (False, True):
+        encoder = load_onnx_encoder(MODEL_NAME, default_onnx_dir(MODEL_NAME), quantized=quantized)
+        actual = encoder.encode(SAMPLES)
+        cosines = np.sum(expected * actual, axis=1)
+        label = "onnx-int8" if encoder.quantized else "onnx"
+        print(f"{label}: {timed_encode(encoder, SAMPLES):.2f} ms/질의, 최소 코사인 {cosines.min():.6f}")
+        assert cosines.min() >= MIN_COSINE[encoder.quantized], f"{label} 코사인 유사도 기준 미달: {cosines}"
+
+    print("✅ ONNX 인코더 출력이 torch와 일치")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# check_postbox_cache.py
+# PostboxCache 조회 경로(적중, stale 갱신, 만료, 임시 행, 음성 캐시, 바이트 예산)를 가짜 fetch로 확인한다.
+#   python check_postbox_cache.py
+import time
+
+from postbox_cache import PostboxCache
+
+
+class FakeDb:
+    def __init__(self):
+        self.rows = {}
+        self.calls = 0
+
+    def fetch(self, field, value):
+        self.calls += 1
+        for row in self.rows.values():
+            if str(row.get(field)) == value:
+                return dict(row)
+        return None
+
+
+def wait_refresh(cache, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with cache._lock:
+            if not cache._refreshing:
+                return
+        time.sleep(0.005)
+    raise AssertionError("백그라운드 갱신이 끝나지 않음")
+
+
+def check_hits():
+    db = FakeDb()
+    db.rows["a"] = {"id": "a", "url": "abc", "name": "우체통"}
+    cache = PostboxCache(db.fetch, ttl=60, stale_ttl=120, negative_ttl=60)
+    assert cache.get_by_url("abc")["id"] == "a"
+    assert cache.get_by_url("abc")["id"] == "a"
+    assert cache.get("a")["url"] == "abc"
+    assert db.calls == 1, db.calls
+    assert cache.stats()["hits"] == 2
+    print("✅ 같은 우체통 두 번째 조회부터 캐시 적중")
+
+
+def check_expiry():
+    db = FakeDb()
+    db.rows["a"] = {"id": "a", "url": "abc", "name": "처음"}
+    cache = PostboxCache(db.fetch, ttl=0.05, stale_ttl=0.2, negative_ttl=60)
+    cache.get("a")
+    db.rows["a"]["name"] = "바뀜"
+    time.sleep(0.08)
+    # ttl이 지나고 stale_ttl 안이면 기존 값을 돌려주고 백그라운드에서 다시 읽는다
+    assert cache.get("a")["name"] == "처음"
+    wait_refresh(cache)
+    assert cache.get("a")["name"] == "바뀜"
+    time.sleep(0.25)
+    # stale_ttl도 지나면 요청 경로에서 다시 읽는다
+    calls = db.calls
+    assert cache.get("a")["name"] == "바뀜"
+    assert db.calls == calls + 1
+    print("✅ ttl/stale_ttl 만료 후 다시 읽기")
+
+
+def check_local_rows():
+    db = FakeDb()
+    cache = PostboxCache(db.fetch, ttl=0.01, stale_ttl=0.02, negative_ttl=60)
+    cache.put({"id": "new", "url": "new-url", "name": "임시"}, local=True)
+    time.sleep(0.05)
+    # DB에 아직 없는 임시 행은 만료/갱신 없이 계속 적중한다
+    assert cache.get("new")["name"] == "임시"
+    assert cache.get_by_url("new-url")["name"] == "임시"
+    assert db.calls == 0, db.calls
+    assert cache.stats()["local"] == 1
+    cache.put({"id": "new", "url": "new-url", "name": "저장됨"})
+    assert cache.stats()["local"] == 0
+    print("✅ 임시 행은 DB 저장 전까지 갱신하지 않음")
+
+
+def check_negative_and_budget():
+    db = FakeDb()
+    cache = PostboxCache(db.fetch, ttl=60, negative_ttl=60, max_bytes=3000)
+    assert cache.get("missing") is None
+    assert cache.get("missing") is None
+    assert db.calls == 1 and cache.stats()["negative_hits"] == 1
+    for i in range(50):
+        cache.put({"id": str(i), "url": f"u{i}", "name": "x" * 100})
+    stats = cache.stats()
+    assert stats["bytes"] <= 3000 and stats["evictions"] > 0, stats
+    assert cache.get_by_url("u49")["id"] == "49"
+    print(f"✅ 음성 캐시, 바이트 예산 ({stats['size']}행 {stats['bytes']}B)")
+
+
+def main():
+    check_hits()
+    check_expiry()
+    check_local_rows()
+    check_negative_and_budget()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# check_rerank_parity.py
+# verse_rerank.rerank가 기존 per-row 점수 루프와 같은 점수/순서를 내는지 무작위 후보로 확인한다.
+import heapq
+import random
+import re
+
+import numpy as np
+
+from popular_verses import normalize_korean
+from verse_rerank import rerank, top_k_stable
+
+WORDS = ["사랑", "소망", "믿음", "평안", "위로", "두려워", "말라", "내가", "너를", "굳세게", "하나님", "Love", "hope"]
+
+
+def legacy_rank(candidates, terms, normalized_query):
+    """app.py에 있던 기존 점수 계산 루프 그대로."""
+
+    def greedy_match_count(terms, doc):
+        docc = re.sub(r"\s+", "", normalize_korean(doc or "").lower())
+        return sum(1 for t in terms if t and re.sub(r"\s+", "", t) in docc)
+
+    scored = []
+    for cand in candidates:
+        doc = cand["text"]
+        semantic = cand["semantic"]
+        pop = cand["popularity"]
+        greedy_hits = greedy_match_count(terms, doc)
+        greedy_bonus = min(0.18, greedy_hits * 0.06)
+        coverage = greedy_hits / max(1, len(terms)) if terms else 0
+        phrase_bonus = coverage * 0.1
+        if coverage >= 0.99:
+            phrase_bonus += 0.08
+        if normalized_query and normalized_query in re.sub(r"\s+", "", normalize_korean(doc or "").lower()):
+            phrase_bonus += 0.06
+        phrase_bonus = min(0.24, phrase_bonus)
+        final_score = semantic * 0.6 + (pop / 100.0) * 0.4 + phrase_bonus + greedy_bonus
+        scored.append((final_score, cand))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return scored
+
+
+def check_top_k_ties(trials=500, seed=11):
+    """top_k_stable(argpartition)이 기존 sort(reverse=True)/요청된 heapq.nlargest와 동점 순서까지 같은지."""
+    rng = random.Random(seed)
+    for trial in range(trials):
+        scores = [rng.choice([0.1, 0.5, 0.5, 0.9, 1.3]) for _ in range(rng.randint(0, 300))]
+        k = rng.randint(1, 80)
+        legacy = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+        nlargest = heapq.nlargest(k, range(len(scores)), key=lambda i: scores[i])
+        actual = top_k_stable(np.asarray(scores, dtype=np.float64), k).tolist()
+        assert legacy == nlargest == actual, f"동점 순서 불일치 (trial {trial})"
+    print(f"✅ top_k_stable 동점 순서 {trials}회 모두 sorted/heapq.nlargest와 동일")
+
+
+def main(trials=300, seed=7):
+    rng = random.Random(seed)
+    for trial in range(trials):
+        candidates = []
+        for i in range(rng.randint(0, 200)):
+            doc = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+            candidates.append({
+                "id": i,
+                "text": doc,
+                # 동점 처리까지 확인하도록 일부러 값 종류를 적게 둔다
+                "semantic": rng.choice([0, 0.5, 0.8123, 1 - 0.27]),
+                "popularity": rng.choice([0, 30, 85, 100]),
+            })
+        terms = rng.sample([w.lower() for w in WORDS], rng.randint(0, 6))
+        phrase = "".join(rng.sample(WORDS, rng.randint(0, 3))).lower()
+
+        expected = legacy_rank(candidates, terms, phrase)
+        actual = rerank(candidates, terms, phrase, limit=len(candidates))
+        assert [c["id"] for _, c in expected] == [c["id"] for _, c in actual], f"순서 불일치 (trial {trial})"
+        assert [s for s, _ in expected] == [s for s, _ in actual], f"점수 불일치 (trial {trial})"
+
+        k = rng.randint(1, 60)
+        partial = rerank(candidates, terms, phrase, limit=k)
+        assert [c["id"] for _, c in partial] == [c["id"] for _, c in expected[:k]], f"부분 정렬 불일치 (trial {trial})"
+
+    print(f"✅ {trials}회 모두 기존 점수 루프와 동일")
+    check_top_k_ties()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# check_semantic_cache.py
+# semantic_cache threshold를 실제 임베딩 모델로 검증한다.
+# 파이프라인과 같은 방식(원래 검색어 임베딩 + 테마 조합 namespace)으로 캐시에 넣고 다른 검색어로 조회해
+#   1) 테마 토큰끼리 서로의 후보를 재사용하지 않는지 (실패 시 종료 코드 1)
+#   2) 테마에 걸리지 않는 짧은 검색어(모두 같은 namespace)끼리의 오적중률
+# 을 출력한다. 결과(threshold, 오적중률)를 기록한 뒤 SEMANTIC_CACHE_SIZE를 켠다.
+#   python check_semantic_cache.py [threshold]
+import os
+import sys
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from search_pipeline import normalize_query_key, semantic_cache_text
+from semantic_cache import SemanticCandidateCache
+from theme_matcher import ThemeMatcher
+from theme_results import theme_queries
+from theme_rules import DEFAULT_CONTEXT_DESCRIPTION, THEME_CONTEXT_RULES
+
+MODEL_NAME = "intfloat/multilingual-e5-small"
+# 테마 토큰이 없는 짧은 검색어. 같은 줄끼리는 같은 뜻(재사용해도 되는 쌍), 다른 줄끼리는 달라야 한다.
+FREE_QUERY_GROUPS = [
+    ["하나님의 사랑", "하나님 사랑"],
+    ["감사", "감사합니다"],
+    ["아침 기도", "아침기도"],
+    ["용서"],
+    ["죄"],
+    ["부활"],
+    ["천국"],
+    ["믿음"],
+    ["소망"],
+    ["순종"],
+    ["겸손"],
+    ["인내"],
+    ["지혜"],
+    ["빛"],
+    ["소금"],
+    ["목자"],
+    ["포도나무"],
+    ["바다"],
+    ["광야"],
+    ["새벽"],
+]
+
+
+def false_hit_rate(model, matcher, threshold):
+    """같은 namespace(테마 없음)의 짧은 검색어끼리 다른 뜻 검색어의 후보를 재사용하는 비율."""
+    queries, group_of = [], {}
+    for group_id, group in enumerate(FREE_QUERY_GROUPS):
+        for query in group:
+            queries.append(query)
+            group_of[normalize_query_key(query)] = group_id
+    themes = [tuple(matcher.expand(q)[1]) for q in queries]
+    vectors = model.encode([semantic_cache_text(q) for q in queries], normalize_embeddings=True)
+    false_hits = []
+    for i, query in enumerate(queries):
+        # 자기 자신을 뺀 나머지를 캐시에 넣고 조회
+        cache = SemanticCandidateCache(capacity=len(queries), threshold=threshold)
+        for j, other in enumerate(queries):
+            if j != i:
+                cache.add(vectors[j], normalize_query_key(other), themes[j])
+        hit = cache.lookup(vectors[i], themes[i])
+        if hit is not None and group_of[hit] != group_of[normalize_query_key(query)]:
+            false_hits.append((query, hit))
+    for query, other in false_hits:
+        print(f"⚠️ 오적중: {query} → {other}")
+    rate = len(false_hits) / len(queries)
+    print(f"테마 없는 짧은 검색어 {len(queries)}개 오적중률 {rate:.1%} (threshold={threshold})")
+    return rate
+
+
+def main():
+    threshold = float(sys.argv[1] if len(sys.argv) > 1 else os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+    model = SentenceTransformer(MODEL_NAME)
+    matcher = ThemeMatcher(THEME_CONTEXT_RULES, DEFAULT_CONTEXT_DESCRIPTION, lambda ref: ref)
+    queries = theme_queries(THEME_CONTEXT_RULES, combos=False)
+
+    raw = model.encode([semantic_cache_text(q) for q in queries], normalize_embeddings=True)
+    expanded = model.encode([matcher.expand(q)[0] for q in queries], normalize_embeddings=True)
+    themes = [tuple(matcher.expand(q)[1]) for q in queries]
+
+    # 예전 방식(확장 질의 임베딩) 대비 원래 검색어 임베딩의 최대 교차 유사도
+    for label, vectors in (("확장 질의", expanded), ("원래 검색어", raw)):
+        sims = vectors @ vectors.T
+        np.fill_diagonal(sims, -1.0)
+        i, j = np.unravel_index(int(np.argmax(sims)), sims.shape)
+        over = int((np.triu(sims, 1) >= threshold).sum())
+        print(f"{label}: 최대 {sims[i, j]:.4f} ({queries[i]} / {queries[j]}), {threshold} 이상 쌍 {over}개")
+
+    cache = SemanticCandidateCache(capacity=len(queries), threshold=threshold)
+    for query, vector, theme in zip(queries, raw, themes):
+        cache.add(vector, [normalize_query_key(query)], theme)
+    collisions = []
+    for query, vector, theme in zip(queries, raw, themes):
+        hit = cache.lookup(vector, theme)
+        if hit is not None and hit[0] != normalize_query_key(query):
+            collisions.append((query, hit[0]))
+    for query, other in collisions:
+        print(f"❌ {query} → {other}의 후보 재사용")
+    assert not collisions, f"테마 토큰 {len(collisions)}개가 다른 토큰의 후보를 재사용"
+    print(f"✅ 테마 토큰 {len(queries)}개 모두 자기 후보만 사용 (threshold={threshold})")
+    false_hit_rate(model, matcher, threshold)
+
+
+if __name__ == "__main__":
+    main()
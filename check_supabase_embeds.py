@@ -0,0 +1,38 @@
+# check_supabase_embeds.py
+# app.py가 쓰는 PostgREST inner join(embed)이 실제 스키마에서 동작하는지 확인한다.
+# embed는 외래 키로만 풀리므로 아래 관계가 없으면 PGRST200(관계 없음) 오류가 난다.
+#   postcards.postbox_id → postboxes.id   (view_postbox 편지 개수: postboxes!inner(url))
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from supabase_rest import SupabaseRestClient
+
+EMBEDS = [
+    ("postcards", "id,postboxes!inner(url)", "postcards.postbox_id → postboxes.id"),
+]
+
+
+def main():
+    load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"), override=True)
+    url = os.environ.get("SUPABASE_URL") or os.environ.get("SUPABASE_APP_URL")
+    key = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_KEY") or os.environ.get("SUPABASE_APP_KEY")
+    client = SupabaseRestClient(url, key)
+    if not client.configured:
+        print("⚠️ SUPABASE_URL/KEY가 없어 확인할 수 없습니다.")
+        return 2
+
+    failed = 0
+    for table, select, relation in EMBEDS:
+        resp = client.get(table, params={"select": select, "limit": 1})
+        if resp.status_code == 200:
+            print(f"✅ {table}?select={select} ({relation})")
+        else:
+            failed += 1
+            print(f"❌ {table}?select={select} status={resp.status_code} ({relation} 외래 키 필요) -> {resp.text}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# embedding_service.py
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from ttl_cache import TTLCache
+
+EMBEDDING_CACHE_MAX_BYTES = int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.environ.get("EMBEDDING_BATCH_MAX_SIZE", "16"))
+
+# numpy 배열 본체 외에 키 문자열/튜플/OrderedDict 노드가 차지하는 대략적인 크기
+_ENTRY_OVERHEAD_BYTES = 256
+
+
+def _entry_nbytes(vector) -> int:
+    return int(getattr(vector, "nbytes", 0)) + _ENTRY_OVERHEAD_BYTES
+
+
+class EmbeddingBatcher:
+    """동시에 들어온 단건 encode 요청을 잠깐 모아 한 번의 배치 encode로 처리한다.
+
+    첫 요청이 들어온 뒤 max_wait_ms 동안(또는 max_batch개가 찰 때까지) 기다렸다가
+    model.encode(list)를 한 번 호출하고, 결과를 각 요청 스레드에 돌려준다.
+    워커 스레드는 첫 요청 시점에 띄우므로 gunicorn fork 이후에도 안전하다.
+    """
+
+    def __init__(self, model, max_wait_ms=None, max_batch=None):
+        self.model = model
+        self.max_wait = (EMBEDDING_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self.max_batch = max(1, int(EMBEDDING_BATCH_MAX_SIZE if max_batch is None else max_batch))
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch > 1 and self.max_wait > 0
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="embedding-batcher",
+                    daemon=True,
+                )
+                self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str):
+        if not self.enabled:
+            return self.model.encode(text)
+        return self.submit(text).result()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.model.encode(texts, batch_size=len(texts))
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+
+class QueryEncoder:
+    """검색 질의 임베딩 인코더.
+
+    같은 확장 질의는 (모델 이름, 질의 텍스트) 키로 캐시해 모델 forward를 건너뛴다.
+    캐시 미스는 batcher가 있으면 다른 요청과 묶어서 인코딩한다.
+    반환값은 읽기 전용 float32 numpy 배열이다.
+    """
+
+    def __init__(self, model, model_name: str, max_bytes=None, max_entries=None, batcher=None):
+        self.model = model
+        self.model_name = model_name
+        self.batcher = batcher
+        self.cache = TTLCache(
+            maxsize=max_entries or EMBEDDING_CACHE_MAX_ENTRIES,
+            ttl=None,
+            max_bytes=max_bytes or EMBEDDING_CACHE_MAX_BYTES,
+            sizeof=_entry_nbytes,
+        )
+
+    def encode(self, text: str):
+        key = (self.model_name, text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+        encode = self.batcher.encode if self.batcher else self.model.encode
+        # 배치 결과의 한 행(view)이 배치 전체 배열을 붙잡지 않도록 복사해 둔다
+        vector = np.array(encode(text), dtype=np.float32)
+        vector.setflags(write=False)
+        self.cache.set(key, vector)
+        return vector
+
+    def stats(self):
+        stats = {"model": self.model_name, **self.cache.stats()}
+        if self.batcher:
+            stats["batching"] = self.batcher.stats()
+        return stats
@@ -0,0 +1,117 @@
+# fanout.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+FANOUT_MAX_WORKERS = int(os.environ.get("FANOUT_MAX_WORKERS", "16"))
+# gather()의 공유 마감 시간 기본값. Supabase REST 호출 예산(SUPABASE_HTTP_TIMEOUT)보다 짧으면
+# 느리지만 성공할 호출을 버리게 되므로 같은 값을 쓴다.
+FANOUT_DEADLINE = float(os.environ.get("FANOUT_DEADLINE") or os.environ.get("SUPABASE_HTTP_TIMEOUT") or "8")
+
+
+class FanOutTimeout(TimeoutError):
+    """공유 마감 시간 안에 끝나지 않은 필수 호출이 있음."""
+
+    def __init__(self, pending):
+        self.pending = list(pending)
+        super().__init__(f"마감 시간 초과: {', '.join(self.pending)}")
+
+
+class FanOut:
+    """라우트가 서로 독립적인 Supabase 호출을 한꺼번에 던지고 함께 기다리는 실행기.
+
+    - 워커 프로세스마다 스레드 풀 하나를 공유한다 (첫 호출 시 생성, fork 이후에도 안전).
+    - gather()의 호출은 동시에 돌므로 라우트 지연은 호출 합계가 아니라 가장 느린 호출이 된다.
+    - 모든 호출이 하나의 마감 시간(timeout)을 공유한다. 기본값은 REST 호출 예산과 같아서
+      직렬로 부르던 때 성공하던 느린 조회가 병렬화 때문에 실패로 바뀌지 않는다.
+    - 호출 함수는 다른 스레드에서 돌므로 flask.request/session은 미리 읽어서 넘겨야 한다.
+    """
+
+    def __init__(self, max_workers: int = None, timeout: float = None):
+        self.max_workers = max_workers or FANOUT_MAX_WORKERS
+        self.timeout = timeout or FANOUT_DEADLINE
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.saved_ms = 0.0
+
+    def _pool(self):
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                if self._executor is None or self._pid != pid:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fanout")
+                    self._pid = pid
+        return self._executor
+
+    @staticmethod
+    def _timed(fn):
+        started = time.perf_counter()
+        result = fn()
+        return result, (time.perf_counter() - started) * 1000.0
+
+    def gather(self, calls: dict, timeout: float = None, defaults: dict = None):
+        """{이름: 인자 없는 함수} → {이름: 결과}.
+
+        defaults에 이름이 있는 호출은 선택 사항이다. 실패하거나 마감까지 끝나지 않으면 기본값을 쓴다.
+        그 밖의 (필수) 호출이 실패하면 그 예외를, 마감을 넘기면 FanOutTimeout을 올린다.
+        마감을 넘긴 호출은 취소되지 않고 백그라운드에서 끝까지 돈다.
+        """
+        defaults = defaults or {}
+        started = time.perf_counter()
+        pool = self._pool()
+        futures = {name: pool.submit(self._timed, fn) for name, fn in calls.items()}
+        wait(futures.values(), timeout=timeout or self.timeout)
+
+        pending = [name for name, future in futures.items() if name not in defaults and not future.done()]
+        if pending:
+            self._record(len(calls), 0, len(pending), saved_ms=0.0)
+            raise FanOutTimeout(pending)
+
+        results, timed_out, failures, serial_ms = {}, 0, 0, 0.0
+        for name, future in futures.items():
+            if not future.done():
+                timed_out += 1
+                print(f"⚠️ 병렬 호출 마감 초과, 기본값 사용: {name}")
+                results[name] = defaults[name]
+                continue
+            exc = future.exception()
+            if exc is not None:
+                failures += 1
+                if name not in defaults:
+                    self._record(len(calls), failures, timed_out, saved_ms=0.0)
+                    raise exc
+                print(f"⚠️ 병렬 호출 실패, 기본값 사용: {name} -> {exc}")
+                results[name] = defaults[name]
+                continue
+            results[name], elapsed_ms = future.result()
+            serial_ms += elapsed_ms
+
+        saved_ms = max(0.0, serial_ms - (time.perf_counter() - started) * 1000.0)
+        self._record(len(calls), failures, timed_out, saved_ms=saved_ms)
+        return results
+
+    def _record(self, calls, failures, timed_out, saved_ms):
+        with self._stats_lock:
+            self.batches += 1
+            self.calls += calls
+            self.failures += failures
+            self.timeouts += timed_out
+            self.saved_ms += saved_ms
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "deadline_s": self.timeout,
+            "batches": self.batches,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "saved_ms_total": round(self.saved_ms, 1),
+        }
@@ -0,0 +1,163 @@
+# onnx_encoder.py
+import json
+import os
+
+import numpy as np
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_FILE = "model.int8.onnx"
+ONNX_CONFIG_FILE = "encoder_config.json"
+
+
+def default_onnx_dir(model_name: str) -> str:
+    base = os.environ.get("ONNX_MODEL_DIR") or os.path.join(os.path.dirname(__file__), "onnx_model")
+    return os.path.join(base, model_name.replace("/", "__"))
+
+
+def export_onnx_model(model_name: str, output_dir: str, quantize: bool = True):
+    """캐시된 SentenceTransformer 모델의 트랜스포머 본체를 ONNX로 내보낸다 (최초 1회).
+
+    pooling/normalize는 OnnxSentenceEncoder에서 numpy로 처리하므로 last_hidden_state만 내보낸다.
+    quantize=True면 onnxruntime 동적 양자화(int8 가중치) 사본도 만든다.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    tokenizer = st_model.tokenizer
+    transformer = st_model[0].auto_model.eval()
+
+    class _HiddenStates(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids,
+            )[0]
+
+    dummy = tokenizer(["query: 위로가 필요해요"], return_tensors="pt")
+    token_type_ids = dummy.get("token_type_ids")
+    if token_type_ids is None:
+        token_type_ids = torch.zeros_like(dummy["input_ids"])
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            _HiddenStates(transformer),
+            (dummy["input_ids"], dummy["attention_mask"], token_type_ids),
+            model_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": dynamic,
+                "attention_mask": dynamic,
+                "token_type_ids": dynamic,
+                "last_hidden_state": dynamic,
+            },
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            model_path,
+            os.path.join(output_dir, ONNX_QUANTIZED_FILE),
+            weight_type=QuantType.QInt8,
+        )
+
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as fp:
+        json.dump(
+            {
+                "model_name": model_name,
+                "max_seq_length": st_model.max_seq_length,
+                "dimension": st_model.get_sentence_embedding_dimension(),
+            },
+            fp,
+        )
+    print(f"✅ ONNX 인코더 내보내기 완료: {output_dir}")
+
+
+class OnnxSentenceEncoder:
+    """SentenceTransformer.encode와 같은 방식(토크나이저 → mean pooling → L2 정규화)의
+    ONNX Runtime 인코더. torch를 import하지 않으므로 콜드 스타트와 RSS가 줄어든다.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = True):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), encoding="utf-8") as fp:
+            config = json.load(fp)
+        self.model_name = config["model_name"]
+        self.max_seq_length = config["max_seq_length"]
+        self.dimension = config["dimension"]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        model_file = ONNX_QUANTIZED_FILE if quantized else ONNX_MODEL_FILE
+        model_path = os.path.join(model_dir, model_file)
+        if quantized and not os.path.exists(model_path):
+            print(f"⚠️ 양자화 ONNX 모델이 없어 원본을 사용합니다: {model_path}")
+            model_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+        self.quantized = model_path.endswith(ONNX_QUANTIZED_FILE)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = int(os.environ.get("ONNX_INTRA_OP_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _encode_batch(self, texts):
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        if "token_type_ids" not in encoded:
+            encoded["token_type_ids"] = np.zeros_like(encoded["input_ids"])
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return (pooled / norms).astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        batch_size = max(1, int(batch_size))
+        vectors = np.vstack([
+            self._encode_batch(texts[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ])
+        return vectors[0] if single else vectors
+
+
+def load_onnx_encoder(model_name: str, model_dir: str = None, quantized: bool = True):
+    """내보낸 모델이 없으면 한 번 내보낸 뒤 OnnxSentenceEncoder를 반환."""
+    model_dir = model_dir or default_onnx_dir(model_name)
+    if not os.path.exists(os.path.join(model_dir, ONNX_CONFIG_FILE)):
+        print(f"🔄 ONNX 인코더가 없어 내보내는 중... ({model_dir})")
+        export_onnx_model(model_name, model_dir, quantize=quantized)
+    return OnnxSentenceEncoder(model_dir, quantized=quantized)
+
+
+if __name__ == "__main__":
+    # 이미지 빌드 시 미리 내보내 두기: python onnx_encoder.py
+    name = os.environ.get("EMBEDDING_MODEL_NAME", "intfloat/multilingual-e5-small")
+    export_onnx_model(name, default_onnx_dir(name), quantize=True)
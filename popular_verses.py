@@ -7,6 +7,9 @@ def normalize_korean(text: str) -> str:
     """한글 문자열을 NFC로 정규화"""
     if not isinstance(text, str):
         return text
+    # 이미 NFC인 문자열(대부분)은 새 문자열을 만들지 않고 그대로 반환
+    if unicodedata.is_normalized("NFC", text):
+        return text
     return unicodedata.normalize("NFC", text)
 
 # 책 이름별로 인기 구절 정의
@@ -0,0 +1,221 @@
+# postbox_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from postcard_store import card_nbytes
+from ttl_cache import TTLCache
+
+POSTBOX_CACHE_TTL = float(os.environ.get("POSTBOX_CACHE_TTL", "30"))
+POSTBOX_CACHE_STALE_TTL = float(os.environ.get("POSTBOX_CACHE_STALE_TTL", "600"))
+POSTBOX_NEGATIVE_TTL = float(os.environ.get("POSTBOX_NEGATIVE_TTL", "10"))
+POSTBOX_CACHE_SIZE = int(os.environ.get("POSTBOX_CACHE_SIZE", "2048"))
+POSTBOX_CACHE_MAX_BYTES = int(os.environ.get("POSTBOX_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+
+class PostboxCache:
+    """id와 url 두 키로 찾는 read-through postbox 캐시.
+
+    - ttl 안의 항목은 그대로 돌려준다.
+    - ttl이 지났지만 stale_ttl 안이면 기존 값을 바로 돌려주고 백그라운드에서 한 번만 다시 읽는다
+      (stale-while-revalidate).
+    - Supabase에 없는 id/url은 negative_ttl 동안 기억해 봇/오타 요청이 매번 DB로 가지 않게 한다.
+    - 쓰기(put/invalidate) 시 해당 id/url의 음성 캐시도 함께 지운다.
+    - put(row, local=True)로 넣은 행은 아직 Supabase에 저장되지 않은 임시 행이다.
+      DB에서 다시 읽으면 없다고 나오므로 만료/갱신하지 않고, 저장된 행으로 put될 때까지 그대로 쓴다.
+    - 행 수(maxsize)와 sizeof(row)로 잰 대략적인 바이트(max_bytes) 예산을 넘으면 가장 오래 쓰이지 않은 행부터 내보낸다.
+
+    fetch(field, value)는 field가 "id" 또는 "url"일 때 행 dict, 없으면 None을 돌려주고
+    통신 오류는 예외로 올려야 한다 (오류는 음성 캐시에 넣지 않는다).
+    """
+
+    def __init__(self, fetch, ttl=None, stale_ttl=None, negative_ttl=None, maxsize=None, max_bytes=None, sizeof=None):
+        self.fetch = fetch
+        self.ttl = POSTBOX_CACHE_TTL if ttl is None else ttl
+        self.stale_ttl = max(self.ttl, POSTBOX_CACHE_STALE_TTL if stale_ttl is None else stale_ttl)
+        self.maxsize = max(1, int(maxsize or POSTBOX_CACHE_SIZE))
+        self.max_bytes = int(max_bytes or POSTBOX_CACHE_MAX_BYTES)
+        self.sizeof = sizeof or card_nbytes
+        self._rows = OrderedDict()  # id -> (row, fetched_at, local, nbytes)
+        self._bytes = 0
+        self._url_ids = {}
+        self._missing = TTLCache(
+            maxsize=self.maxsize,
+            ttl=POSTBOX_NEGATIVE_TTL if negative_ttl is None else negative_ttl,
+        )
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.refreshes = 0
+        self.fetch_errors = 0
+        self.evictions = 0
+
+    # ----- 조회 -----
+
+    def get(self, postbox_id):
+        if not postbox_id:
+            return None
+        return self._get("id", str(postbox_id))
+
+    def get_by_url(self, url):
+        if not url:
+            return None
+        return self._get("url", str(url))
+
+    def peek(self, postbox_id):
+        """DB 조회 없이 캐시에 있는 행만 (만료 여부 무관)."""
+        with self._lock:
+            item = self._rows.get(str(postbox_id))
+        return item[0] if item else None
+
+    def rows(self):
+        """캐시에 있는 행 목록 (스냅샷)."""
+        with self._lock:
+            return [item[0] for item in self._rows.values()]
+
+    def _lookup(self, field, value):
+        if field == "id":
+            return value, self._rows.get(value)
+        postbox_id = self._url_ids.get(value)
+        return postbox_id, self._rows.get(postbox_id) if postbox_id is not None else None
+
+    def _get(self, field, value):
+        now = time.monotonic()
+        with self._lock:
+            postbox_id, item = self._lookup(field, value)
+            if item is not None:
+                row, fetched_at, local, _nbytes = item
+                age = now - fetched_at
+                if local or age < self.ttl:
+                    self._rows.move_to_end(postbox_id)
+                    self.hits += 1
+                    return row
+                if age < self.stale_ttl:
+                    self._rows.move_to_end(postbox_id)
+                    self.stale_hits += 1
+                    refresh = postbox_id not in self._refreshing
+                    if refresh:
+                        self._refreshing.add(postbox_id)
+                else:
+                    item = None
+        if item is not None:
+            if refresh:
+                threading.Thread(
+                    target=self._refresh, args=(postbox_id,), name="postbox-refresh", daemon=True
+                ).start()
+            return row
+
+        if self._missing.get((field, value)) is not None:
+            with self._lock:
+                self.negative_hits += 1
+            return None
+        with self._lock:
+            self.misses += 1
+        try:
+            row = self.fetch(field, value)
+        except Exception as exc:
+            with self._lock:
+                self.fetch_errors += 1
+            print(f"⚠️ postbox 조회 실패({field}={value}): {exc}")
+            return None
+        if not row:
+            self._missing.set((field, value), True)
+            return None
+        self.put(row)
+        return row
+
+    def _refresh(self, postbox_id):
+        try:
+            row = self.fetch("id", postbox_id)
+        except Exception as exc:
+            print(f"⚠️ postbox 백그라운드 갱신 실패({postbox_id}): {exc}")
+            row = False
+        with self._lock:
+            self._refreshing.discard(postbox_id)
+            self.refreshes += 1
+            if row is False:
+                self.fetch_errors += 1
+            # 갱신 중에 임시 행으로 바뀌었다면 DB에 없다는 결과로 지우지 않는다
+            item = self._rows.get(postbox_id)
+            deleted = row is None and not (item and item[2])
+        if row:
+            self.put(row)
+        elif deleted:
+            # DB에서 삭제된 우체통
+            self.invalidate(postbox_id=postbox_id)
+            self._missing.set(("id", postbox_id), True)
+
+    # ----- 쓰기 -----
+
+    def put(self, row, local=False):
+        """행을 넣는다. local=True면 아직 DB에 저장되지 않은 임시 행 (만료/갱신하지 않음)."""
+        postbox_id = row.get("id")
+        if postbox_id is None:
+            return
+        postbox_id = str(postbox_id)
+        url = row.get("url")
+        with self._lock:
+            old = self._rows.pop(postbox_id, None)
+            if old:
+                self._bytes -= old[3]
+                if old[0].get("url") and old[0].get("url") != url:
+                    self._url_ids.pop(old[0]["url"], None)
+            nbytes = self.sizeof(row)
+            self._rows[postbox_id] = (row, time.monotonic(), bool(local), nbytes)
+            self._bytes += nbytes
+            if url:
+                self._url_ids[url] = postbox_id
+            # 방금 넣은 행 하나는 예산을 넘어도 남긴다
+            while len(self._rows) > 1 and (len(self._rows) > self.maxsize or self._bytes > self.max_bytes):
+                _, (evicted, _, _, evicted_bytes) = self._rows.popitem(last=False)
+                self._bytes -= evicted_bytes
+                if evicted.get("url"):
+                    self._url_ids.pop(evicted["url"], None)
+                self.evictions += 1
+        self._missing.pop(("id", postbox_id))
+        if url:
+            self._missing.pop(("url", url))
+
+    def invalidate(self, postbox_id=None, url=None):
+        """해당 id/url의 캐시 행과 음성 캐시를 지운다. 다음 조회는 DB에서 다시 읽는다."""
+        with self._lock:
+            if postbox_id is None and url is not None:
+                postbox_id = self._url_ids.get(url)
+            if postbox_id is not None:
+                item = self._rows.pop(str(postbox_id), None)
+                if item:
+                    self._bytes -= item[3]
+                if item and item[0].get("url"):
+                    self._url_ids.pop(item[0]["url"], None)
+                    self._missing.pop(("url", item[0]["url"]))
+            if url is not None:
+                self._url_ids.pop(url, None)
+        if postbox_id is not None:
+            self._missing.pop(("id", str(postbox_id)))
+        if url is not None:
+            self._missing.pop(("url", url))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses + self.negative_hits
+            return {
+                "size": len(self._rows),
+                "local": sum(1 for item in self._rows.values() if item[2]),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "urls": len(self._url_ids),
+                "negative": len(self._missing),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.stale_hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "fetch_errors": self.fetch_errors,
+                "evictions": self.evictions,
+            }
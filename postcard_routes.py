@@ -4,9 +4,8 @@ from flask import Blueprint, jsonify, render_template, request, redirect, url_fo
 
 
 def create_postcard_blueprint(
-    postboxes,
-    postcards,
-    fetch_postbox_supabase,
+    postbox_cache,
+    postcard_store,
     fetch_postcards_supabase,
     store_postbox_supabase,
     store_postcard_supabase,
@@ -15,17 +14,17 @@ def create_postcard_blueprint(
     bp = Blueprint("postcard_routes", __name__)
 
     def ensure_postbox_loaded(postbox_id):
-        if postbox_id not in postboxes:
-            loaded = fetch_postbox_supabase(postbox_id)
-            if not loaded:
-                return None
-            postboxes[postbox_id] = loaded
-            postcards[postbox_id] = fetch_postcards_supabase(postbox_id)
-        return postboxes[postbox_id]
+        postbox = postbox_cache.get(postbox_id)
+        if not postbox:
+            return None
+        if not postcard_store.has_list(postbox_id):
+            postcard_store.set_list(postbox_id, fetch_postcards_supabase(postbox_id))
+        return postbox
 
     def ensure_postbox_exists(postbox_id):
-        if ensure_postbox_loaded(postbox_id):
-            return postboxes[postbox_id]
+        postbox = ensure_postbox_loaded(postbox_id)
+        if postbox:
+            return postbox
 
         # Supabase에도 없으면 최소 정보로 생성 후 진행
         base_url = request.url_root.rstrip("/")
@@ -40,8 +39,9 @@ def create_postcard_blueprint(
             "created_at": datetime.now().isoformat(),
             "is_opened": False,
         }
-        postboxes[postbox_id] = fallback
-        postcards.setdefault(postbox_id, [])
+        postcard_store.ensure_list(postbox_id)
+        # 아직 DB에 없는 임시 행으로 넣고, 저장이 성공하면 저장된 행으로 다시 덮어쓴다
+        postbox_cache.put(fallback, local=True)
         store_postbox_supabase(fallback)
         return fallback
 
@@ -71,26 +71,7 @@ def create_postcard_blueprint(
         if owner_redirect is not None:
             return jsonify({"success": False, "message": "본인의 우체통에는 편지를 남길 수 없습니다."}), 403
 
-        if postbox_id not in postboxes:
-            loaded = fetch_postbox_supabase(postbox_id)
-            if not loaded:
-                base_url = request.url_root.rstrip("/")
-                postbox_path = f"/postboxes/{postbox_id}"
-                fallback = {
-                    "id": postbox_id,
-                    "name": "우체통",
-                    "nickname": "우체통",
-                    "prayer_topic": "",
-                    "url": postbox_path,
-                    "created_at": datetime.now().isoformat(),
-                    "is_opened": False,
-                }
-                postboxes[postbox_id] = fallback
-                postcards[postbox_id] = []
-                store_postbox_supabase(fallback)
-            else:
-                postboxes[postbox_id] = loaded
-                postcards[postbox_id] = fetch_postcards_supabase(postbox_id)
+        ensure_postbox_exists(postbox_id)
 
         sender_name = (data.get("sender_name") or "").strip()
         is_anonymous = data.get("is_anonymous")
@@ -119,7 +100,7 @@ def create_postcard_blueprint(
             "created_at": datetime.now().isoformat(),
         }
 
-        postcards[postbox_id].append(postcard)
+        postcard_store.append(postbox_id, postcard)
         store_postcard_supabase(postbox_id, postcard)
 
         return jsonify({"success": True, "postcard_id": postcard["id"]})
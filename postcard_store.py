@@ -0,0 +1,183 @@
+# postcard_store.py
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+POSTCARD_CACHE_TTL = float(os.environ.get("POSTCARD_CACHE_TTL", "3600"))
+POSTCARD_STORE_MAX_ENTRIES = int(os.environ.get("POSTCARD_STORE_MAX_ENTRIES", "20000"))
+POSTCARD_STORE_MAX_BYTES = int(os.environ.get("POSTCARD_STORE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# 튜플/색인 항목 등 엽서 dict 밖에서 드는 대략적인 크기
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+def card_nbytes(card: dict) -> int:
+    """엽서 dict 하나가 차지하는 대략적인 메모리 (dict 본체 + 문자열 값)."""
+    size = sys.getsizeof(card) + _ENTRY_OVERHEAD_BYTES
+    for value in card.values():
+        if isinstance(value, str):
+            size += sys.getsizeof(value)
+    return size
+
+
+class _Unit:
+    """우체통 하나의 엽서 묶음. complete=False면 Supabase 목록을 아직 다 읽지 않은 상태."""
+
+    __slots__ = ("ids", "nbytes", "complete")
+
+    def __init__(self, complete):
+        self.ids = []
+        self.nbytes = 0
+        self.complete = complete
+
+
+class PostcardStore:
+    """엽서 메모리 저장소: id → 엽서, postbox_id → 작성 순서대로 정렬된 엽서 id 목록.
+
+    - 엽서 한 건 조회(get)는 id 사전 조회 한 번이다 (우체통 목록을 훑지 않는다).
+    - 보낸 엽서는 사실상 바뀌지 않으므로 ttl(기본 1시간) 안에는 메모리 값을 그대로 쓰고,
+      그 뒤에는 호출자가 Supabase에서 다시 읽어 refresh()로 갱신한다.
+    - append/set_list/refresh 모두 잠금 안에서 두 색인을 함께 고쳐 항상 일관되게 유지한다.
+    - 엽서 수(max_entries)와 대략적인 바이트(max_bytes) 예산을 넘으면 가장 오래 쓰이지 않은
+      우체통부터 엽서 목록을 통째로 내보낸다 (목록 일부만 남아 순서가 어긋나는 일이 없다).
+    """
+
+    def __init__(self, ttl=None, max_entries=None, max_bytes=None):
+        self.ttl = POSTCARD_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max(1, int(max_entries or POSTCARD_STORE_MAX_ENTRIES))
+        self.max_bytes = int(max_bytes or POSTCARD_STORE_MAX_BYTES)
+        self._cards = {}  # id -> (card, postbox_id, stored_at, nbytes)
+        self._units = OrderedDict()  # postbox_id -> _Unit (LRU 순서)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted_postboxes = 0
+        self.evicted_postcards = 0
+
+    # ----- 내부 -----
+
+    def _unit(self, postbox_id, complete=False):
+        unit = self._units.get(postbox_id)
+        if unit is None:
+            unit = self._units[postbox_id] = _Unit(complete)
+        self._units.move_to_end(postbox_id)
+        return unit
+
+    def _store(self, unit, postbox_id, card, now):
+        card_id = card["id"]
+        nbytes = card_nbytes(card)
+        old = self._cards.get(card_id)
+        if old is not None:
+            self._bytes -= old[3]
+            old_unit = self._units.get(old[1])
+            if old_unit is not None:
+                old_unit.nbytes -= old[3]
+                if old[1] != postbox_id:
+                    old_unit.ids.remove(card_id)
+        if old is None or old[1] != postbox_id:
+            unit.ids.append(card_id)
+        self._cards[card_id] = (card, postbox_id, now, nbytes)
+        self._bytes += nbytes
+        unit.nbytes += nbytes
+
+    def _drop_unit(self, postbox_id):
+        unit = self._units.pop(postbox_id, None)
+        if unit is None:
+            return 0
+        for card_id in unit.ids:
+            item = self._cards.pop(card_id, None)
+            if item is not None:
+                self._bytes -= item[3]
+        return len(unit.ids)
+
+    def _evict(self, keep=None):
+        while self._units and (len(self._cards) > self.max_entries or self._bytes > self.max_bytes):
+            postbox_id = next(iter(self._units))
+            if postbox_id == keep:
+                if len(self._units) == 1:
+                    break
+                self._units.move_to_end(postbox_id)
+                continue
+            self.evicted_postcards += self._drop_unit(postbox_id)
+            self.evicted_postboxes += 1
+
+    # ----- 조회/쓰기 -----
+
+    def has_list(self, postbox_id) -> bool:
+        """우체통 엽서 목록을 Supabase에서 전부 읽어 둔 상태인지."""
+        with self._lock:
+            unit = self._units.get(postbox_id)
+            if unit is None or not unit.complete:
+                return False
+            self._units.move_to_end(postbox_id)
+            return True
+
+    def set_list(self, postbox_id, cards):
+        """Supabase에서 읽은 목록으로 우체통 목록 전체를 바꾼다."""
+        now = time.monotonic()
+        with self._lock:
+            self._drop_unit(postbox_id)
+            unit = self._unit(postbox_id, complete=True)
+            for card in cards or ():
+                if card.get("id") is not None:
+                    self._store(unit, postbox_id, card, now)
+            self._evict(keep=postbox_id)
+
+    def ensure_list(self, postbox_id):
+        """목록이 없으면 빈 목록을 만든다 (새 우체통)."""
+        with self._lock:
+            if postbox_id not in self._units:
+                self._unit(postbox_id, complete=True)
+
+    def append(self, postbox_id, card):
+        with self._lock:
+            self._store(self._unit(postbox_id), postbox_id, card, time.monotonic())
+            self._evict(keep=postbox_id)
+
+    def get(self, card_id):
+        """ttl 안에 저장/갱신된 엽서, 없거나 오래됐으면 None."""
+        with self._lock:
+            item = self._cards.get(card_id)
+            if item is None or time.monotonic() - item[2] >= self.ttl:
+                self.misses += 1
+                return None
+            if item[1] in self._units:
+                self._units.move_to_end(item[1])
+            self.hits += 1
+            return item[0]
+
+    def peek(self, card_id):
+        """나이와 무관하게 메모리에 있는 엽서 (Supabase 장애 시 fallback)."""
+        with self._lock:
+            item = self._cards.get(card_id)
+        return item[0] if item else None
+
+    def refresh(self, card):
+        """Supabase에서 다시 읽은 엽서로 갱신. 우체통 목록을 읽어 둔 경우 목록 끝에 붙는다."""
+        if card.get("id") is None:
+            return
+        with self._lock:
+            old = self._cards.get(card["id"])
+            postbox_id = old[1] if old else card.get("postbox_id")
+            self._store(self._unit(postbox_id), postbox_id, card, time.monotonic())
+            self._evict(keep=postbox_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "postboxes": len(self._units),
+                "postcards": len(self._cards),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evicted_postboxes": self.evicted_postboxes,
+                "evicted_postcards": self.evicted_postcards,
+            }
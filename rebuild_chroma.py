@@ -2,6 +2,8 @@
 import chromadb
 from sentence_transformers import SentenceTransformer
 
+from verse_reference import ingest_metadata
+
 OLD_DB_PATH = "./vectordb2"
 OLD_COLLECTION = "bible"
 
@@ -48,7 +50,8 @@ def main():
             offset=offset
         )
         docs = got["documents"]
-        metas = got["metadatas"]
+        # 레퍼런스 레이블, 문서 내 절 위치표(verse_spans), compact 텍스트를 적재 시 한 번만 계산해 저장
+        metas = [ingest_metadata(m, d) for d, m in zip(docs, got["metadatas"])]
 
         # 기존 ids가 필요하면 include=["ids", ...]로 가져오면 되지만,
         # 여기선 새로 id를 만들어도 검색엔 문제 없음 (메타데이터 기반 출력이면 OK).
@@ -0,0 +1,490 @@
+# search_pipeline.py
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from popular_verses import normalize_korean
+from verse_reference import COMPACT_FIELD, REFERENCE_LABEL_FIELD
+from verse_rerank import compact_text, rerank
+
+_WHITESPACE = re.compile(r"\s+")
+_QUOTE_OPEN = "\"“'‘"
+_QUOTE_CLOSE = "\"”'’"
+
+
+class RetrievalError(Exception):
+    """벡터 검색 백엔드 호출 실패."""
+
+
+def normalize_query_key(query: str) -> str:
+    """결과 캐시 키: NFC 정규화 + 공백 정리."""
+    return _WHITESPACE.sub(" ", normalize_korean(query or "")).strip()
+
+
+class RankedList(list):
+    """정렬된 상위 일부 + 정렬 대상이던 전체 후보 수(total).
+
+    상위 ranked_limit개만 부분 정렬해 캐시하고, 그 뒤 페이지를 요청하면 전체를 다시 정렬한다.
+    페이지 수(has_more/total_pages)는 잘린 길이가 아니라 total 기준이다.
+    """
+
+    def __init__(self, items=(), total=None):
+        super().__init__(items)
+        self.total = len(self) if total is None else max(int(total), len(self))
+
+
+def ranked_total(ranked) -> int:
+    return getattr(ranked, "total", len(ranked))
+
+
+def ranked_covers(ranked, end: int) -> bool:
+    """end번째 항목까지 이미 정렬돼 있는지 (전체를 다 담았으면 항상 True)."""
+    return len(ranked) >= min(end, ranked_total(ranked))
+
+
+def build_page_response(ranked, page: int, page_size: int, log: bool = False):
+    """정렬이 끝난 후보 목록에서 요청한 페이지만 잘라 응답 형태로 만든다."""
+    start_idx = page * page_size
+    end_idx = start_idx + page_size
+    page_slice = ranked[start_idx:end_idx]
+    total = ranked_total(ranked)
+    total_pages = (total + page_size - 1) // page_size if total else 0
+    if log:
+        for entry in page_slice:
+            print(f"  📌 [{entry['reference']}] score={round(entry['score'], 4)}")
+            snippet = _WHITESPACE.sub(" ", (entry["text"] or ""))[:120]
+            print(f"     {snippet}...")
+    return {
+        "verses": page_slice,
+        "has_more": end_idx < total,
+        "total_pages": total_pages,
+        "page": page,
+    }
+
+
+def semantic_cache_text(query: str) -> str:
+    """semantic_cache 비교용 원래 검색어 질의 텍스트 (테마 설명 없이)."""
+    return f"query: {normalize_query_key(query)}"
+
+
+def _parse_row_metadata(raw_meta):
+    if not raw_meta:
+        return {}
+    if isinstance(raw_meta, dict):
+        return raw_meta
+    if isinstance(raw_meta, str):
+        try:
+            parsed = json.loads(raw_meta)
+            return parsed if isinstance(parsed, dict) else {}
+        except Exception:
+            return {}
+    return {}
+
+
+def candidate_from_row(row: dict):
+    """Supabase RPC/로컬 인덱스 행 → 후보 dict (id, text, metadata, reference, compact, distance, popularity)."""
+    if not isinstance(row, dict):
+        return None
+    meta = _parse_row_metadata(row.get("metadata"))
+    doc = row.get("text") or row.get("content") or row.get("document") or row.get("verse_text")
+    # 적재/백필 시 계산해 둔 레이블이 있으면 조회 시 build_reference_label을 건너뛴다
+    reference = (
+        meta.get(REFERENCE_LABEL_FIELD)
+        or row.get("reference")
+        or row.get("verse_reference")
+        or row.get("ref")
+    )
+    distance = row.get("distance")
+    similarity = row.get("similarity")
+    if distance is None and similarity is not None:
+        distance = 1 - similarity
+    popularity = row.get("popularity")
+    if popularity is None:
+        popularity = meta.get("popularity", 0)
+    # 적재 시 미리 계산해 둔 compact 텍스트가 있으면 그대로 사용
+    compact = row.get("compact") or row.get("text_compact") or meta.get(COMPACT_FIELD)
+    return {
+        "id": row.get("id"),
+        "text": doc,
+        "metadata": meta,
+        "reference": reference,
+        "compact": compact,
+        "distance": distance,
+        "popularity": popularity,
+    }
+
+
+class ChromaBackend:
+    """chromadb Collection.query 기반 후보 검색."""
+
+    name = "chroma"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def retrieve(self, query_embedding, n_results: int):
+        res = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+        )
+        docs = (res.get("documents") or [[]])[0]
+        ids = (res.get("ids") or [[None] * len(docs)])[0]
+        metas = (res.get("metadatas") or [[]])[0]
+        dists = (res.get("distances") or [[]])[0]
+        candidates = []
+        for id_, doc, meta, dist in zip(ids, docs, metas, dists):
+            meta = meta or {}
+            candidates.append({
+                "id": id_,
+                "text": doc,
+                "metadata": meta,
+                "reference": meta.get(REFERENCE_LABEL_FIELD) or meta.get("reference"),
+                "compact": meta.get(COMPACT_FIELD),
+                "distance": dist,
+                "popularity": meta.get("popularity", 0),
+            })
+        return candidates
+
+
+class SupabaseRpcBackend:
+    """Supabase match_* RPC 기반 후보 검색. rpc_query(embedding, match_count) -> (rows, error)"""
+
+    name = "supabase"
+
+    def __init__(self, rpc_query):
+        self.rpc_query = rpc_query
+
+    def retrieve(self, query_embedding, n_results: int):
+        rows, error = self.rpc_query(query_embedding, match_count=n_results)
+        if rows is None:
+            raise RetrievalError(f"Supabase 검색 실패: {error}")
+        return [c for c in (candidate_from_row(row) for row in rows) if c]
+
+
+class LocalIndexBackend:
+    """프로세스 내 LocalVerseIndex 기반 후보 검색."""
+
+    name = "local"
+
+    def __init__(self, index):
+        self.index = index
+
+    def retrieve(self, query_embedding, n_results: int):
+        return [candidate_from_row(row) for row in self.index.query_rows(query_embedding, match_count=n_results)]
+
+
+class LexicalBackend:
+    """bigram BM25 역색인 후보. 벡터 후보와 합쳐서 재정렬한다.
+
+    bigram_index가 아직 없으면(워밍업 중) 첫 조회 때 ensure()로 준비를 기다린다.
+    """
+
+    name = "lexical"
+
+    def __init__(self, bigram_index, local_index, ensure=None):
+        self.bigram_index = bigram_index
+        self.local_index = local_index
+        self.ensure = ensure
+
+    def retrieve(self, query: str, query_embedding, n_results: int, exclude_ids=()):
+        """query_embedding이 있으면 해당 행만 코사인 유사도를 계산해 semantic 점수를 채운다."""
+        if self.bigram_index is None and self.ensure:
+            self.ensure()
+        if self.bigram_index is None:
+            return []
+        rows, _ = self.bigram_index.search(compact_text(query), n_results)
+        rows = [r for r in rows if self.local_index.ids[r] not in exclude_ids]
+        if not rows:
+            return []
+        sims = None
+        if query_embedding is not None:
+            sims = self.local_index.similarities(query_embedding, rows)
+        return [candidate_from_row(row) for row in self.local_index.records(rows, sims)]
+
+
+class VerseSearchPipeline:
+    """구절 추천 검색 파이프라인.
+
+    parse → exact(레퍼런스 직접 매칭) → theme(테마 대표 구절 주입)
+    → retrieve(벡터 + 문구 후보) → rerank → page
+
+    materialized(사전 계산 결과표)가 있으면 parse 전에 먼저 조회해
+    테마 검색어는 모델/백엔드 호출 없이 바로 페이지를 만든다.
+
+    벡터 검색 백엔드(Chroma/Supabase/로컬 인덱스)는 생성 시 주입하고,
+    각 단계 소요 시간은 요청마다 출력하고 누적 통계로도 남긴다.
+    """
+
+    STAGES = ("materialized", "parse", "exact", "theme", "retrieve", "rerank", "page")
+
+    def __init__(
+        self,
+        backend,
+        encode,
+        build_contextual_query,
+        greedy_terms,
+        build_reference_label,
+        normalize_reference,
+        exact_lookup=None,
+        resolve_curated=None,
+        lexical_backend=None,
+        result_cache=None,
+        materialized=None,
+        semantic_cache=None,
+        vector_candidates=200,
+        lexical_candidates=50,
+        ranked_limit=60,
+        page_size=3,
+    ):
+        self.backend = backend
+        self.encode = encode
+        self.build_contextual_query = build_contextual_query
+        self.greedy_terms = greedy_terms
+        self.build_reference_label = build_reference_label
+        self.normalize_reference = normalize_reference
+        self.exact_lookup = exact_lookup
+        self.resolve_curated = resolve_curated
+        self.lexical_backend = lexical_backend
+        self.result_cache = result_cache
+        self.materialized = materialized
+        self.semantic_cache = semantic_cache
+        self.vector_candidates = vector_candidates
+        self.lexical_candidates = lexical_candidates
+        self.ranked_limit = ranked_limit
+        self.page_size = page_size
+        self._stats_lock = threading.Lock()
+        self._stage_totals = {stage: [0, 0.0] for stage in self.STAGES}
+
+    @contextmanager
+    def _timed(self, stage, timings):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000.0
+            timings[stage] = elapsed
+            with self._stats_lock:
+                total = self._stage_totals[stage]
+                total[0] += 1
+                total[1] += elapsed
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "backend": self.backend.name,
+                "lexical": bool(self.lexical_backend),
+                "stages": {
+                    stage: {
+                        "count": count,
+                        "avg_ms": round(total / count, 3) if count else 0.0,
+                    }
+                    for stage, (count, total) in self._stage_totals.items()
+                },
+            }
+
+    # ----- stages -----
+
+    def parse(self, query: str):
+        """검색어 정리, 문구 전용 여부, greedy 핵심어, 테마 확장 질의."""
+        query = (query or "").strip()
+        lexical_only = False
+        if (
+            self.lexical_backend
+            and len(query) > 2
+            and query[0] in _QUOTE_OPEN
+            and query[-1] in _QUOTE_CLOSE
+        ):
+            # 따옴표로 감싼 검색어는 모델 호출 없이 문구 후보만 사용
+            query, lexical_only = query[1:-1].strip(), True
+        query_text, curated_refs = self.build_contextual_query(query)
+        return {
+            "raw": query,
+            "query": query,
+            "lexical_only": lexical_only,
+            "query_text": query_text,
+            "curated_refs": curated_refs,
+            "terms": self.greedy_terms(query),
+            "normalized_query": _WHITESPACE.sub("", normalize_korean(query or "").lower()),
+        }
+
+    def inject_themes(self, curated_refs):
+        """테마 대표 구절을 최상단 후보로 만들고, 중복 제거용 정규화 키 집합도 반환."""
+        curated_set = set()
+        curated_items = []
+        if not self.resolve_curated:
+            return curated_items, curated_set
+        for ref in curated_refs:
+            key = self.normalize_reference(ref)
+            if not key or key in curated_set:
+                continue
+            curated_set.add(key)
+            hit = self.resolve_curated(key, ref)
+            if hit:
+                meta = hit.get("metadata") or {}
+                doc = hit.get("text", "")
+                # 범위 구절("빌립보서 4:6-7")은 포함된 절 각각도 중복 제거 대상
+                for covered in hit.get("references") or ():
+                    curated_set.add(self.normalize_reference(covered))
+                curated_items.append({
+                    "reference": meta.get("_reference_override") or self.build_reference_label(meta, doc),
+                    "text": doc,
+                    "metadata": meta,
+                    "score": 1.8,
+                })
+        if curated_items:
+            print(f"   🎯 테마 대표 구절 {len(curated_items)}개 주입")
+        return curated_items, curated_set
+
+    def retrieve(self, ctx, use_semantic_cache: bool = True):
+        """벡터 후보 + 문구(bigram) 후보를 합친 목록.
+
+        semantic_cache가 있으면 임베딩이 충분히 가까운 이전 질의의 벡터 후보를 재사용한다
+        (use_semantic_cache=False면 읽지도 쓰지도 않는다). 확장 질의는 대부분 테마 설명이라
+        검색어가 달라도 서로 가깝게 나오므로, 비교는 원래 검색어 임베딩으로 하고
+        테마 조합(대표 구절 목록)이 같은 질의끼리만 재사용한다. 적중하면 확장 질의 인코딩과
+        백엔드 호출을 모두 건너뛰고 이전 질의의 확장 임베딩을 함께 재사용한다.
+        문구 후보는 질의 문자열에 따라 달라지므로 항상 새로 구한다.
+        """
+        query_embedding = None
+        candidates = []
+        if not ctx["lexical_only"]:
+            semantic_cache = self.semantic_cache if use_semantic_cache else None
+            cached = None
+            if semantic_cache is not None:
+                # 짧은 원래 검색어만 먼저 인코딩해 조회하고, 긴 확장 질의 인코딩은 미스일 때만 한다
+                cache_embedding = self.encode(semantic_cache_text(ctx["query"]))
+                theme_key = tuple(ctx["curated_refs"])
+                cached = semantic_cache.lookup(cache_embedding, theme_key)
+            if cached is not None:
+                # 재사용한 후보와 같은 기준이 되도록 문구 후보 점수도 원래 질의의 확장 임베딩으로 매긴다
+                candidates, query_embedding = cached
+                print(f"   ♻️ 유사 질의 벡터 후보 재사용 ({len(candidates)}개)")
+            else:
+                query_embedding = self.encode(ctx["query_text"])
+                candidates = self.backend.retrieve(query_embedding, self.vector_candidates)
+                if semantic_cache is not None:
+                    semantic_cache.add(cache_embedding, (candidates, query_embedding), theme_key)
+        if self.lexical_backend:
+            seen = {c["id"] for c in candidates}
+            candidates = candidates + self.lexical_backend.retrieve(
+                ctx["query"],
+                query_embedding,
+                self.lexical_candidates,
+                exclude_ids=seen,
+            )
+        return candidates
+
+    def rerank(self, ctx, candidates, curated_set, limit=None):
+        """재정렬 상위 limit개(None이면 ranked_limit, 0이면 전체)를 RankedList로."""
+        prepared = []
+        for cand in candidates:
+            doc = cand["text"]
+            if not doc:
+                continue
+            meta = cand["metadata"] or {}
+            reference = cand["reference"] or self.build_reference_label(meta, doc)
+            if curated_set and self.normalize_reference(reference) in curated_set:
+                continue
+            dist = cand["distance"]
+            prepared.append({
+                "text": doc,
+                "metadata": meta,
+                "reference": reference,
+                "compact": cand["compact"],
+                "semantic": 1 - dist if dist is not None else 0,
+                "popularity": cand["popularity"] or 0,
+            })
+        limit = self.ranked_limit if limit is None else limit
+        return RankedList(
+            [
+                {
+                    "reference": cand["reference"],
+                    "text": cand["text"],
+                    "metadata": cand["metadata"],
+                    "score": score,
+                }
+                for score, cand in rerank(
+                    prepared, ctx["terms"], ctx["normalized_query"], limit if limit > 0 else len(prepared)
+                )
+            ],
+            total=len(prepared),
+        )
+
+    def _rank(self, ctx, timings, use_semantic_cache: bool = True, limit=None):
+        """theme → retrieve → rerank: 테마 대표 구절 + 재정렬된 후보 상위 limit개 (total은 전체 후보 수)."""
+        with self._timed("theme", timings):
+            curated_items, curated_set = self.inject_themes(ctx["curated_refs"])
+        with self._timed("retrieve", timings):
+            candidates = self.retrieve(ctx, use_semantic_cache)
+        with self._timed("rerank", timings):
+            reranked = self.rerank(ctx, candidates, curated_set, limit)
+            return RankedList(curated_items + reranked, total=len(curated_items) + reranked.total)
+
+    def rank(self, query: str):
+        """페이지로 자르기 전의 전체 정렬 목록 (결과표 사전 계산용).
+
+        결과 캐시, 결과표, semantic_cache를 모두 건너뛰어 항상 이 검색어 자체의 벡터 후보로 계산한다.
+        """
+        return self._rank(self.parse(query), {}, use_semantic_cache=False)
+
+    # ----- entry point -----
+
+    def run(self, query: str, page: int = 0):
+        """응답 payload(dict)를 반환. 백엔드 실패 시 RetrievalError."""
+        timings = {}
+        query_key = normalize_query_key(query)
+        page_end = (page + 1) * self.page_size
+        if self.materialized is not None:
+            with self._timed("materialized", timings):
+                ranked = self.materialized.get(query_key)
+            # 결과표에는 상위 ranked_limit개만 있으므로 그 뒤 페이지는 실시간 검색으로 간다
+            if ranked is not None and ranked_covers(ranked, page_end):
+                payload = build_page_response(ranked, page, self.page_size)
+                print(f"🔍 검색 쿼리(사전 계산): '{query}' page={page} ({timings['materialized']:.3f}ms)")
+                return payload
+
+        print(f"\n🔍 검색 쿼리({self.backend.name}): '{query}'")
+        with self._timed("parse", timings):
+            ctx = self.parse(query)
+
+        with self._timed("exact", timings):
+            exact_hit = None
+            if self.exact_lookup and not ctx["lexical_only"]:
+                exact_hit = self.exact_lookup(ctx["query"])
+        if exact_hit:
+            print(f"   🎯 레퍼런스 직접 매칭 성공: {exact_hit['reference']}")
+            self._log_timings(timings)
+            verse = {
+                "reference": exact_hit["reference"],
+                "text": exact_hit["text"],
+                "metadata": exact_hit["metadata"],
+                "score": 1.0,
+            }
+            if exact_hit.get("verse_offsets"):
+                verse["verse_offsets"] = exact_hit["verse_offsets"]
+            return {"verses": [verse]}
+
+        # 같은 검색어의 다음 페이지면 캐시된 정렬 결과에서 바로 슬라이스
+        cache_key = (self.backend.name, query_key)
+        ranked = self.result_cache.get(cache_key) if self.result_cache is not None else None
+        if ranked is None or not ranked_covers(ranked, page_end):
+            print(f"   🔎 greedy 핵심어: {ctx['terms'] if ctx['terms'] else '없음'}")
+            # 상위 ranked_limit개를 넘는 페이지를 요청하면 전체를 정렬해 캐시를 바꿔 둔다
+            full = page_end > self.ranked_limit
+            ranked = self._rank(ctx, timings, limit=0 if full else None)
+            if self.result_cache is not None:
+                self.result_cache.set(cache_key, ranked)
+        else:
+            print(f"   ♻️ 캐시된 검색 결과 사용 (page={page})")
+
+        with self._timed("page", timings):
+            payload = build_page_response(ranked, page, self.page_size, log=True)
+        self._log_timings(timings)
+        return payload
+
+    def _log_timings(self, timings):
+        summary = " ".join(f"{stage}={ms:.1f}ms" for stage, ms in timings.items())
+        print(f"   ⏱️ {summary}")
@@ -0,0 +1,116 @@
+# semantic_cache.py
+import threading
+import time
+
+import numpy as np
+
+# 최고 유사도 분포 히스토그램 구간 (하한 기준)
+SIMILARITY_BUCKETS = (0.0, 0.5, 0.7, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.98, 0.99)
+
+
+class SemanticCandidateCache:
+    """질의 임베딩 이웃 기준 벡터 후보 캐시.
+
+    최근 질의 임베딩을 (capacity × dim) 행렬에 링 버퍼로 담아 두고,
+    새 질의와의 코사인 유사도 최댓값이 threshold 이상이면 그 질의의 벡터 후보 목록을 재사용한다.
+    ("취업 걱정" / "취업이 걱정돼요"처럼 표현만 다른 질의가 같은 후보를 쓰게 된다)
+    저장 값(candidates)은 캐시가 해석하지 않으므로 호출자가 필요한 것을 함께 묶어 넣는다.
+    namespace가 다른 항목끼리는 유사도와 무관하게 재사용하지 않는다 (파이프라인은 테마 조합을 넘긴다).
+
+    후보의 semantic 거리는 원래 질의 기준 값 그대로지만, greedy 핵심어/문구 보너스는
+    재정렬 단계에서 새 질의로 다시 계산하므로 질의별 순위 차이는 유지된다.
+    """
+
+    def __init__(self, capacity: int = 256, threshold: float = 0.97, ttl: float = None):
+        self.capacity = max(1, int(capacity))
+        self.threshold = float(threshold)
+        self.ttl = ttl
+        self._matrix = None
+        self._entries = [None] * self.capacity
+        self._namespaces = [None] * self.capacity
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.expirations = 0
+        self._histogram = [0] * len(SIMILARITY_BUCKETS)
+        self._hit_similarity_total = 0.0
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else vector
+
+    def _record(self, similarity: float):
+        bucket = 0
+        for i, lower in enumerate(SIMILARITY_BUCKETS):
+            if similarity >= lower:
+                bucket = i
+        self._histogram[bucket] += 1
+
+    def lookup(self, embedding, namespace=None):
+        """같은 namespace에서 threshold 이상으로 가까운 이전 질의의 후보 목록, 없으면 None."""
+        vector = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            self.lookups += 1
+            if not self._count or self._matrix.shape[1] != vector.shape[0]:
+                return None
+            sims = self._matrix[: self._count] @ vector
+            same = np.fromiter((ns == namespace for ns in self._namespaces[: self._count]), bool, self._count)
+            sims = np.where(same, sims, -1.0)
+            best = int(np.argmax(sims))
+            similarity = float(sims[best])
+            self._record(similarity)
+            if similarity < self.threshold:
+                return None
+            candidates, expires_at = self._entries[best]
+            if expires_at is not None and now >= expires_at:
+                # 만료된 행은 유사도가 나오지 않도록 0 벡터로 비워 둔다
+                self._matrix[best] = 0.0
+                self.expirations += 1
+                return None
+            self.hits += 1
+            self._hit_similarity_total += similarity
+            return candidates
+
+    def add(self, embedding, candidates, namespace=None):
+        vector = self._unit(embedding)
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self._matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+                self._entries = [None] * self.capacity
+                self._namespaces = [None] * self.capacity
+                self._next = self._count = 0
+            slot = self._next
+            self._matrix[slot] = vector
+            self._entries[slot] = (candidates, expires_at)
+            self._namespaces[slot] = namespace
+            self._next = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+            self._entries = [None] * self.capacity
+            self._namespaces = [None] * self.capacity
+            self._next = self._count = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self._count,
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "expirations": self.expirations,
+                "avg_hit_similarity": round(self._hit_similarity_total / self.hits, 4) if self.hits else None,
+                "best_similarity_histogram": {
+                    f">={lower}": count for lower, count in zip(SIMILARITY_BUCKETS, self._histogram)
+                },
+            }
@@ -0,0 +1,171 @@
+# supabase_rest.py
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SUPABASE_HTTP_POOL_SIZE = int(os.environ.get("SUPABASE_HTTP_POOL_SIZE", "16"))
+SUPABASE_HTTP_RETRIES = int(os.environ.get("SUPABASE_HTTP_RETRIES", "2"))
+SUPABASE_HTTP_TIMEOUT = float(os.environ.get("SUPABASE_HTTP_TIMEOUT", "8"))
+SUPABASE_HTTP_CONNECT_TIMEOUT = float(os.environ.get("SUPABASE_HTTP_CONNECT_TIMEOUT", "3"))
+SUPABASE_HTTP_BACKOFF = float(os.environ.get("SUPABASE_HTTP_BACKOFF", "0.1"))
+
+# 읽기 재시도 대상 상태 코드 (일시적 오류)
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class _Counter:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.status = {}
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 1),
+            "status": dict(self.status),
+        }
+
+
+class SupabaseRestClient:
+    """Supabase PostgREST(/rest/v1) 공용 클라이언트.
+
+    - keep-alive 커넥션 풀(requests.Session + HTTPAdapter)을 워커 프로세스마다 하나씩 둔다.
+      gunicorn fork 이후 부모의 소켓을 공유하지 않도록 PID가 바뀌면 세션을 새로 만든다.
+    - 인증 헤더는 세션 기본 헤더로 한 번만 설정한다.
+    - 멱등 읽기(get)만 지터를 준 지수 백오프로 재시도하고, 쓰기(post)는 한 번만 보낸다.
+    - timeout은 호출 전체 예산(초)이다. 재시도와 백오프를 포함해 이 시간을 넘기지 않는다.
+    - 테이블/메서드별 호출 수, 오류, 재시도, 지연, 상태 코드 분포를 stats()로 보여준다.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        pool_size: int = None,
+        retries: int = None,
+        timeout: float = None,
+        connect_timeout: float = None,
+        backoff: float = None,
+    ):
+        self.base_url = (base_url or "").rstrip("/")
+        self.api_key = api_key
+        self.pool_size = pool_size or SUPABASE_HTTP_POOL_SIZE
+        self.retries = SUPABASE_HTTP_RETRIES if retries is None else retries
+        self.timeout = timeout or SUPABASE_HTTP_TIMEOUT
+        self.connect_timeout = connect_timeout or SUPABASE_HTTP_CONNECT_TIMEOUT
+        self.backoff = SUPABASE_HTTP_BACKOFF if backoff is None else backoff
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._counters = {}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.base_url and self.api_key)
+
+    @property
+    def session(self):
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self._new_session()
+                    self._pid = pid
+        return self._session
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "apikey": self.api_key,
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        })
+        return session
+
+    def endpoint(self, table: str) -> str:
+        return f"{self.base_url}/rest/v1/{table}"
+
+    def _record(self, key, elapsed_ms, status=None, error=False, retried=False):
+        with self._stats_lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = _Counter()
+            if retried:
+                counter.retries += 1
+                return
+            counter.count += 1
+            counter.total_ms += elapsed_ms
+            counter.max_ms = max(counter.max_ms, elapsed_ms)
+            if error:
+                counter.errors += 1
+            if status is not None:
+                counter.status[str(status)] = counter.status.get(str(status), 0) + 1
+
+    def _send(self, method, table, deadline, **kwargs):
+        remaining = max(0.05, deadline - time.monotonic())
+        started = time.perf_counter()
+        try:
+            resp = self.session.request(
+                method,
+                self.endpoint(table),
+                timeout=(min(self.connect_timeout, remaining), remaining),
+                **kwargs,
+            )
+        except requests.RequestException:
+            self._record(f"{method} {table}", (time.perf_counter() - started) * 1000.0, error=True)
+            raise
+        self._record(f"{method} {table}", (time.perf_counter() - started) * 1000.0, status=resp.status_code)
+        return resp
+
+    def get(self, table: str, params=None, timeout: float = None):
+        """멱등 조회. 연결 오류/타임아웃/일시적 상태 코드는 예산 안에서 재시도한다."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            try:
+                resp = self._send("GET", table, deadline, params=params)
+                if resp.status_code not in RETRYABLE_STATUS:
+                    return resp
+                failure = None
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                resp, failure = None, exc
+            # 전체 지터(full jitter) 지수 백오프: 0 ~ backoff × 2^attempt
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+            if attempt >= self.retries or time.monotonic() + delay >= deadline:
+                if failure is not None:
+                    raise failure
+                return resp
+            self._record(f"GET {table}", 0.0, retried=True)
+            time.sleep(delay)
+            attempt += 1
+
+    def post(self, table: str, payload, prefer: str = "return=representation", timeout: float = None):
+        """쓰기는 중복 저장 위험이 있어 재시도하지 않는다."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        headers = {"Prefer": prefer} if prefer else None
+        return self._send("POST", table, deadline, json=payload, headers=headers)
+
+    def stats(self):
+        with self._stats_lock:
+            calls = {key: counter.snapshot() for key, counter in self._counters.items()}
+        return {
+            "pool_size": self.pool_size,
+            "retries": self.retries,
+            "timeout_s": self.timeout,
+            "calls": calls,
+        }
@@ -0,0 +1,43 @@
+# supabase_verse_source.py
+import json
+import os
+
+SUPABASE_VEC_TABLE = os.environ.get("SUPABASE_VEC_TABLE", "bible_verses")
+SUPABASE_VEC_TEXT_COLUMN = os.environ.get("SUPABASE_VEC_TEXT_COLUMN", "content")
+SUPABASE_VERSE_SOURCE_BATCH = int(os.environ.get("SUPABASE_VERSE_SOURCE_BATCH", "1000"))
+
+
+class SupabaseVerseSource:
+    """Supabase 벡터 테이블을 Chroma 컬렉션처럼 읽는 구절 소스 (get만 지원).
+
+    로컬 인덱스/Chroma가 없는 Supabase 전용 배포에서도 부팅 시 한 번 전체 행을 받아
+    VerseStore와 테마 대표 구절을 만들 수 있게 한다. 요청 경로에서는 호출하지 않는다.
+    임베딩 열은 읽지 않고 본문/metadata만 id 순서로 페이지 단위로 가져온다.
+    """
+
+    def __init__(self, client, table: str = None, text_column: str = None, batch_size: int = None):
+        self.client = client
+        self.table = table or SUPABASE_VEC_TABLE
+        self.text_column = text_column or SUPABASE_VEC_TEXT_COLUMN
+        self.batch_size = batch_size or SUPABASE_VERSE_SOURCE_BATCH
+
+    def get(self, where=None, include=None, limit=None, offset=0):
+        if where:
+            raise ValueError("SupabaseVerseSource는 where 필터를 지원하지 않습니다.")
+        limit = min(limit or self.batch_size, self.batch_size)
+        rows = (
+            self.client.table(self.table)
+            .select(f"id, metadata, {self.text_column}")
+            .order("id")
+            .range(offset, offset + limit - 1)
+            .execute()
+            .data
+        ) or []
+        documents, metadatas = [], []
+        for row in rows:
+            meta = row.get("metadata") or {}
+            if isinstance(meta, str):
+                meta = json.loads(meta)
+            documents.append(row.get(self.text_column) or "")
+            metadatas.append(meta)
+        return {"ids": [row.get("id") for row in rows], "documents": documents, "metadatas": metadatas}
@@ -0,0 +1,161 @@
+# theme_matcher.py
+from collections import deque
+
+CONTEXT_QUERY_SUFFIX = "주제와 맞닿은 성경의 약속, 위로, 격려, 도전, 하나님의 성품과 계획을 찾는다."
+
+
+class AhoCorasick:
+    """여러 토큰을 한 번에 찾는 Aho-Corasick 오토마톤.
+
+    상태는 정수 번호이고 goto는 상태별 dict(문자 → 다음 상태), 실패 링크와 출력은 리스트다.
+    search()는 텍스트를 한 번 훑어 매칭된 토큰들의 값(value) 집합을 돌려준다.
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        outputs = [set()]
+        for pattern, value in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                state = nxt
+            outputs[state].add(value)
+
+        # BFS로 실패 링크를 만들고 출력 집합을 실패 링크 쪽에서 물려받는다
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                outputs[nxt] |= outputs[self._fail[nxt]]
+        self._out = [frozenset(o) for o in outputs]
+
+    def search(self, text: str):
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+class ThemeMatcher:
+    """THEME_CONTEXT_RULES를 부팅 시 한 번 컴파일한 테마 매처.
+
+    - 모든 테마 토큰을 Aho-Corasick 하나로 묶어 검색어를 한 번만 훑는다.
+    - 매칭된 테마 조합별 (상황 설명, 대표 구절 목록)은 처음 계산할 때 기억해 둔다.
+    - resolve_curated()로 대표 구절을 미리 구절 항목 배열에 풀어 두면
+      요청 시에는 정규화 키 → 배열 번호 조회만 한다. 풀리지 않은 구절은 부팅 시 보고하고 제외한다.
+    """
+
+    def __init__(self, rules, default_description: str, normalize_reference):
+        self.rules = rules
+        self.default_description = default_description
+        self.normalize_reference = normalize_reference
+        patterns = []
+        for rule_id, rule in enumerate(rules):
+            for token in rule["tokens"]:
+                patterns.append((token, rule_id))
+                if token.lower() != token:
+                    patterns.append((token.lower(), rule_id))
+        self._automaton = AhoCorasick(patterns)
+        self._expansions = {}
+        self._curated_ids = {}
+        self._curated_entries = []
+        self.unresolved = []
+        self._unresolved = frozenset()
+        self.resolved = False
+
+    def match(self, keyword: str):
+        """검색어에 걸린 테마 번호 (규칙 순서)."""
+        found = self._automaton.search(keyword)
+        lowered = keyword.lower()
+        if lowered != keyword:
+            found |= self._automaton.search(lowered)
+        return tuple(sorted(found))
+
+    def _expansion(self, rule_ids):
+        cached = self._expansions.get(rule_ids)
+        if cached is not None:
+            return cached
+        contexts, refs = [], []
+        for rule_id in rule_ids:
+            rule = self.rules[rule_id]
+            if rule["description"] not in contexts:
+                contexts.append(rule["description"])
+            for ref in rule.get("curated_references", []):
+                ref = ref.strip()
+                if ref and ref not in refs and ref not in self._unresolved:
+                    refs.append(ref)
+        if not contexts:
+            contexts.append(self.default_description)
+        cached = (" / ".join(contexts), tuple(refs))
+        self._expansions[rule_ids] = cached
+        return cached
+
+    def expand(self, keyword: str):
+        """(확장된 검색 문장, 대표 구절 목록)."""
+        keyword = (keyword or '').strip()
+        summary, refs = self._expansion(self.match(keyword))
+        expanded = f"query: {keyword}. 상황과 감정: {summary}. {CONTEXT_QUERY_SUFFIX}"
+        return expanded, list(refs)
+
+    def all_references(self):
+        refs = []
+        for rule in self.rules:
+            for ref in rule.get("curated_references", []):
+                ref = ref.strip()
+                if ref and ref not in refs:
+                    refs.append(ref)
+        return refs
+
+    def resolve_curated(self, resolve):
+        """모든 대표 구절을 resolve(label) → 구절 항목으로 미리 풀어 배열에 담는다. 미해결 목록 반환."""
+        ids, entries, unresolved = {}, [], []
+        for ref in self.all_references():
+            key = self.normalize_reference(ref)
+            if not key or key in ids:
+                continue
+            hit = resolve(ref)
+            if hit:
+                ids[key] = len(entries)
+                entries.append(hit)
+            else:
+                unresolved.append(ref)
+        self._curated_ids = ids
+        self._curated_entries = entries
+        self.unresolved = unresolved
+        self._unresolved = frozenset(unresolved)
+        self._expansions = {}
+        self.resolved = True
+        return unresolved
+
+    def curated_entry(self, normalized_key: str):
+        curated_id = self._curated_ids.get(normalized_key)
+        return self._curated_entries[curated_id] if curated_id is not None else None
+
+    def stats(self):
+        return {
+            "rules": len(self.rules),
+            "states": len(self._automaton._goto),
+            "curated_resolved": len(self._curated_entries),
+            "curated_unresolved": list(self.unresolved),
+            "cached_expansions": len(self._expansions),
+        }
@@ -0,0 +1,168 @@
+# theme_results.py
+import json
+import os
+import time
+from itertools import combinations
+
+THEME_RESULTS_FILE = "theme_results.json"
+# 결과표 유효 기간(초). 지나면 조회하지 않고 실시간 검색으로 돌아간다 (인기도/데이터 변경 반영)
+THEME_RESULTS_MAX_AGE = float(os.environ.get("THEME_RESULTS_MAX_AGE", str(24 * 3600)))
+_FORMAT_VERSION = 2
+
+
+def theme_queries(rules, combos: bool = True):
+    """사전 계산할 검색어: 테마별 모든 토큰 + (combos면) 테마 대표 토큰 두 개 조합."""
+    queries = []
+    for rule in rules:
+        for token in rule["tokens"]:
+            if token not in queries:
+                queries.append(token)
+    if combos:
+        heads = [rule["tokens"][0] for rule in rules if rule["tokens"]]
+        for a, b in combinations(heads, 2):
+            queries.append(f"{a} {b}")
+    return queries
+
+
+class MaterializedResults:
+    """검색어 → 정렬된 추천 목록을 미리 계산해 둔 결과표.
+
+    파일에는 구절(reference/text/metadata)을 한 번씩만 verses 배열에 두고,
+    검색어별 목록은 [구절 번호, 점수] 쌍으로만 저장한다. 목록은 상위 일부이므로 검색어별 전체 후보 수
+    (totals)도 함께 저장해 페이지 수를 맞추고, 그 뒤 페이지는 파이프라인이 실시간으로 계산한다.
+    메모리에서는 검색어별로 응답용 dict 목록을 바로 들고 있어 조회가 dict 한 번이다.
+    backend/model이 다르면 결과가 달라지므로 파일 머리에 기록해 두고 불일치 시 쓰지 않는다.
+    파일에는 생성 시각(built_at)과 유효 기간(max_age)도 기록하며, 기간이 지나면 get()은 None이다.
+    """
+
+    def __init__(self, ranked_by_query, backend: str, model: str, built_at: float = None, max_age: float = None):
+        self._ranked = ranked_by_query
+        self.backend = backend
+        self.model = model
+        self.built_at = built_at or time.time()
+        self.max_age = THEME_RESULTS_MAX_AGE if max_age is None else max_age
+        self.hits = 0
+        self._expired_logged = False
+
+    def __len__(self):
+        return len(self._ranked)
+
+    @property
+    def expires_at(self) -> float:
+        return self.built_at + self.max_age
+
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def get(self, key: str):
+        if self.expired():
+            if not self._expired_logged:
+                self._expired_logged = True
+                print("⚠️ 테마 추천 목록 유효 기간이 지나 실시간 검색으로 전환합니다 (build_theme_results.py로 다시 생성)")
+            return None
+        ranked = self._ranked.get(key)
+        if ranked is not None:
+            self.hits += 1
+        return ranked
+
+    def save(self, path: str):
+        verses, verse_ids, queries, totals = [], {}, {}, {}
+        for key, ranked in self._ranked.items():
+            totals[key] = getattr(ranked, "total", len(ranked))
+            rows = []
+            for item in ranked:
+                verse_key = (item["reference"], item["text"])
+                verse_id = verse_ids.get(verse_key)
+                if verse_id is None:
+                    verse_id = verse_ids[verse_key] = len(verses)
+                    verses.append([item["reference"], item["text"], item["metadata"]])
+                rows.append([verse_id, round(float(item["score"]), 6)])
+            queries[key] = rows
+        payload = {
+            "version": _FORMAT_VERSION,
+            "backend": self.backend,
+            "model": self.model,
+            "built_at": self.built_at,
+            "max_age": self.max_age,
+            "verses": verses,
+            "queries": queries,
+            "totals": totals,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump(payload, fp, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        from search_pipeline import RankedList
+
+        with open(path, encoding="utf-8") as fp:
+            payload = json.load(fp)
+        if payload.get("version") != _FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 형식 버전: {payload.get('version')}")
+        verses = payload["verses"]
+        totals = payload.get("totals") or {}
+        ranked_by_query = {
+            key: RankedList(
+                [
+                    {"reference": verses[vid][0], "text": verses[vid][1], "metadata": verses[vid][2], "score": score}
+                    for vid, score in rows
+                ],
+                total=totals.get(key),
+            )
+            for key, rows in payload["queries"].items()
+        }
+        return cls(
+            ranked_by_query,
+            payload.get("backend"),
+            payload.get("model"),
+            payload.get("built_at"),
+            payload.get("max_age"),
+        )
+
+    def stats(self):
+        return {
+            "queries": len(self._ranked),
+            "backend": self.backend,
+            "model": self.model,
+            "built_at": self.built_at,
+            "max_age": self.max_age,
+            "expired": self.expired(),
+            "hits": self.hits,
+        }
+
+
+def materialize_theme_results(pipeline, queries, model: str):
+    """pipeline.rank()로 검색어별 전체 정렬 목록을 계산 (검색어마다 인코딩 1회 + 벡터 검색 1회)."""
+    from search_pipeline import normalize_query_key
+
+    ranked_by_query = {}
+    started = time.perf_counter()
+    for query in queries:
+        ranked_by_query[normalize_query_key(query)] = pipeline.rank(query)
+    elapsed = time.perf_counter() - started
+    print(f"✅ 테마 추천 목록 사전 계산 완료: {len(ranked_by_query)}개 검색어 ({elapsed:.1f}s)")
+    return MaterializedResults(ranked_by_query, backend=pipeline.backend.name, model=model)
+
+
+def load_theme_results(path: str, backend: str, model: str):
+    """파일이 없거나, 유효 기간이 지났거나, backend/model이 다르면 None."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        results = MaterializedResults.load(path)
+    except Exception as exc:
+        print(f"⚠️ 테마 추천 목록을 읽지 못했습니다: {path} -> {exc}")
+        return None
+    if results.expired():
+        print(f"⚠️ 테마 추천 목록 유효 기간이 지나 사용하지 않습니다: {path}")
+        return None
+    if results.backend != backend or results.model != model:
+        print(
+            f"⚠️ 테마 추천 목록이 현재 설정과 달라 사용하지 않습니다 "
+            f"(파일: {results.backend}/{results.model}, 현재: {backend}/{model})"
+        )
+        return None
+    print(f"✅ 테마 추천 목록 로드: {len(results)}개 검색어 ({path})")
+    return results
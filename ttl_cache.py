@@ -0,0 +1,132 @@
+# ttl_cache.py
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """스레드 안전한 LRU + TTL 캐시.
+
+    - maxsize를 넘으면 가장 오래 쓰이지 않은 항목부터 제거한다.
+    - ttl(초)이 지나면 조회 시점에 만료 처리한다. ttl=None이면 만료 없음.
+    - max_bytes와 sizeof(value -> 바이트 수)를 주면 메모리 예산도 함께 지킨다.
+    """
+
+    def __init__(self, maxsize=256, ttl=None, max_bytes=None, sizeof=None):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, expires_at, now):
+        return expires_at is not None and now >= expires_at
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at, size = item
+            if self._expired(expires_at, now):
+                del self._data[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=_MISSING):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            old = self._data.pop(key, _MISSING)
+            if old is not _MISSING:
+                self._bytes -= old[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                # 예산보다 큰 항목은 저장하지 않는다
+                return
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted[2]
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            if item is not _MISSING:
+                self._bytes -= item[2]
+        if item is _MISSING:
+            return default
+        return item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            return item is not _MISSING and not self._expired(item[1], now)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def memoize(maxsize=4096, key=None):
+    """순수 함수 결과를 만료 없는 LRU(TTLCache)에 담는 데코레이터.
+
+    key(*args)로 캐시 키를 정할 수 있고, wrapper.cache.stats()로 적중률을 본다.
+    """
+    def decorator(fn):
+        cache = TTLCache(maxsize=maxsize)
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            cache_key = key(*args) if key else args
+            value = cache.get(cache_key, _MISSING)
+            if value is _MISSING:
+                value = fn(*args)
+                cache.set(cache_key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
@@ -0,0 +1,259 @@
+# verse_index.py
+import json
+import os
+
+import numpy as np
+
+from verse_rerank import compact_text
+
+EMBEDDINGS_FILE = "embeddings.npy"
+VERSES_FILE = "verses.jsonl"
+QUANTIZED_FILES = {
+    "float16": "embeddings_f16.npy",
+    "int8": "embeddings_i8.npy",
+}
+INT8_SCALES_FILE = "embeddings_i8_scales.npy"
+
+# 양자화 행렬을 float32로 올려 곱할 때 한 번에 처리하는 행 수 (임시 버퍼 크기 제한)
+_SCORE_CHUNK_ROWS = 4096
+
+
+def normalize_rows(matrix):
+    """행 단위 L2 정규화 (0 벡터는 그대로 둔다)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize_int8(matrix):
+    """차원별 스케일을 둔 int8 대칭 양자화. (int8 행렬, float32 스케일)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=0) / 127.0 if matrix.shape[0] else np.ones(matrix.shape[1], np.float32)
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(matrix / scales), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def top_k_indices(scores, k: int):
+    """점수 상위 k개의 인덱스를 내림차순으로 반환 (argpartition 후 k개만 정렬)."""
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    order = np.argsort(-scores[candidates], kind="stable")
+    return candidates[order]
+
+
+class LocalVerseIndex:
+    """프로세스 내 정확(brute-force) 벡터 검색 인덱스.
+
+    정규화된 float32 임베딩 행렬을 np.load(mmap_mode="r")로 열어 두므로
+    여러 gunicorn 워커가 같은 페이지 캐시를 공유한다. 질의 1건은 행렬-벡터 곱 한 번과
+    argpartition으로 끝난다. query()는 Chroma, query_rows()는 Supabase RPC와
+    같은 모양의 결과를 돌려준다. 문구 매칭용 compact 텍스트(NFC+소문자+공백 제거)는
+    인덱스 생성 시 저장해 두고, 예전 인덱스라 없으면 로딩 시 한 번만 계산한다.
+
+    metric="cosine"이면 distance = 1 - cos (Supabase match_* 함수 기준),
+    metric="l2"면 distance = 2 - 2cos (정규화 벡터의 Chroma 기본 l2 공간 기준).
+
+    dtype="float16"/"int8"이면 양자화된 행렬로 점수를 매겨 워커가 건드리는 페이지를
+    1/2, 1/4로 줄인다. rescore=N이면 양자화 점수 상위 N개만 float32 원본으로 다시 계산한다.
+    similarities()(문구 후보 점수)도 양자화 행렬에서 읽으므로 float32 원본은 rescore 행만 건드린다.
+    """
+
+    def __init__(self, directory: str, metric: str = "cosine", dtype: str = "float32", rescore: int = 0):
+        self.directory = directory
+        self.metric = metric
+        self.rescore = max(0, int(rescore or 0))
+        self.embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+        self.dtype = "float32"
+        self._scoring = self.embeddings
+        self._scales = None
+        if dtype in QUANTIZED_FILES:
+            quantized_path = os.path.join(directory, QUANTIZED_FILES[dtype])
+            if os.path.exists(quantized_path):
+                self.dtype = dtype
+                self._scoring = np.load(quantized_path, mmap_mode="r")
+                if dtype == "int8":
+                    self._scales = np.load(os.path.join(directory, INT8_SCALES_FILE))
+            else:
+                print(f"⚠️ {dtype} 양자화 파일이 없어 float32로 검색합니다: {quantized_path}")
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.compacts = []
+        with open(os.path.join(directory, VERSES_FILE), encoding="utf-8") as fp:
+            for line in fp:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                self.ids.append(row.get("id"))
+                self.documents.append(row.get("text") or "")
+                self.metadatas.append(row.get("metadata") or {})
+                compact = row.get("compact")
+                self.compacts.append(compact if compact is not None else compact_text(self.documents[-1]))
+        if len(self.documents) != self.embeddings.shape[0]:
+            raise ValueError(
+                f"verse index 불일치: 문서 {len(self.documents)}개, 임베딩 {self.embeddings.shape[0]}개"
+            )
+
+    def __len__(self):
+        return len(self.documents)
+
+    @property
+    def dimension(self) -> int:
+        return int(self.embeddings.shape[1])
+
+    def _to_distance(self, similarity):
+        if self.metric == "l2":
+            return 2.0 - 2.0 * similarity
+        return 1.0 - similarity
+
+    def _score(self, q):
+        if self.dtype == "float32":
+            return self.embeddings @ q
+        # int8: x ≈ x_q * scale 이므로 x·q = x_q · (scale * q)
+        qs = q * self._scales if self._scales is not None else q
+        n = self._scoring.shape[0]
+        scores = np.empty(n, dtype=np.float32)
+        buffer = np.empty((min(n, _SCORE_CHUNK_ROWS), self._scoring.shape[1]), dtype=np.float32)
+        for start in range(0, n, _SCORE_CHUNK_ROWS):
+            end = min(start + _SCORE_CHUNK_ROWS, n)
+            chunk = buffer[: end - start]
+            np.copyto(chunk, self._scoring[start:end], casting="unsafe")
+            scores[start:end] = chunk @ qs
+        return scores
+
+    def search(self, query_embedding, k: int):
+        """(행 번호 배열, 코사인 유사도 배열)을 유사도 내림차순으로 반환."""
+        q = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        scores = self._score(q)
+        if self.dtype != "float32" and self.rescore:
+            pool = top_k_indices(scores, max(k, self.rescore))
+            exact = self.embeddings[pool] @ q
+            order = top_k_indices(exact, k)
+            return pool[order], exact[order]
+        rows = top_k_indices(scores, k)
+        return rows, scores[rows]
+
+    def query(self, query_embeddings, n_results=10, include=None, where=None):
+        """chromadb Collection.query와 같은 모양의 결과."""
+        include = include or ["documents", "metadatas", "distances"]
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": [], "compacts": []}
+        for query_embedding in query_embeddings:
+            rows, sims = self.search(query_embedding, n_results)
+            result["ids"].append([self.ids[i] for i in rows])
+            result["compacts"].append([self.compacts[i] for i in rows])
+            if "documents" in include:
+                result["documents"].append([self.documents[i] for i in rows])
+            if "metadatas" in include:
+                result["metadatas"].append([self.metadatas[i] for i in rows])
+            if "distances" in include:
+                result["distances"].append([float(self._to_distance(s)) for s in sims])
+        return result
+
+    def query_rows(self, query_embedding, match_count=200):
+        """Supabase match_* RPC 응답과 같은 행(dict) 목록."""
+        rows, sims = self.search(query_embedding, match_count)
+        return self.records(rows, sims)
+
+    def similarities(self, query_embedding, rows):
+        """지정한 행들만 질의와의 코사인 유사도를 계산 (검색과 같은 dtype의 행렬 사용)."""
+        q = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.dtype == "float32":
+            return self.embeddings[rows] @ q
+        qs = q * self._scales if self._scales is not None else q
+        return self._scoring[rows].astype(np.float32) @ qs
+
+    def records(self, rows, sims=None):
+        """행 번호 → Supabase RPC 행 모양 dict. sims가 없으면 distance는 None."""
+        records = []
+        for pos, i in enumerate(rows):
+            sim = float(sims[pos]) if sims is not None else None
+            records.append({
+                "id": self.ids[i],
+                "row": int(i),
+                "text": self.documents[i],
+                "metadata": self.metadatas[i],
+                "compact": self.compacts[i],
+                "similarity": sim,
+                "distance": float(self._to_distance(sim)) if sim is not None else None,
+            })
+        return records
+
+    def get(self, where=None, include=None, limit=None, offset=0):
+        """chromadb Collection.get 호환 (where는 단순 동등 비교만 지원)."""
+        result = {"ids": [], "documents": [], "metadatas": []}
+        matched = 0
+        for i, meta in enumerate(self.metadatas):
+            if where and any(meta.get(k) != v for k, v in where.items()):
+                continue
+            matched += 1
+            if matched <= offset:
+                continue
+            if limit is not None and len(result["ids"]) >= limit:
+                break
+            result["ids"].append(self.ids[i])
+            result["documents"].append(self.documents[i])
+            result["metadatas"].append(meta)
+        return result
+
+    def count(self) -> int:
+        return len(self.documents)
+
+
+def load_local_verse_index(directory, metric="cosine", dtype="float32", rescore=0):
+    """디렉터리에 인덱스 파일이 있으면 LocalVerseIndex를, 없으면 None을 반환."""
+    if not directory or not os.path.exists(os.path.join(directory, EMBEDDINGS_FILE)):
+        return None
+    try:
+        index = LocalVerseIndex(directory, metric=metric, dtype=dtype, rescore=rescore)
+    except Exception as exc:
+        print(f"⚠️ 로컬 구절 인덱스 로딩 실패: {exc}")
+        return None
+    print(
+        f"✅ 로컬 구절 인덱스 로드 완료: {len(index)}개 × {index.dimension}차원 "
+        f"({index.dtype}, rescore={index.rescore}, {directory})"
+    )
+    return index
+
+
+def write_quantized_embeddings(directory):
+    """float32 임베딩에서 float16 / int8(+차원별 스케일) 사본을 만든다."""
+    matrix = np.load(os.path.join(directory, EMBEDDINGS_FILE))
+    outputs = {
+        QUANTIZED_FILES["float16"]: matrix.astype(np.float16),
+    }
+    quantized, scales = quantize_int8(matrix)
+    outputs[QUANTIZED_FILES["int8"]] = quantized
+    outputs[INT8_SCALES_FILE] = scales
+    for name, array in outputs.items():
+        path = os.path.join(directory, name)
+        tmp = path + ".tmp.npy"
+        np.save(tmp, array)
+        os.replace(tmp, path)
+
+
+def write_verse_index(directory, ids, documents, metadatas, embeddings):
+    """build_verse_index.py에서 사용하는 저장 함수 (임시 파일에 쓴 뒤 교체)."""
+    os.makedirs(directory, exist_ok=True)
+    matrix = normalize_rows(embeddings)
+    emb_path = os.path.join(directory, EMBEDDINGS_FILE)
+    tmp_emb = emb_path + ".tmp.npy"
+    np.save(tmp_emb, matrix)
+    verses_path = os.path.join(directory, VERSES_FILE)
+    tmp_verses = verses_path + ".tmp"
+    with open(tmp_verses, "w", encoding="utf-8") as fp:
+        for id_, doc, meta in zip(ids, documents, metadatas):
+            row = {"id": id_, "text": doc, "compact": compact_text(doc), "metadata": meta or {}}
+            fp.write(json.dumps(row, ensure_ascii=False))
+            fp.write("\n")
+    os.replace(tmp_emb, emb_path)
+    os.replace(tmp_verses, verses_path)
+    write_quantized_embeddings(directory)
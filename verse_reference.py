@@ -0,0 +1,225 @@
+# verse_reference.py
+import json
+import os
+import re
+from bisect import bisect_left
+
+from book_names import BOOK_IDS, BOOK_TRIE, resolve_book, split_book_prefix
+from popular_verses import extract_chapter_verse, normalize_korean
+from ttl_cache import memoize
+from verse_rerank import compact_text
+
+REFERENCE_SPLIT_PATTERN = re.compile(r'^(.*?)(\d+:\d.*)$')
+RANGE_SEPARATOR_PATTERN = re.compile(r'\s*[-–—~]\s*')
+
+# 책 이름 뒤에 오는 "3:16", "13장 4절", "13:4-7"
+REFERENCE_NUMBERS_PATTERN = re.compile(
+    r'^\s*([0-9]{1,3})\s*(?:[:장]\s*([0-9]{1,3}))\s*(?:[-–—~]\s*([0-9]{1,3}))?\s*(?:절)?\s*$'
+)
+
+# 적재/백필 시 미리 계산해 두는 레이블 메타데이터 키 (있으면 조회 시 계산을 건너뛴다)
+REFERENCE_LABEL_FIELD = "reference_label"
+# 적재 시 미리 계산해 두는 문서 내 절 위치표 메타데이터 키 (JSON 문자열)
+VERSE_SPANS_FIELD = "verse_spans"
+# 적재 시 미리 계산해 두는 문구 매칭용 compact 텍스트 메타데이터 키 (Chroma/Supabase 후보 재순위화용)
+COMPACT_FIELD = "compact"
+
+# 문서 본문 안의 "요3:16" 같은 절 표시
+VERSE_MARKER_PATTERN = re.compile(r'([가-힣]{1,5})\s*(\d+)\s*:\s*(\d+)\s*')
+
+# extract_chapter_verse는 정규화된 본문 앞 50자만 보므로 메모 키에는 앞부분만 쓴다
+# (NFD 자모 분해를 감안해 넉넉히 잡는다)
+_LABEL_DOCUMENT_PREFIX = 160
+
+REFERENCE_MEMO_SIZE = int(os.environ.get("REFERENCE_MEMO_SIZE", "8192"))
+
+
+def canonical_book_name(book: str) -> str:
+    """책 이름/약어 → 한글 책 이름. 모르는 이름은 공백만 뺀 채 그대로."""
+    return resolve_book(book) or normalize_korean(book or '').replace(" ", "")
+
+
+def parse_reference_input(text: str):
+    book, rest = split_book_prefix(text)
+    if not book:
+        return None
+    m = REFERENCE_NUMBERS_PATTERN.match(rest)
+    if not m:
+        return None
+    chapter, verse, verse_end = m.groups()
+    return {
+        "book": book,
+        "chapter": int(chapter),
+        "verse": int(verse),
+        "verse_end": int(verse_end) if verse_end else None,
+    }
+
+
+@memoize(maxsize=REFERENCE_MEMO_SIZE)
+def split_reference(reference: str):
+    reference = normalize_korean(reference or '').strip()
+    reference = reference.split('(')[0].strip()
+    if not reference:
+        return '', ''
+    book, rest = split_book_prefix(reference)
+    rest = rest.strip()
+    if book and (not rest or rest[0].isdigit()):
+        return book, RANGE_SEPARATOR_PATTERN.sub('-', rest)
+    match = REFERENCE_SPLIT_PATTERN.match(reference)
+    if match:
+        book_raw = match.group(1).strip()
+        remainder = match.group(2).strip()
+    else:
+        book_raw = reference
+        remainder = ''
+    book = canonical_book_name(book_raw)
+    # 범위("4:6 ~ 7")는 유지하되 구분자만 "-"로 통일
+    remainder = RANGE_SEPARATOR_PATTERN.sub('-', remainder.strip())
+    return book, remainder
+
+
+@memoize(maxsize=REFERENCE_MEMO_SIZE)
+def normalize_reference(reference: str) -> str:
+    """구절 표시 방식이 조금씩 달라도 비교가 가능하도록 정규화."""
+    book, remainder = split_reference(reference)
+    if book and remainder:
+        base = f"{book} {remainder}"
+    elif book:
+        base = book
+    else:
+        base = remainder
+    return base.replace(" ", "")
+
+
+@memoize(maxsize=REFERENCE_MEMO_SIZE)
+def _reference_label(reference_field: str, source_field: str, document_head: str) -> str:
+    ref_book, ref_numbers = split_reference(reference_field)
+    source_book = canonical_book_name(source_field)
+    book = ref_book or source_book
+    chapter_verse = extract_chapter_verse(document_head) if document_head else None
+
+    if not chapter_verse and ref_numbers:
+        chapter_verse = ref_numbers
+
+    if book and chapter_verse:
+        return f"{book} {chapter_verse}"
+    if book:
+        return book
+    if chapter_verse:
+        return chapter_verse
+    return "알 수 없는 구절"
+
+
+def build_reference_label(metadata: dict, document: str) -> str:
+    """메타데이터와 본문에서 책 이름 + 장:절을 조합해 사람이 읽을 레퍼런스를 만든다.
+
+    메타데이터에 미리 계산된 reference_label이 있으면 그대로 쓰고,
+    없으면 (reference, source, 본문 앞부분) 키로 메모이제이션한다.
+    """
+    label = metadata.get(REFERENCE_LABEL_FIELD)
+    if label:
+        return label
+    return _reference_label(
+        metadata.get("reference") or "",
+        metadata.get("source") or "",
+        (document or "")[:_LABEL_DOCUMENT_PREFIX],
+    )
+
+
+def parse_reference_label(label: str):
+    """"요한복음 3:16" 형태 레이블 → (책, 장, 절). 장:절이 없으면 None."""
+    book, remainder = split_reference(label)
+    match = re.match(r"(\d+)\s*:\s*(\d+)", remainder or "")
+    if not book or not match:
+        return None
+    return book, int(match.group(1)), int(match.group(2))
+
+
+def reference_memo_stats():
+    return {
+        "split_reference": split_reference.cache.stats(),
+        "normalize_reference": normalize_reference.cache.stats(),
+        "build_reference_label": _reference_label.cache.stats(),
+    }
+
+
+# ----- 문서 내 절 위치표 (적재 시 1회 계산) -----
+
+def document_book(metadata: dict, document: str) -> str:
+    """문서 대표 레퍼런스의 책 이름 (절 표시의 책을 모를 때 기본값)."""
+    parsed = parse_reference_label(build_reference_label(metadata, document))
+    return parsed[0] if parsed else resolve_book(metadata.get("source") or "")
+
+
+def parse_verse_spans(document: str, fallback_book: str = ''):
+    """문서를 한 번 훑어 절 표시마다 (책 번호, 장, 절, 시작, 끝) 목록(문서 순서)을 만든다.
+
+    시작은 절 표시("고후1:4") 위치, 끝은 다음 절 표시 위치이며 NFC 정규화된 본문 기준이다.
+    표시 앞에 공백이 없으면 "위로하리라요3:16"처럼 앞 단어가 붙어 잡히므로
+    책 이름으로 풀리는 가장 긴 접미사부터 표시로 본다.
+    """
+    doc_norm = normalize_korean(document or "")
+    fallback_id = BOOK_IDS.get(fallback_book, -1)
+    markers = []
+    for m in VERSE_MARKER_PATTERN.finditer(doc_norm):
+        book_id, offset = BOOK_TRIE.match_suffix(m.group(1))
+        start = m.start(1) + offset if book_id >= 0 else m.start(1)
+        markers.append((book_id if book_id >= 0 else fallback_id, int(m.group(2)), int(m.group(3)), start))
+    spans = []
+    for i, (book_id, chapter, verse, start) in enumerate(markers):
+        end = markers[i + 1][3] if i + 1 < len(markers) else len(doc_norm)
+        if book_id >= 0:
+            spans.append((book_id, chapter, verse, start, end))
+    return spans
+
+
+def encode_verse_spans(spans) -> str:
+    """(책 번호, 장, 절) 순으로 정렬한 메타데이터 저장용 JSON 문자열.
+
+    Chroma 메타데이터는 스칼라 값만 허용하므로 리스트 대신 문자열로 둔다.
+    """
+    return json.dumps([list(span) for span in sorted(spans)], separators=(",", ":"))
+
+
+def verse_spans(metadata: dict, document: str, fallback_book: str = None):
+    """(책 번호, 장, 절) 순으로 정렬된 절 위치표. 저장된 표가 있으면 정규식 없이 그대로 쓴다."""
+    stored = metadata.get(VERSE_SPANS_FIELD)
+    if stored:
+        try:
+            return [tuple(span) for span in json.loads(stored)]
+        except (TypeError, ValueError):
+            pass
+    if fallback_book is None:
+        fallback_book = document_book(metadata, document)
+    return sorted(parse_verse_spans(document, fallback_book))
+
+
+def find_verse_span(spans, book: str, chapter: int, verse: int):
+    """정렬된 위치표에서 이진 탐색. 없으면 None."""
+    book_id = BOOK_IDS.get(book)
+    if book_id is None:
+        return None
+    key = (book_id, chapter, verse)
+    i = bisect_left(spans, key)
+    if i < len(spans) and spans[i][:3] == key:
+        return spans[i]
+    return None
+
+
+def ingest_metadata(metadata: dict, document: str, compact: bool = True) -> dict:
+    """적재 시 한 번 계산해 메타데이터에 저장할 값(reference_label, verse_spans, compact)을 채운 사본.
+
+    로컬 인덱스처럼 compact를 행에 따로 저장하는 곳은 compact=False로 메타데이터 중복을 피한다.
+    """
+    meta = dict(metadata or {})
+    meta.pop(REFERENCE_LABEL_FIELD, None)
+    meta.pop(VERSE_SPANS_FIELD, None)
+    meta.pop(COMPACT_FIELD, None)
+    if compact:
+        meta[COMPACT_FIELD] = compact_text(document)
+    label = build_reference_label(meta, document)
+    meta[REFERENCE_LABEL_FIELD] = label
+    parsed = parse_reference_label(label)
+    fallback = parsed[0] if parsed else resolve_book(meta.get("source") or "")
+    meta[VERSE_SPANS_FIELD] = encode_verse_spans(parse_verse_spans(document, fallback))
+    return meta
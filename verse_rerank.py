@@ -0,0 +1,92 @@
+# verse_rerank.py
+import re
+
+import numpy as np
+
+from popular_verses import normalize_korean
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def compact_text(text: str) -> str:
+    """NFC 정규화 + 소문자 + 공백 제거 (문구 포함 여부 비교용)."""
+    return _WHITESPACE.sub("", normalize_korean(text or "").lower())
+
+
+def _contains(compact_docs, needle: str):
+    if not len(compact_docs):
+        return np.zeros(0, dtype=bool)
+    return np.char.find(compact_docs, needle) >= 0
+
+
+def score_candidates(compact_docs, semantic, popularity, terms, normalized_query):
+    """후보 전체의 최종 점수를 numpy 배열로 계산한다.
+
+    기존 루프와 같은 공식/연산 순서:
+        semantic * 0.6 + (pop / 100) * 0.4 + phrase_bonus + greedy_bonus
+    """
+    compact_docs = np.asarray(compact_docs, dtype=str)
+    semantic = np.asarray(semantic, dtype=np.float64)
+    popularity = np.asarray(popularity, dtype=np.float64)
+    n = semantic.shape[0]
+
+    hits = np.zeros(n, dtype=np.int64)
+    for term in terms:
+        needle = _WHITESPACE.sub("", term or "")
+        if term and needle:
+            hits += _contains(compact_docs, needle)
+    greedy_bonus = np.minimum(0.18, hits * 0.06)
+    if terms:
+        coverage = hits / max(1, len(terms))
+    else:
+        coverage = np.zeros(n, dtype=np.float64)
+
+    phrase_bonus = coverage * 0.1  # 핵심어 커버리지 보너스
+    phrase_bonus = np.where(coverage >= 0.99, phrase_bonus + 0.08, phrase_bonus)
+    if normalized_query:
+        phrase_bonus = np.where(
+            _contains(compact_docs, normalized_query),
+            phrase_bonus + 0.06,
+            phrase_bonus,
+        )
+    phrase_bonus = np.minimum(0.24, phrase_bonus)
+    return semantic * 0.6 + (popularity / 100.0) * 0.4 + phrase_bonus + greedy_bonus
+
+
+def top_k_stable(scores, k: int):
+    """점수 상위 k개 인덱스 (동점은 원래 순서 유지 → list.sort(reverse=True)와 같은 결과).
+
+    전체 정렬 대신 k번째 값으로 후보를 먼저 거른 뒤 그 안에서만 정렬한다.
+    """
+    scores = np.asarray(scores)
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        kth = np.partition(scores, n - k)[n - k]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(n)
+    order = np.argsort(-scores[candidates], kind="stable")
+    return candidates[order][:k]
+
+
+def rerank(candidates, terms, normalized_query, limit: int):
+    """후보 dict 목록을 점수순 상위 limit개 [(score, candidate)]로 반환.
+
+    candidate 키: text, semantic, popularity, compact(선택, 없으면 여기서 계산)
+    """
+    if not candidates:
+        return []
+    compact_docs = [
+        c.get("compact") if c.get("compact") is not None else compact_text(c["text"])
+        for c in candidates
+    ]
+    scores = score_candidates(
+        compact_docs,
+        [c["semantic"] for c in candidates],
+        [c["popularity"] for c in candidates],
+        terms,
+        normalized_query,
+    )
+    return [(float(scores[i]), candidates[i]) for i in top_k_stable(scores, limit)]
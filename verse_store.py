@@ -0,0 +1,165 @@
+# verse_store.py
+import numpy as np
+
+from book_names import CANONICAL_BOOKS
+
+# 키 = book_id << 20 | chapter << 10 | verse (장/절은 각각 1023까지)
+_CHAPTER_SHIFT = 10
+_BOOK_SHIFT = 20
+_MAX_NUMBER = (1 << _CHAPTER_SHIFT) - 1
+
+# 범위 조회("고전 13:4-7") 한 번에 돌려줄 최대 절 수
+MAX_RANGE_SPAN = 30
+
+def make_key(book_id: int, chapter: int, verse: int) -> int:
+    return (book_id << _BOOK_SHIFT) | (chapter << _CHAPTER_SHIFT) | verse
+
+
+class VerseStore:
+    """(책, 장, 절) → 구절 행을 배열로 들고 있는 조회 전용 저장소.
+
+    - 책 이름은 한 번만 저장하고(book table) 행에는 book_id(uint8)만 둔다.
+    - 장/절은 uint16 열, 본문은 키 순서대로 "\n"으로 이어 붙인 문자열 + offsets 배열.
+    - 정렬된 int64 키 배열에 np.searchsorted로 조회한다.
+    키가 책 → 장 → 절 순이라 같은 장의 절 범위는 연속된 행이고, 범위 본문은 buffer 한 조각이다.
+    구절마다 dict/문자열 키를 만들던 VERSE_LOOKUP_INDEX보다 메모리가 훨씬 적다.
+
+    여러 절이 묶인 문서 안쪽 구절(embedded)도 각각 한 행으로 들어가며,
+    조회 시 metadata에 _reference_override(해당 절 레이블)를 붙여 돌려준다.
+    """
+
+    def __init__(self, books, keys, chapters, verses, book_ids, buffer, offsets, metadatas, embedded=None):
+        self.books = books
+        self._book_index = {name: i for i, name in enumerate(books)}
+        self.keys = keys
+        self.chapters = chapters
+        self.verses = verses
+        self.book_ids = book_ids
+        self.buffer = buffer
+        self.offsets = offsets
+        self.metadatas = metadatas
+        self.embedded = embedded if embedded is not None else np.zeros(len(keys), dtype=bool)
+
+    @classmethod
+    def build(cls, entries):
+        """entries: (book, chapter, verse, text, metadata, embedded) 반복자.
+
+        같은 키는 먼저 나온 것을 유지하므로 문서 대표 구절을 embedded 구절보다 먼저 넘긴다.
+        """
+        books = list(CANONICAL_BOOKS)
+        book_index = {name: i for i, name in enumerate(books)}
+        keys, chapters, verses, book_ids, texts, metadatas, embedded = [], [], [], [], [], [], []
+        for book, chapter, verse, text, meta, is_embedded in entries:
+            if not book or not (0 < chapter <= _MAX_NUMBER) or not (0 < verse <= _MAX_NUMBER):
+                continue
+            book_id = book_index.get(book)
+            if book_id is None:
+                book_id = book_index[book] = len(books)
+                books.append(book)
+            keys.append(make_key(book_id, chapter, verse))
+            chapters.append(chapter)
+            verses.append(verse)
+            book_ids.append(book_id)
+            texts.append(text or "")
+            metadatas.append(meta or {})
+            embedded.append(bool(is_embedded))
+
+        keys = np.asarray(keys, dtype=np.int64)
+        # 키 기준 안정 정렬 후 중복 키는 첫 항목만 남긴다
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        if sorted_keys.shape[0]:
+            first = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+            order = order[first]
+        texts = [texts[i] for i in order]
+        # 각 본문 뒤에 구분자 "\n" 한 글자를 둔다 (offsets는 구분자 포함 길이로 누적)
+        lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=len(texts))
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(
+            books=books,
+            keys=keys[order],
+            chapters=np.asarray(chapters, dtype=np.uint16)[order],
+            verses=np.asarray(verses, dtype=np.uint16)[order],
+            book_ids=np.asarray(book_ids, dtype=np.uint8 if len(books) < 256 else np.uint16)[order],
+            buffer="".join(t + "\n" for t in texts),
+            offsets=offsets,
+            metadatas=[metadatas[i] for i in order],
+            embedded=np.asarray(embedded, dtype=bool)[order],
+        )
+
+    def __len__(self):
+        return int(self.keys.shape[0])
+
+    def book_id(self, book: str) -> int:
+        return self._book_index.get(book, -1)
+
+    def lookup(self, book: str, chapter: int, verse: int) -> int:
+        """행 번호, 없으면 -1."""
+        book_id = self.book_id(book)
+        if book_id < 0 or not (0 < chapter <= _MAX_NUMBER) or not (0 < verse <= _MAX_NUMBER):
+            return -1
+        key = make_key(book_id, chapter, verse)
+        row = int(np.searchsorted(self.keys, key))
+        if row < len(self) and self.keys[row] == key:
+            return row
+        return -1
+
+    def range_rows(self, book: str, chapter: int, verse_start: int, verse_end: int):
+        """같은 장의 verse_start..verse_end 절에 해당하는 행 구간 [lo, hi). 없는 절은 건너뛴다."""
+        book_id = self.book_id(book)
+        if book_id < 0 or not (0 < chapter <= _MAX_NUMBER) or not (0 < verse_start <= verse_end):
+            return 0, 0
+        verse_end = min(verse_end, _MAX_NUMBER)
+        lo = int(np.searchsorted(self.keys, make_key(book_id, chapter, verse_start), side="left"))
+        hi = int(np.searchsorted(self.keys, make_key(book_id, chapter, verse_end), side="right"))
+        return lo, max(lo, hi)
+
+    def text(self, row: int) -> str:
+        return self.buffer[self.offsets[row]:self.offsets[row + 1] - 1]
+
+    def label(self, row: int) -> str:
+        return f"{self.books[self.book_ids[row]]} {self.chapters[row]}:{self.verses[row]}"
+
+    def entry(self, row: int):
+        """기존 VERSE_LOOKUP_INDEX 값과 같은 {"text", "metadata"} 형태."""
+        meta = self.metadatas[row]
+        if self.embedded[row]:
+            meta = dict(meta)
+            meta["_reference_override"] = self.label(row)
+        return {"text": self.text(row), "metadata": meta}
+
+    def range_entry(self, book: str, chapter: int, verse_start: int, verse_end: int, max_span: int = MAX_RANGE_SPAN):
+        """절 범위를 buffer 한 조각으로 반환. 범위는 max_span절까지만, 하나도 없으면 None.
+
+        text는 절 본문을 "\n"으로 이은 문자열, verse_offsets는 text 안의 절별 [start, end).
+        """
+        verse_end = min(verse_end, verse_start + max(1, max_span) - 1)
+        lo, hi = self.range_rows(book, chapter, verse_start, verse_end)
+        if lo >= hi:
+            return None
+        base = int(self.offsets[lo])
+        starts = self.offsets[lo:hi] - base
+        ends = self.offsets[lo + 1:hi + 1] - base - 1
+        first, last = int(self.verses[lo]), int(self.verses[hi - 1])
+        label = f"{self.books[self.book_ids[lo]]} {chapter}:{first}" + (f"-{last}" if last != first else "")
+        meta = dict(self.metadatas[lo])
+        meta["_reference_override"] = label
+        return {
+            "text": self.buffer[base:int(self.offsets[hi]) - 1],
+            "metadata": meta,
+            "verse_offsets": [[int(a), int(b)] for a, b in zip(starts, ends)],
+            "references": [self.label(row) for row in range(lo, hi)],
+        }
+
+    def stats(self):
+        array_bytes = sum(
+            a.nbytes for a in (self.keys, self.chapters, self.verses, self.book_ids, self.offsets, self.embedded)
+        )
+        return {
+            "verses": len(self),
+            "embedded_verses": int(self.embedded.sum()),
+            "books": len(self.books),
+            "text_chars": len(self.buffer),
+            "array_bytes": int(array_bytes),
+        }
@@ -0,0 +1,119 @@
+# warmup.py
+import threading
+import time
+
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+FAILED = "failed"
+
+
+class _Component:
+    def __init__(self, name, build, required):
+        self.name = name
+        self.build = build
+        self.required = required
+        self.state = PENDING
+        self.error = None
+        self.duration_ms = None
+        self.attempts = 0
+        self.on_boot = True
+        # state/attempts는 이 조건 변수의 잠금 안에서만 바꾼다 (대기자는 깨어난 뒤 상태를 다시 확인)
+        self.cond = threading.Condition()
+
+
+class WarmupManager:
+    """인덱스/모델 준비 작업을 부팅 시 백그라운드 스레드로 돌리는 관리자.
+
+    - 컴포넌트마다 single-flight: 동시에 여러 스레드가 ensure()해도 빌드는 한 번만 돌고,
+      나머지는 끝날 때까지 기다렸다가 같은 결과를 본다.
+    - 실패한 컴포넌트는 다음 ensure()에서 다시 시도한다. 다른 스레드의 빌드를 기다린 쪽은
+      그 시도가 실패하면 곧바로 다시 빌드하지 않고 False를 돌려준다.
+    - on_boot=False로 등록한 컴포넌트는 start()에서 빼고, 처음 필요할 때 prefetch()로 백그라운드에서 준비한다.
+    - status()는 /healthz/ready 응답용 컴포넌트별 상태.
+    """
+
+    def __init__(self):
+        self._components = {}
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def register(self, name: str, build, required: bool = True, on_boot: bool = True):
+        """build: 인자 없는 준비 함수. required=False면 준비 여부가 readiness에 영향을 주지 않는다."""
+        comp = self._components[name] = _Component(name, build, required)
+        comp.on_boot = on_boot
+
+    def ready(self, name: str) -> bool:
+        return self._components[name].state == READY
+
+    def prefetch(self, name: str):
+        """기다리지 않고 백그라운드 스레드에서 준비를 시작한다 (이미 준비됐거나 빌드 중이면 아무것도 안 함)."""
+        comp = self._components[name]
+        if comp.state in (READY, RUNNING):
+            return
+        threading.Thread(target=self.ensure, args=(name,), name=f"warmup-{name}", daemon=True).start()
+
+    def ensure(self, name: str, timeout: float = None) -> bool:
+        """컴포넌트가 준비될 때까지 (필요하면 직접 빌드하며) 기다린다. 준비되면 True."""
+        comp = self._components[name]
+        if comp.state == READY:
+            return True
+        with comp.cond:
+            if comp.state == RUNNING:
+                # 다른 스레드가 빌드 중이면 그 시도가 끝날 때까지 대기 (깨어날 때마다 상태를 다시 확인)
+                attempt = comp.attempts
+                comp.cond.wait_for(lambda: comp.attempts != attempt, timeout)
+                return comp.state == READY
+            if comp.state == READY:
+                return True
+            comp.state = RUNNING
+            comp.error = None
+        self._run(comp)
+        return comp.state == READY
+
+    def _run(self, comp):
+        started = time.perf_counter()
+        error = "중단됨"
+        try:
+            comp.build()
+            error = None
+        except Exception as exc:
+            error = str(exc)
+            print(f"❌ 워밍업 실패: {comp.name} -> {exc}", flush=True)
+        finally:
+            with comp.cond:
+                comp.duration_ms = round((time.perf_counter() - started) * 1000.0, 1)
+                comp.state = FAILED if error is not None else READY
+                comp.error = error
+                comp.attempts += 1
+                comp.cond.notify_all()
+        if error is None:
+            print(f"✅ 워밍업 완료: {comp.name} ({comp.duration_ms}ms)", flush=True)
+
+    def start(self):
+        """등록된 컴포넌트를 각자 데몬 스레드에서 준비시킨다 (프로세스당 한 번)."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        for name, comp in self._components.items():
+            if not comp.on_boot:
+                continue
+            threading.Thread(target=self.ensure, args=(name,), name=f"warmup-{name}", daemon=True).start()
+
+    def is_ready(self) -> bool:
+        return all(c.state == READY for c in self._components.values() if c.required)
+
+    def status(self):
+        return {
+            "ready": self.is_ready(),
+            "components": {
+                name: {
+                    "state": c.state,
+                    "required": c.required,
+                    "duration_ms": c.duration_ms,
+                    "error": c.error,
+                }
+                for name, c in self._components.items()
+            },
+        }